@@ -0,0 +1,208 @@
+import collections
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+
+import metrics
+from app_logging import get_logger
+
+log = get_logger('attendify.admission')
+
+# Admission control for the DB-bound write routes, applied per Flask
+# endpoint before the view runs:
+# - a global token bucket per route (RATE_LIMIT_GLOBAL) and one per client
+#   and route (RATE_LIMIT_CLIENT), both refilling at the given requests per
+#   second and holding RATE_LIMIT_BURST seconds' worth of tokens; an empty
+#   bucket answers 429;
+# - a concurrency limit per route (CONCURRENCY_LIMITS) with at most
+#   CONCURRENCY_QUEUE requests waiting up to CONCURRENCY_QUEUE_TIMEOUT
+#   seconds for a slot; a full queue or a timeout answers 503.
+# Both carry Retry-After. Limits are per worker process. Requests the exempt
+# callback picks out (Idempotency-Key replays) skip both.
+
+REJECTED = 'attendify_admission_rejected_total'
+WAIT = 'attendify_admission_wait_seconds'
+
+metrics.registry.describe(REJECTED, 'counter', 'Requests turned away by admission control, by route and reason.')
+metrics.registry.describe(WAIT, 'histogram', 'Time spent waiting for a concurrency slot, by route.')
+
+
+def parse_limits(spec):
+    # "checkin=50,check_out=50" -> {"checkin": 50.0, "check_out": 50.0}
+    limits = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            route, value = item.split('=', 1)
+            limits[route.strip()] = float(value)
+    return limits
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        # 0 when a token was taken, otherwise seconds until the next one
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+
+class ClientBuckets:
+    # One bucket per client; the least recently seen are dropped past max_clients
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+        return bucket.take()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit, queue, timeout):
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+
+    def acquire(self):
+        # None when admitted, otherwise 'queue_full' or 'queue_timeout'
+        if self._slots.acquire(blocking=False):
+            with self._lock:
+                self.active += 1
+            return None
+        with self._lock:
+            if self.waiting >= self.queue:
+                return 'queue_full'
+            self.waiting += 1
+        admitted = False
+        try:
+            admitted = self._slots.acquire(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                if admitted:
+                    self.active += 1
+        return None if admitted else 'queue_timeout'
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        self._slots.release()
+
+
+class Admission:
+    def __init__(self, app=None, client_key=None, exempt=None):
+        self.client_key = client_key or (lambda: request.remote_addr)
+        self.exempt = exempt
+        self.global_buckets = {}
+        self.client_buckets = {}
+        self.limiters = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        burst = config.get('RATE_LIMIT_BURST', 2.0)
+        self.retry_after = config.get('CONCURRENCY_RETRY_AFTER', 1)
+        self.global_buckets = {route: TokenBucket(rate, rate * burst)
+                               for route, rate in parse_limits(config.get('RATE_LIMIT_GLOBAL')).items() if rate > 0}
+        self.client_buckets = {route: ClientBuckets(rate, rate * burst)
+                               for route, rate in parse_limits(config.get('RATE_LIMIT_CLIENT')).items() if rate > 0}
+        self.limiters = {route: ConcurrencyLimiter(int(limit), config.get('CONCURRENCY_QUEUE', 16),
+                                                   config.get('CONCURRENCY_QUEUE_TIMEOUT', 2.0))
+                         for route, limit in parse_limits(config.get('CONCURRENCY_LIMITS')).items() if limit >= 1}
+
+        metrics.registry.gauge('attendify_admission_in_flight', 'Requests holding or waiting for a concurrency slot.',
+                               self._gauge)
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+        app.extensions['admission'] = self
+
+    def _reject(self, route, reason, status, retry_after):
+        metrics.registry.inc(REJECTED, {"route": route, "reason": reason})
+        log.info("request_shed", reason=reason, retry_after=round(retry_after, 3))
+        response = jsonify({"success": False, "error": "Server busy, retry later" if status == 503
+                            else "Too many requests, retry later"})
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def _admit(self):
+        route = request.endpoint
+        if route is None:
+            return None
+        limited = route in self.global_buckets or route in self.client_buckets or route in self.limiters
+        if not limited or (self.exempt is not None and self.exempt()):
+            return None
+
+        bucket = self.global_buckets.get(route)
+        if bucket is not None:
+            wait = bucket.take()
+            if wait:
+                return self._reject(route, 'rate_global', 429, wait)
+
+        buckets = self.client_buckets.get(route)
+        if buckets is not None:
+            wait = buckets.take(self.client_key())
+            if wait:
+                return self._reject(route, 'rate_client', 429, wait)
+
+        limiter = self.limiters.get(route)
+        if limiter is not None:
+            started = time.perf_counter()
+            refused = limiter.acquire()
+            metrics.registry.observe(WAIT, {"route": route}, time.perf_counter() - started)
+            if refused:
+                return self._reject(route, refused, 503, self.retry_after)
+            g.admission_limiter = limiter
+        return None
+
+    def _release(self, error=None):
+        limiter = g.pop('admission_limiter', None)
+        if limiter is not None:
+            limiter.release()
+
+    def _gauge(self):
+        values = {}
+        for route, limiter in self.limiters.items():
+            values[(("route", route), ("state", "active"))] = limiter.active
+            values[(("route", route), ("state", "waiting"))] = limiter.waiting
+        return values
+
+    def stats(self):
+        return {
+            "rate_global": {route: bucket.rate for route, bucket in self.global_buckets.items()},
+            "rate_client": {route: {"rate": buckets.rate, "clients": len(buckets)}
+                            for route, buckets in self.client_buckets.items()},
+            "concurrency": {route: {"limit": limiter.limit, "active": limiter.active, "waiting": limiter.waiting}
+                            for route, limiter in self.limiters.items()},
+        }
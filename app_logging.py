@@ -0,0 +1,173 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+
+from flask import has_request_context, request
+
+# Structured, non-blocking logging. Request threads only put records on a
+# bounded in-memory queue; a QueueListener thread formats them as JSON lines
+# and writes them out. Records are dropped (and counted) rather than blocking
+# when the queue is full.
+
+REDACTED = '***'
+
+_dropped = 0
+
+
+class EventLogger:
+    """Thin wrapper so call sites read ``log.info("event_name", key=value)``."""
+
+    def __init__(self, name):
+        self._logger = logging.getLogger(name)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, exc_info=False, **fields):
+        self._log(logging.ERROR, event, fields, exc_info)
+
+    def is_debug(self):
+        return self._logger.isEnabledFor(logging.DEBUG)
+
+    def _log(self, level, event, fields, exc_info=False):
+        # Checked first so disabled levels cost almost nothing
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, exc_info=exc_info, extra={"fields": fields}, stacklevel=3)
+
+
+def get_logger(name='attendify'):
+    return EventLogger(name)
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, redact_fields):
+        super().__init__()
+        self.redact_fields = {field.lower() for field in redact_fields}
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        route = getattr(record, 'route', None)
+        if route:
+            entry["route"] = route
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(self.redact(fields))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+    def redact(self, value):
+        if isinstance(value, dict):
+            return {key: REDACTED if str(key).lower() in self.redact_fields else self.redact(item)
+                    for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.redact(item) for item in value]
+        return value
+
+
+class RouteSampler(logging.Filter):
+    # Tags records with the Flask endpoint and keeps only a sampled share of
+    # routine records per route; warnings and errors always pass.
+    def __init__(self, rates, default_rate):
+        super().__init__()
+        self.rates = rates
+        self.default_rate = default_rate
+
+    def filter(self, record):
+        route = request.endpoint if has_request_context() else None
+        record.route = route
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(route, self.default_rate)
+        return rate >= 1 or random.random() < rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only snapshot the fields here
+        if isinstance(getattr(record, 'fields', None), dict):
+            record.fields = dict(record.fields)
+        return record
+
+    def enqueue(self, record):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+
+def parse_sample_rates(spec):
+    # "checkin=0.1,check_out=0.1" -> {"checkin": 0.1, "check_out": 0.1}
+    rates = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            route, rate = item.split('=', 1)
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(app):
+    config = app.config
+    level = getattr(logging, str(config.get('LOG_LEVEL', 'INFO')).upper(), logging.INFO)
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter(config.get('LOG_REDACT_FIELDS', 'password').split(',')))
+
+    log_queue = queue.Queue(maxsize=config.get('LOG_QUEUE_SIZE', 10000))
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RouteSampler(parse_sample_rates(config.get('LOG_SAMPLE_RATES')),
+                                   config.get('LOG_DEFAULT_SAMPLE_RATE', 1.0)))
+
+    logger = logging.getLogger('attendify')
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    atexit.register(listener.stop)
+
+    def _restart_in_child():
+        # A forked worker inherits the queue but not the listener thread
+        handler.queue = listener.queue = queue.Queue(maxsize=log_queue.maxsize)
+        listener._thread = None
+        listener.start()
+    os.register_at_fork(after_in_child=_restart_in_child)
+
+    if config.get('LOG_REQUESTS', True):
+        access_log = get_logger('attendify.access')
+
+        @app.before_request
+        def _start_timer():
+            request.environ['attendify.start'] = time.perf_counter()
+
+        @app.after_request
+        def _log_request(response):
+            started = request.environ.get('attendify.start')
+            duration_ms = round((time.perf_counter() - started) * 1000, 2) if started else None
+            access_log.info("request", method=request.method, path=request.path,
+                            status=response.status_code, duration_ms=duration_ms)
+            return response
+
+    return listener
+
+
+def dropped_count():
+    return _dropped
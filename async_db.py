@@ -0,0 +1,184 @@
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+# asyncio counterpart of db_pool.MySQLPool for attendify_async.py.
+#
+# Connections come from an aiomysql pool opened before the app starts
+# serving. They run with autocommit on, because aiomysql drops a connection
+# that is handed back mid-transaction. Writes therefore go through
+# ``transaction()``, which issues BEGIN/COMMIT itself. With SQLITE_STANDIN
+# set, the same interface is served by sqlite_standin connections. Each of
+# those connections has its own thread, so a writer waiting on SQLite's lock
+# can never starve the lock holder of a thread to commit on.
+
+
+class AsyncMySQLPool:
+    def __init__(self, app=None):
+        self.pool = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.config = app.config
+        app.before_serving(self.open)
+        app.after_serving(self.close)
+        app.extensions['async_mysql'] = self
+
+    async def open(self):
+        config = self.config
+        if config.get('SQLITE_STANDIN'):
+            self.pool = _ThreadedPool(config['SQLITE_STANDIN'], config.get('MYSQL_POOL_SIZE', 10))
+            return
+        import aiomysql
+
+        self.pool = await aiomysql.create_pool(
+            host=config['MYSQL_HOST'],
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD'],
+            db=config['MYSQL_DB'],
+            port=config['MYSQL_PORT'],
+            connect_timeout=config.get('MYSQL_CONNECT_TIMEOUT', 10),
+            minsize=1,
+            maxsize=config.get('MYSQL_POOL_SIZE', 10),
+            pool_recycle=config.get('MYSQL_POOL_MAX_LIFETIME', 1800),
+            autocommit=True,
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    @contextlib.asynccontextmanager
+    async def cursor(self):
+        # Autocommit cursor for reads and single statements
+        async with self.pool.acquire() as conn:
+            cur = await conn.cursor()
+            try:
+                yield cur
+            finally:
+                await cur.close()
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        # Cursor whose statements commit together, or roll back if the block raises
+        async with self.pool.acquire() as conn:
+            await conn.begin()
+            cur = await conn.cursor()
+            try:
+                yield cur
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+            finally:
+                await cur.close()
+
+    async def ping(self):
+        async with self.pool.acquire() as conn:
+            await conn.ping(reconnect=False)
+
+    def stats(self):
+        pool = self.pool
+        if pool is None:
+            return {}
+        return {"size": pool.size, "idle": pool.freesize, "max_size": pool.maxsize}
+
+
+class _ThreadedCursor:
+    def __init__(self, cursor, run):
+        self._cursor = cursor
+        self._run = run
+
+    async def execute(self, sql, params=()):
+        return await self._run(self._cursor.execute, sql, params)
+
+    async def executemany(self, sql, seq_of_params):
+        return await self._run(self._cursor.executemany, sql, seq_of_params)
+
+    async def fetchone(self):
+        return await self._run(self._cursor.fetchone)
+
+    async def fetchall(self):
+        return await self._run(self._cursor.fetchall)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    async def close(self):
+        await self._run(self._cursor.close)
+
+
+class _ThreadedConnection:
+    def __init__(self, connect):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-standin')
+        self._conn = None
+        self._connect = connect
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def open(self):
+        self._conn = await self._run(self._connect)
+        return self
+
+    async def cursor(self):
+        return _ThreadedCursor(await self._run(self._conn.cursor), self._run)
+
+    async def begin(self):
+        # sqlite3 opens the transaction implicitly on the first write
+        pass
+
+    async def commit(self):
+        await self._run(self._conn.commit)
+
+    async def rollback(self):
+        await self._run(self._conn.rollback)
+
+    async def ping(self, reconnect=False):
+        await self._run(self._conn.ping)
+
+    def close(self):
+        self._executor.submit(self._conn.close)
+        self._executor.shutdown(wait=False)
+
+
+class _ThreadedPool:
+    # Minimal aiomysql.Pool look-alike over sqlite_standin connections
+    def __init__(self, path, max_size):
+        from sqlite_standin import connect_factory
+
+        self._connect = connect_factory(path)
+        self.maxsize = max_size
+        self.size = 0
+        self._idle = asyncio.Queue()
+
+    @property
+    def freesize(self):
+        return self._idle.qsize()
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        if self._idle.empty() and self.size < self.maxsize:
+            self.size += 1
+            conn = await _ThreadedConnection(self._connect).open()
+        else:
+            conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+    async def wait_closed(self):
+        pass
@@ -0,0 +1,112 @@
+import datetime
+import os
+
+import attendance_rollups
+
+# Attendance statements and batch helpers shared by attendify.py (WSGI) and
+# attendify_async.py (ASGI). Writers take a list of (empid, date, time)
+# tuples, apply them to the attendance_daily rows they touch and leave
+# committing to the caller.
+
+# Largest number of swipes accepted in one batch request
+MAX_ATTENDANCE_BATCH = int(os.getenv('MAX_ATTENDANCE_BATCH', 1000))
+
+# Insert or update checkin time for the employee on that date
+CHECKIN_UPSERT = """
+    INSERT INTO attendance (empid, checkinDate, checkinTime)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE checkinTime = VALUES(checkinTime)
+"""
+# Same for the checkout time, on the (empid, checkoutDate) unique key
+CHECKOUT_UPSERT = """
+    INSERT INTO attendance (empid, checkoutDate, checkoutTime)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE checkoutTime = VALUES(checkoutTime)
+"""
+COFFEE_BREAK_INSERT = """
+    INSERT INTO schedule (start_coffee_break, break_date, empid)
+    VALUES (%s, %s, %s)
+"""
+
+
+def swipe_error(empid, date, time):
+    # Why MySQL would reject this (empid, date, time) swipe, None if it wouldn't.
+    # Write-behind journals rows before they reach MySQL, so they are checked here.
+    if not all([empid, date, time]):
+        return "Missing required fields"
+    try:
+        int(empid)
+        datetime.date.fromisoformat(str(date))
+        datetime.time.fromisoformat(str(time))
+    except (TypeError, ValueError):
+        return "empid must be a number, date YYYY-MM-DD and time HH:MM[:SS]"
+    return None
+
+
+def parse_attendance_batch(data, allowed=None):
+    # Split a batch payload into valid (index, empid, date, time) rows and per-record results.
+    # allowed(empid) rejects records the caller may not write for.
+    records = data.get('records') if isinstance(data, dict) else data
+    if not isinstance(records, list) or not records:
+        return None, None, "Expected a non-empty array of {empid, date, time} records"
+    if len(records) > MAX_ATTENDANCE_BATCH:
+        return None, None, f"Batch too large (max {MAX_ATTENDANCE_BATCH} records)"
+
+    rows = []
+    results = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            results.append({"index": index, "status": "error", "error": "Record must be an object"})
+            continue
+        empid = record.get('empid')
+        date = record.get('date')
+        time = record.get('time')
+        error = swipe_error(empid, date, time)
+        if error:
+            results.append({"index": index, "empid": empid, "status": "error", "error": error})
+            continue
+        if allowed is not None and not allowed(empid):
+            results.append({"index": index, "empid": empid, "status": "error", "error": "Forbidden"})
+            continue
+        rows.append((index, empid, date, time))
+        results.append({"index": index, "empid": empid, "status": "saved"})
+    return rows, results, None
+
+
+def batch_body(rows, results):
+    saved = len(rows)
+    return {"saved": saved, "failed": len(results) - saved, "results": results}, 201 if saved else 400
+
+
+def latest_checkouts(rows):
+    # Later swipes for the same employee and day win, as with repeated single check-outs
+    latest = {}
+    for empid, date, time in rows:
+        latest[(empid, date)] = time
+    return latest
+
+
+def checkout_params(latest):
+    return [(empid, date, time) for (empid, date), time in latest.items()]
+
+
+def coffee_break_params(rows):
+    return [(time, date, empid) for empid, date, time in rows]
+
+
+def write_checkins(cur, rows):
+    # Multi-row upsert on the (empid, checkinDate) unique key
+    cur.executemany(CHECKIN_UPSERT, rows)
+    attendance_rollups.apply(cur, 'checkin', rows)
+
+
+def write_checkouts(cur, rows):
+    # Multi-row upsert on the (empid, checkoutDate) unique key
+    latest = latest_checkouts(rows)
+    cur.executemany(CHECKOUT_UPSERT, checkout_params(latest))
+    attendance_rollups.apply(cur, 'checkout', checkout_params(latest))
+
+
+def write_coffee_breaks(cur, rows):
+    cur.executemany(COFFEE_BREAK_INSERT, coffee_break_params(rows))
+    attendance_rollups.apply(cur, 'coffee_break', rows)
@@ -0,0 +1,238 @@
+import datetime
+import os
+
+import click
+from flask.cli import AppGroup
+
+import changes
+
+# One row per employee and day: first check-in, last check-out, coffee-break
+# and worked minutes. The attendance writers apply each swipe to its
+# (empid, day) row inside their own transactions, one upsert per swipe, so
+# /api/attendance-report reads a month as one index range instead of
+# aggregating raw attendance rows. `flask attendance-rollups rebuild`
+# recomputes rows from the source tables instead.
+#
+# schedule only records when a coffee break starts, so every break counts
+# as COFFEE_BREAK_MINUTES.
+#
+# apply() also logs each day it changes to change_log for /api/sync.
+
+COFFEE_BREAK_MINUTES = int(os.getenv('COFFEE_BREAK_MINUTES', 15))
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS attendance_daily (
+        empid INT NOT NULL,
+        day DATE NOT NULL,
+        faculty VARCHAR(100),
+        first_checkin TIME,
+        last_checkout TIME,
+        coffee_breaks INT NOT NULL DEFAULT 0,
+        coffee_break_minutes INT NOT NULL DEFAULT 0,
+        worked_minutes INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (empid, day)
+    )
+"""
+CREATE_INDEXES = [
+    "CREATE INDEX idx_attendance_daily_day ON attendance_daily (day)",
+    "CREATE INDEX idx_attendance_daily_faculty ON attendance_daily (faculty, day)",
+]
+
+UPSERT = """
+    INSERT INTO attendance_daily
+        (empid, day, faculty, first_checkin, last_checkout, coffee_breaks, coffee_break_minutes, worked_minutes)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        faculty = VALUES(faculty),
+        first_checkin = VALUES(first_checkin),
+        last_checkout = VALUES(last_checkout),
+        coffee_breaks = VALUES(coffee_breaks),
+        coffee_break_minutes = VALUES(coffee_break_minutes),
+        worked_minutes = VALUES(worked_minutes)
+"""
+
+
+def _worked(checkin, checkout, coffee_minutes):
+    # worked_minutes as build_rows() computes it, over column expressions
+    span = f"(TIME_TO_SEC({checkout}) DIV 60 - TIME_TO_SEC({checkin}) DIV 60)"
+    return f"CASE WHEN {span} > {coffee_minutes} THEN {span} - {coffee_minutes} ELSE 0 END"
+
+
+# One swipe applied to its day's row. worked_minutes comes first in each
+# UPDATE list, so the bare columns it reads are still the old values in
+# MySQL (which assigns left to right) as well as in SQLite. A check-in or
+# check-out replaces the day's time, as the attendance upserts do.
+CHECKIN_DELTA = f"""
+    INSERT INTO attendance_daily (empid, day, faculty, first_checkin)
+    VALUES (%s, %s, (SELECT faculty FROM Employee WHERE empid = %s), %s)
+    ON DUPLICATE KEY UPDATE
+        worked_minutes = {_worked('VALUES(first_checkin)', 'last_checkout', 'coffee_break_minutes')},
+        first_checkin = VALUES(first_checkin)
+"""
+CHECKOUT_DELTA = f"""
+    INSERT INTO attendance_daily (empid, day, faculty, last_checkout)
+    VALUES (%s, %s, (SELECT faculty FROM Employee WHERE empid = %s), %s)
+    ON DUPLICATE KEY UPDATE
+        worked_minutes = {_worked('first_checkin', 'VALUES(last_checkout)', 'coffee_break_minutes')},
+        last_checkout = VALUES(last_checkout)
+"""
+COFFEE_BREAK_DELTA = f"""
+    INSERT INTO attendance_daily (empid, day, faculty, coffee_breaks, coffee_break_minutes)
+    VALUES (%s, %s, (SELECT faculty FROM Employee WHERE empid = %s), 1, %s)
+    ON DUPLICATE KEY UPDATE
+        worked_minutes = {_worked('first_checkin', 'last_checkout',
+                                  '(coffee_break_minutes + VALUES(coffee_break_minutes))')},
+        coffee_breaks = coffee_breaks + 1,
+        coffee_break_minutes = coffee_break_minutes + VALUES(coffee_break_minutes)
+"""
+SET_FACULTY = "UPDATE attendance_daily SET faculty = %s WHERE empid = %s"
+
+DELTAS = {
+    'checkin': CHECKIN_DELTA,
+    'checkout': CHECKOUT_DELTA,
+    'coffee_break': COFFEE_BREAK_DELTA,
+}
+
+
+def delta(kind, rows):
+    # (sql, params) applying (empid, date, time) swipes of one kind to attendance_daily
+    if kind == 'coffee_break':
+        return DELTAS[kind], [(empid, date, empid, COFFEE_BREAK_MINUTES) for empid, date, _ in rows]
+    # HH:MM, the precision refresh() stores
+    return DELTAS[kind], [(empid, date, empid, str(time)[:5]) for empid, date, time in rows]
+
+
+def apply(cur, kind, rows):
+    # Swipes already written to attendance/schedule; one upsert each plus their change_log entries
+    sql, params = delta(kind, rows)
+    if not params:
+        return 0
+    cur.executemany(sql, params)
+    changes.record_days(cur, [(empid, date) for empid, date, _ in rows])
+    return len(params)
+
+
+def _in_list(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def source_queries(keys):
+    # The four (sql, params) reads refresh() needs for a set of (empid, day) keys
+    empids = sorted({str(empid) for empid, _ in keys})
+    days = sorted({str(day) for _, day in keys})
+    by_day = days + empids
+    return [
+        ("SELECT empid, checkinDate, MIN(checkinTime) FROM attendance "
+         f"WHERE checkinDate IN ({_in_list(days)}) AND empid IN ({_in_list(empids)}) "
+         "GROUP BY empid, checkinDate", by_day),
+        ("SELECT empid, checkoutDate, MAX(checkoutTime) FROM attendance "
+         f"WHERE checkoutDate IN ({_in_list(days)}) AND empid IN ({_in_list(empids)}) "
+         "GROUP BY empid, checkoutDate", by_day),
+        ("SELECT empid, break_date, COUNT(*) FROM schedule "
+         f"WHERE break_date IN ({_in_list(days)}) AND empid IN ({_in_list(empids)}) "
+         "GROUP BY empid, break_date", by_day),
+        (f"SELECT empid, faculty FROM Employee WHERE empid IN ({_in_list(empids)})", empids),
+    ]
+
+
+def minutes(value):
+    # TIME values arrive as timedelta from PyMySQL and as 'HH:MM[:SS]' strings elsewhere
+    if value is None:
+        return None
+    if isinstance(value, datetime.timedelta):
+        return int(value.total_seconds() // 60)
+    if isinstance(value, datetime.time):
+        return value.hour * 60 + value.minute
+    hours, mins = str(value).split(':')[:2]
+    return int(hours) * 60 + int(mins)
+
+
+def _clock(total):
+    return None if total is None else f"{total // 60:02d}:{total % 60:02d}"
+
+
+def build_rows(keys, checkins, checkouts, breaks, faculties):
+    # UPSERT parameter tuples from the results of source_queries(), in the same order
+    first = {(str(row[0]), str(row[1])): minutes(row[2]) for row in checkins}
+    last = {(str(row[0]), str(row[1])): minutes(row[2]) for row in checkouts}
+    counts = {(str(row[0]), str(row[1])): int(row[2]) for row in breaks}
+    faculty = {str(row[0]): row[1] for row in faculties}
+
+    rows = []
+    for empid, day in sorted({(str(empid), str(day)) for empid, day in keys}):
+        checkin = first.get((empid, day))
+        checkout = last.get((empid, day))
+        coffee_breaks = counts.get((empid, day), 0)
+        coffee_minutes = coffee_breaks * COFFEE_BREAK_MINUTES
+        worked = 0
+        if checkin is not None and checkout is not None and checkout > checkin:
+            worked = max(0, checkout - checkin - coffee_minutes)
+        rows.append((empid, day, faculty.get(empid), _clock(checkin), _clock(checkout),
+                     coffee_breaks, coffee_minutes, worked))
+    return rows
+
+
+def refresh(cur, keys):
+    # Recompute the rollup rows for these (empid, day) keys from the source tables.
+    # Used by rebuild(), so nothing goes to change_log.
+    keys = [(empid, day) for empid, day in keys if empid and day]
+    if not keys:
+        return 0
+    results = []
+    for sql, params in source_queries(keys):
+        cur.execute(sql, params)
+        results.append(cur.fetchall())
+    rows = build_rows(keys, *results)
+    cur.executemany(UPSERT, rows)
+    return len(rows)
+
+
+def set_faculty(cur, empid, faculty):
+    cur.execute(SET_FACULTY, (faculty, empid))
+
+
+def month_range(month):
+    # 'YYYY-MM' -> ('YYYY-MM-01', first day of the next month); ValueError if malformed
+    start = datetime.datetime.strptime(month, '%Y-%m').date()
+    end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return start.isoformat(), end.isoformat()
+
+
+def _source_keys(cur, since=None):
+    keys = set()
+    for sql in ("SELECT DISTINCT empid, checkinDate FROM attendance WHERE checkinDate IS NOT NULL",
+                "SELECT DISTINCT empid, checkoutDate FROM attendance WHERE checkoutDate IS NOT NULL",
+                "SELECT DISTINCT empid, break_date FROM schedule WHERE break_date IS NOT NULL"):
+        cur.execute(sql)
+        keys.update((str(row[0]), str(row[1])) for row in cur.fetchall())
+    if since:
+        keys = {key for key in keys if key[1] >= since}
+    return sorted(keys)
+
+
+def rebuild(cur, since=None, chunk_size=500):
+    cur.execute(CREATE_TABLE)
+    if since:
+        cur.execute("DELETE FROM attendance_daily WHERE day >= %s", (since,))
+    else:
+        cur.execute("DELETE FROM attendance_daily")
+    keys = _source_keys(cur, since)
+    for start in range(0, len(keys), chunk_size):
+        refresh(cur, keys[start:start + chunk_size])
+    return len(keys)
+
+
+def register_commands(app, mysql):
+    group = AppGroup('attendance-rollups', help='Maintain the attendance_daily rollup table.')
+
+    @group.command('rebuild')
+    @click.option('--since', help='Only rebuild days on or after this date (YYYY-MM-DD).')
+    def rebuild_command(since):
+        """Recompute attendance_daily from attendance and schedule."""
+        cur = mysql.connection.cursor()
+        count = rebuild(cur, since)
+        mysql.connection.commit()
+        cur.close()
+        click.echo(f"Rebuilt attendance_daily with {count} rows")
+
+    app.cli.add_command(group)
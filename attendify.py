@@ -1,7 +1,36 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-from flask_mysqldb import MySQL
+from werkzeug.middleware.proxy_fix import ProxyFix
+from db_pool import MySQLPool, stream_rows
+from write_behind import WriteBehind
+from cache import make_cache
+import idempotency
+from idempotency import idempotent
+from attendance import (CHECKIN_UPSERT, CHECKOUT_UPSERT, COFFEE_BREAK_INSERT, batch_body,
+                        parse_attendance_batch, swipe_error, write_checkins, write_checkouts,
+                        write_coffee_breaks)
+import attendance_rollups
+import changes
+import export
+from events import EventBus
+import leave_counters
+from leave_types import LEAVE_TYPES
+import migrations
+from availability import AvailabilityIndex
+from meetings import MeetingIndex, clock, free_slots, parse_clock
+import versions
+from tokens import TokenAuth, TokenError
+from app_logging import dropped_count, get_logger, setup_logging
+import metrics
+import health
+import serialization
+from admission import Admission
+import photos
+import queries
+import click
+import datetime
+import itertools
 import os
 import traceback
 
@@ -11,26 +40,206 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
+# Proxies in front of the app (1 on Railway) whose X-Forwarded-For entry is trusted as the
+# client address; 0 uses the connecting address and ignores the header
+app.config['PROXY_FIX_HOPS'] = int(os.getenv('PROXY_FIX_HOPS', 0))
+if app.config['PROXY_FIX_HOPS']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'])
+
 app.config['MYSQL_HOST'] = os.getenv('MYSQL_HOST')
 app.config['MYSQL_USER'] = os.getenv('MYSQL_USER')
 app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD')
 app.config['MYSQL_DB'] = os.getenv('MYSQL_DB')
 app.config['MYSQL_PORT'] = int(os.getenv('MYSQL_PORT', 3306))
 
-mysql = MySQL(app)
+# Connection pool settings (sizes in connections, times in seconds)
+app.config['MYSQL_POOL_SIZE'] = int(os.getenv('MYSQL_POOL_SIZE', 10))
+app.config['MYSQL_POOL_MAX_LIFETIME'] = int(os.getenv('MYSQL_POOL_MAX_LIFETIME', 1800))
+app.config['MYSQL_POOL_TIMEOUT'] = float(os.getenv('MYSQL_POOL_TIMEOUT', 5))
+app.config['MYSQL_POOL_PING_INTERVAL'] = float(os.getenv('MYSQL_POOL_PING_INTERVAL', 5))
+app.config['SQLITE_STANDIN'] = os.getenv('SQLITE_STANDIN')
+
+# Write-behind mode: acknowledge attendance/coffee-break writes once journaled locally
+app.config['WRITE_BEHIND'] = os.getenv('WRITE_BEHIND', '0') == '1'
+app.config['WRITE_BEHIND_DIR'] = os.getenv('WRITE_BEHIND_DIR', 'journal')
+app.config['WRITE_BEHIND_FLUSH_INTERVAL'] = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', 0.5))
+app.config['WRITE_BEHIND_BATCH_SIZE'] = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 500))
+
+# Employee profile cache: CACHE_BACKEND=memory (per process) or redis (shared)
+app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+app.config['CACHE_TTL'] = int(os.getenv('CACHE_TTL', 300))
+app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+
+# Session tokens issued by /api/login. AUTH_REQUIRED=1 rejects requests without one;
+# AUTH_MANAGER_ROLES lists the occupations allowed to act for other employees.
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+app.config['AUTH_TOKEN_MAX_AGE'] = int(os.getenv('AUTH_TOKEN_MAX_AGE', 8 * 3600))
+app.config['AUTH_REQUIRED'] = os.getenv('AUTH_REQUIRED', '0') == '1'
+app.config['AUTH_MANAGER_ROLES'] = os.getenv('AUTH_MANAGER_ROLES', 'manager,admin,hr')
+
+# Structured logging: LOG_LEVEL=DEBUG also logs (redacted) request payloads.
+# LOG_SAMPLE_RATES keeps only a share of routine records per route, e.g. "checkin=0.05".
+app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO')
+app.config['LOG_SAMPLE_RATES'] = os.getenv('LOG_SAMPLE_RATES', '')
+app.config['LOG_DEFAULT_SAMPLE_RATE'] = float(os.getenv('LOG_DEFAULT_SAMPLE_RATE', 1.0))
+app.config['LOG_REDACT_FIELDS'] = os.getenv('LOG_REDACT_FIELDS', 'password,token,authorization,secret_key')
+app.config['LOG_REQUESTS'] = os.getenv('LOG_REQUESTS', '1') == '1'
+
+setup_logging(app)
+log = get_logger()
+
+# Prometheus metrics at /metrics; SQL statements slower than METRICS_SLOW_QUERY_MS are logged
+app.config['METRICS_SQL'] = os.getenv('METRICS_SQL', '1') == '1'
+app.config['METRICS_SLOW_QUERY_MS'] = float(os.getenv('METRICS_SLOW_QUERY_MS', 500))
+metrics.init_app(app)
+
+# JSON responses (orjson when installed); JSON_DATES=iso sends dates as YYYY-MM-DD instead of HTTP dates.
+# Bodies of at least COMPRESS_MIN_SIZE bytes are brotli/gzip encoded when the client accepts it.
+app.config['JSON_DATES'] = os.getenv('JSON_DATES', 'http')
+app.config['COMPRESS'] = os.getenv('COMPRESS', '1') == '1'
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_LEVEL'] = int(os.getenv('COMPRESS_LEVEL', 6))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+serialization.init_app(app)
+
+mysql = MySQLPool(app)
+auth = TokenAuth(app)
+
+# Admission control, per Flask endpoint and worker: RATE_LIMIT_GLOBAL / RATE_LIMIT_CLIENT are
+# requests per second ("checkin=50,check_out=50"), CONCURRENCY_LIMITS caps requests in flight.
+# Excess requests get 429 (rate) or 503 (concurrency) with Retry-After.
+app.config['RATE_LIMIT_GLOBAL'] = os.getenv('RATE_LIMIT_GLOBAL', '')
+app.config['RATE_LIMIT_CLIENT'] = os.getenv('RATE_LIMIT_CLIENT', '')
+app.config['RATE_LIMIT_BURST'] = float(os.getenv('RATE_LIMIT_BURST', 2))
+app.config['CONCURRENCY_LIMITS'] = os.getenv('CONCURRENCY_LIMITS', 'checkin_batch=2,checkout_batch=2')
+app.config['CONCURRENCY_QUEUE'] = int(os.getenv('CONCURRENCY_QUEUE', 16))
+app.config['CONCURRENCY_QUEUE_TIMEOUT'] = float(os.getenv('CONCURRENCY_QUEUE_TIMEOUT', 2))
+app.config['CONCURRENCY_RETRY_AFTER'] = int(os.getenv('CONCURRENCY_RETRY_AFTER', 1))
+
+
+def admission_client():
+    # The verified token's employee, else the caller's address. Never the body's
+    # empid: anyone could send someone else's and spend that employee's bucket.
+    try:
+        payload = auth.current()
+    except TokenError:
+        payload = None
+    if payload:
+        return f"emp:{payload['empid']}"
+    return request.remote_addr
+
+
+def admission_exempt():
+    # A retry whose response is already stored is replayed without running the
+    # view, so it spends no rate-limit token and takes no concurrency slot
+    try:
+        payload = auth.current()
+    except TokenError:
+        return False
+    return idempotency.replayable(idempotency_store, payload['empid'] if payload else '')
+
+
+admission = Admission(app, admission_client, admission_exempt)
+employee_cache = make_cache(app.config, 'employee')
+
+# Responses kept for Idempotency-Key replays: IDEMPOTENCY_STORE=mysql (claimed in the
+# write's own transaction) or cache (the employee cache's CACHE_BACKEND)
+app.config['IDEMPOTENCY_STORE'] = os.getenv('IDEMPOTENCY_STORE', 'mysql')
+app.config['IDEMPOTENCY_TTL'] = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))
+app.config['IDEMPOTENCY_MAX_KEYS'] = int(os.getenv('IDEMPOTENCY_MAX_KEYS', 20000))
+if app.config['IDEMPOTENCY_STORE'] == 'cache':
+    # A per-process store lets a retry that lands on another worker write twice
+    if app.config['CACHE_BACKEND'] != 'redis' and int(os.getenv('WEB_CONCURRENCY', 1)) > 1:
+        raise RuntimeError("IDEMPOTENCY_STORE=cache needs CACHE_BACKEND=redis when WEB_CONCURRENCY > 1")
+    idempotency_store = make_cache(app.config, 'idempotency', ttl=app.config['IDEMPOTENCY_TTL'],
+                                   max_entries=app.config['IDEMPOTENCY_MAX_KEYS'])
+else:
+    idempotency_store = idempotency.MySQLStore(mysql, ttl=app.config['IDEMPOTENCY_TTL'])
+write_behind = WriteBehind(app, mysql)
+
+# /api/employee-photo: thumbnail sizes (px) and their on-disk cache, largest upload, browser cache lifetime
+app.config['PHOTO_SIZES'] = os.getenv('PHOTO_SIZES', '64,128,256')
+app.config['PHOTO_CACHE_DIR'] = os.getenv('PHOTO_CACHE_DIR', 'photo_cache')
+app.config['PHOTO_CACHE_MAX_BYTES'] = int(os.getenv('PHOTO_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+app.config['PHOTO_MAX_BYTES'] = int(os.getenv('PHOTO_MAX_BYTES', 5 * 1024 * 1024))
+app.config['PHOTO_MAX_AGE'] = int(os.getenv('PHOTO_MAX_AGE', 3600))
+app.config['PHOTO_CHUNK_SIZE'] = int(os.getenv('PHOTO_CHUNK_SIZE', 64 * 1024))
+PHOTO_SIZES = sorted(int(size) for size in app.config['PHOTO_SIZES'].split(',') if size.strip())
+thumbnails = photos.ThumbnailCache(app.config['PHOTO_CACHE_DIR'], app.config['PHOTO_CACHE_MAX_BYTES'])
+
+# /api/availability: days of check-ins held in memory, how often they are re-read, widest range
+app.config['AVAILABILITY_PRESENCE_DAYS'] = int(os.getenv('AVAILABILITY_PRESENCE_DAYS', 1))
+app.config['AVAILABILITY_PRESENCE_TTL'] = float(os.getenv('AVAILABILITY_PRESENCE_TTL', 30))
+app.config['AVAILABILITY_MAX_DAYS'] = int(os.getenv('AVAILABILITY_MAX_DAYS', 92))
+availability = AvailabilityIndex(mysql, app.config['AVAILABILITY_PRESENCE_DAYS'],
+                                 app.config['AVAILABILITY_PRESENCE_TTL'])
+
+# Meeting conflict checks and /api/meetings/free-slots: days of bookings held in memory,
+# and the working day free slots are reported within unless ?from=/&to= are given
+app.config['MEETINGS_INDEX_DAYS'] = int(os.getenv('MEETINGS_INDEX_DAYS', 366))
+app.config['MEETINGS_DAY_START'] = os.getenv('MEETINGS_DAY_START', '08:00')
+app.config['MEETINGS_DAY_END'] = os.getenv('MEETINGS_DAY_END', '18:00')
+meeting_index = MeetingIndex(mysql, app.config['MEETINGS_INDEX_DAYS'])
+
+# /api/sync: changes per page, how old a change must be before the cursor moves past it,
+# and how many days `flask changes compact` keeps
+app.config['SYNC_PAGE_SIZE'] = int(os.getenv('SYNC_PAGE_SIZE', 1000))
+app.config['SYNC_SETTLE_SECONDS'] = float(os.getenv('SYNC_SETTLE_SECONDS', 2))
+app.config['SYNC_RETENTION_DAYS'] = int(os.getenv('SYNC_RETENTION_DAYS', 30))
+
+# /api/events: each open stream holds a gthread worker thread, so keep EVENTS_MAX_CONNECTIONS
+# below GUNICORN_THREADS. Streams end after EVENTS_STREAM_SECONDS and the client reconnects.
+app.config['EVENTS_MAX_CONNECTIONS'] = int(os.getenv('EVENTS_MAX_CONNECTIONS',
+                                                     max(1, int(os.getenv('GUNICORN_THREADS', 4)) // 2)))
+app.config['EVENTS_HEARTBEAT'] = float(os.getenv('EVENTS_HEARTBEAT', 15))
+app.config['EVENTS_STREAM_SECONDS'] = float(os.getenv('EVENTS_STREAM_SECONDS', 300))
+app.config['EVENTS_POLL_INTERVAL'] = float(os.getenv('EVENTS_POLL_INTERVAL', 1))
+app.config['EVENTS_QUEUE'] = int(os.getenv('EVENTS_QUEUE', 256))
+event_bus = EventBus(mysql, app.config['EVENTS_MAX_CONNECTIONS'], app.config['EVENTS_POLL_INTERVAL'],
+                     app.config['SYNC_SETTLE_SECONDS'], app.config['EVENTS_QUEUE'])
+
+# /api/export: longest range, rows fetched from the server-side cursor at a time, bytes per written chunk
+app.config['EXPORT_MAX_DAYS'] = int(os.getenv('EXPORT_MAX_DAYS', 366))
+app.config['EXPORT_FETCH_ROWS'] = int(os.getenv('EXPORT_FETCH_ROWS', 1000))
+app.config['EXPORT_CHUNK_BYTES'] = int(os.getenv('EXPORT_CHUNK_BYTES', 64 * 1024))
+leave_counters.register_commands(app, mysql)
+attendance_rollups.register_commands(app, mysql)
+migrations.register_commands(app, mysql)
+changes.register_commands(app, mysql)
+idempotency.register_commands(app, mysql)
+
+# /healthz and /readyz for the process manager / load balancer
+app.config['READINESS_DB_CHECK_INTERVAL'] = float(os.getenv('READINESS_DB_CHECK_INTERVAL', 10))
+health.init_app(app, mysql)
+
+metrics.registry.gauge('attendify_db_pool', 'Connection pool state and counters.',
+                       lambda: {(("stat", key),): value for key, value in mysql.pool.stats().items()})
+metrics.registry.gauge('attendify_employee_cache', 'Employee cache counters.',
+                       lambda: {(("stat", key),): value for key, value in employee_cache.stats().items()
+                                if isinstance(value, (int, float)) and not isinstance(value, bool)})
+metrics.registry.gauge('attendify_log_records_dropped', 'Log records dropped because the queue was full.',
+                       dropped_count)
+
+@app.cli.command('init-db')
+def init_db():
+    """Create or upgrade the schema (same as `db upgrade`)."""
+    cur = mysql.connection.cursor()
+    migrations.upgrade(cur, mysql.connection, echo=click.echo)
+    cur.close()
+    click.echo("Schema is up to date")
 
 @app.route('/')
 def home():
     return jsonify({"message": "Flask API is running!"})
 
 @app.route('/api/save-employee', methods=['POST'])
+@auth.protect(manager=True)
 def save_employee():
     try:
-        # STEP 1: Check if JSON was received
         data = request.json
-        print("🟡 Received data:", data)
+        log.debug("save_employee_received", payload=data)
 
-        # STEP 2: Print individual fields
         full_name = data.get('full_name')
         username = data.get('username')
         phone_number = data.get('phone_number')
@@ -38,86 +247,134 @@ def save_employee():
         password = data.get('password')
         occupation = data.get('occupation')
         faculty = data.get('faculty')
+        # Only a manager's token may hand out a role; it defaults to the occupation
+        role = data.get('role', occupation) if auth.caller_is_manager() else None
 
-        print(f"🟡 Parsed fields: Full Name: {full_name}, Username: {username}, Phone: {phone_number}, Email: {email}, Password: {password}, Occupation: {occupation}, Faculty: {faculty}")
-
-        # STEP 3: Execute insert
         cur = mysql.connection.cursor()
-        cur.execute("""
-            INSERT INTO Employee (full_name, username, phone_number, email, password, occupation, faculty)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (full_name, username, phone_number, email, password, occupation, faculty))
-
-        # STEP 4: Print number of affected rows
-        print("🟢 Row count after insert:", cur.rowcount)  # Should be 1
+        cur.execute(queries.EMPLOYEE_INSERT, (full_name, username, phone_number, email, password, occupation,
+                                              faculty, role))
 
-        # STEP 5: Commit and close
+        new_empid = cur.lastrowid
+        versions.bump(cur, 'Employee')
+        changes.record(cur, 'Employee', new_empid)
+        written = availability.employee_written(cur, new_empid)
         mysql.connection.commit()
+        availability.apply(written)
+        employee_cache.delete(new_empid)
         cur.close()
-        print("🟢 Insert successful and committed to DB")
-
-        # STEP 6: Optional - test select to confirm it exists in DB
-        cur2 = mysql.connection.cursor()
-        cur2.execute("SELECT * FROM Employee ORDER BY empid DESC LIMIT 1")
-        new_entry = cur2.fetchone()
-        print("🟢 Latest employee in DB:", new_entry)
-        cur2.close()
+        log.info("employee_saved", empid=new_empid)
 
         return jsonify({"message": "Employee added successfully"}), 201
 
     except Exception as e:
-        print("🔴 Error:", e)
+        log.error("save_employee_failed", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/test-db', methods=['GET'])
 def test_db():
     try:
         cur = mysql.connection.cursor()
-        cur.execute('SELECT DATABASE()')  # STEP 7: Check which DB you're connected to
+        cur.execute('SELECT DATABASE()')  # Check which DB you're connected to
         db_name = cur.fetchone()
-        print("🟡 Connected to database:", db_name)
+        log.debug("db_connected", database=db_name)
         cur.close()
         return jsonify({"status": "success", "message": "DB connected!", "database": db_name})
     except Exception as e:
-        print("🔴 DB connection error:", e)
+        log.error("db_connection_failed", exc_info=True)
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/pool-stats', methods=['GET'])
+def pool_stats():
+    return jsonify(mysql.pool.stats()), 200
+
+@app.route('/api/admission-stats', methods=['GET'])
+def admission_stats():
+    return jsonify(admission.stats()), 200
+
+@app.route('/api/write-behind-stats', methods=['GET'])
+def write_behind_stats():
+    return jsonify(write_behind.stats()), 200
+
 @app.route('/api/login', methods=['POST'])
 def login_employee():
     try:
         data = request.json
-        print("🔐 Received login data:", data)
+        log.debug("login_received", payload=data)
 
         username = data.get('username', '').strip()
         password = data.get('password', '').strip()
 
         cur = mysql.connection.cursor()
-        cur.execute("SELECT empid FROM Employee WHERE BINARY username = %s AND BINARY password = %s", (username, password))
+        cur.execute(queries.LOGIN, (username, password, username, password))
         result = cur.fetchone()
         cur.close()
 
         if result:
-            return jsonify({"success": True, "empid": result[0]})
+            token = auth.issue(result[0], result[1])
+            return jsonify({"success": True, "empid": result[0], "role": result[1],
+                            "token": token, "expires_in": auth.max_age})
         else:
             return jsonify({"success": False, "message": "Invalid credentials"}), 401
 
     except Exception as e:
-        print("🔴 Login error:", e)
+        log.error("login_failed", exc_info=True)
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/token/refresh', methods=['POST'])
+def refresh_token():
+    # Swap a still-valid token for a fresh one; the old one is revoked
+    try:
+        payload = auth.current()
+    except TokenError as e:
+        return jsonify({"success": False, "error": str(e)}), 401
+    if payload is None:
+        return jsonify({"success": False, "error": "Authorization token required"}), 401
+
+    auth.revoke(payload)
+    token = auth.issue(payload['empid'], payload['role'])
+    return jsonify({"success": True, "empid": payload['empid'], "role": payload['role'],
+                    "token": token, "expires_in": auth.max_age})
+
+@app.route('/api/logout', methods=['POST'])
+def logout():
+    try:
+        payload = auth.current()
+    except TokenError as e:
+        return jsonify({"success": False, "error": str(e)}), 401
+    if payload is not None:
+        auth.revoke(payload)
+    return jsonify({"success": True})
+
+EMPLOYEE_PROFILE_FIELDS = ["full_name", "username", "email", "phone_number", "occupation", "faculty"]
+
+def load_employee_profile(empid):
+    # Read-through: profiles come from employee_cache, MySQL only on a miss
+    profile = employee_cache.get(empid)
+    if profile is not None:
+        return profile
+
+    cur = mysql.connection.cursor()
+    cur.execute(queries.EMPLOYEE_PROFILE, (empid,))
+    row = cur.fetchone()
+    cur.close()
+
+    if not row:
+        return None
+    profile = dict(zip(EMPLOYEE_PROFILE_FIELDS, row))
+    employee_cache.set(empid, profile)
+    return profile
+
 @app.route('/api/get-employee/<int:empid>', methods=['GET'])
+@auth.protect(owner='empid')
 def get_employee(empid):
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT full_name, email FROM Employee WHERE empid = %s", (empid,))
-        result = cur.fetchone()
-        cur.close()
+        profile = load_employee_profile(empid)
 
-        if result:
+        if profile:
             return jsonify({
                 "success": True,
-                "full_name": result[0],
-                "email": result[1]
+                "full_name": profile["full_name"],
+                "email": profile["email"]
             }), 200
         else:
             return jsonify({"success": False, "message": "Employee not found"}), 404
@@ -125,38 +382,112 @@ def get_employee(empid):
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/get-employee-full/<int:empid>', methods=['GET'])
+@auth.protect(owner='empid')
 def get_employee_full(empid):
+    try:
+        profile = load_employee_profile(empid)
+
+        if profile:
+            return jsonify(profile)
+        else:
+            return jsonify({"error": "Employee not found"}), 404
+    except Exception as e:
+        log.error("get_employee_full_failed", empid=empid, exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify({"employee": employee_cache.stats(), "idempotency": idempotency_store.stats(),
+                    "photo_thumbnails": thumbnails.stats()}), 200
+
+@app.route('/api/employee-photo/<int:empid>', methods=['GET'])
+@auth.protect()
+def get_employee_photo(empid):
+    # ?size=<px> (one of PHOTO_SIZES) serves a JPEG thumbnail; without it the original is streamed
+    size = request.args.get('size', type=int)
+    if size is not None and size not in PHOTO_SIZES:
+        return jsonify({"error": f"size must be one of {PHOTO_SIZES}"}), 400
+    if photos.Image is None:
+        size = None
+
     try:
         cur = mysql.connection.cursor()
-        cur.execute("""
-            SELECT full_name, username, email, phone_number, occupation, faculty, empPhoto
-            FROM Employee
-            WHERE empid = %s
-        """, (empid,))
+        cur.execute(photos.HEAD_QUERY, (empid,))
         row = cur.fetchone()
         cur.close()
+        if not row or not row[1]:
+            return jsonify({"error": "Employee has no photo" if row else "Employee not found"}), 404
+        version = row[0]
+
+        tag = photos.etag(empid, version, size)
+        if request.if_none_match.contains(tag):
+            response = app.response_class(status=304)
+        elif size:
+            data = thumbnails.get(empid, version, size)
+            if data is None:
+                cur = mysql.connection.cursor()
+                original = photos.load(cur, empid, version)
+                cur.close()
+                if not original:
+                    return jsonify({"error": "Photo changed, retry"}), 409
+                data = photos.thumbnail(original, size)
+                thumbnails.put(empid, version, size, data)
+            response = Response(data, mimetype='image/jpeg')
+        else:
+            # One query for the whole value, then PHOTO_CHUNK_SIZE writes to the client
+            cur = mysql.connection.cursor()
+            data = photos.load(cur, empid, version)
+            cur.close()
+            if not data:
+                return jsonify({"error": "Photo changed, retry"}), 409
+            response = Response(photos.chunks(data, app.config['PHOTO_CHUNK_SIZE']),
+                                mimetype=photos.sniff_type(data) or 'application/octet-stream')
+            response.headers['Content-Length'] = str(len(data))
+
+        response.set_etag(tag)
+        response.headers['Cache-Control'] = f"private, max-age={app.config['PHOTO_MAX_AGE']}"
+        return response
+    except Exception as e:
+        log.error("get_employee_photo_failed", empid=empid, exc_info=True)
+        return jsonify({"error": str(e)}), 500
 
-        if row:
-            # Convert empPhoto (bytes) to base64
-            import base64
-            # empPhoto_base64 = base64.b64encode(row[6]).decode('utf-8') if row[6] else None
+@app.route('/api/employee-photo/<int:empid>', methods=['POST', 'PUT'])
+@auth.protect(owner='empid')
+def upload_employee_photo(empid):
+    # multipart/form-data with a "photo" file, or the image itself as the request body
+    limit = app.config['PHOTO_MAX_BYTES']
+    if (request.content_length or 0) > limit + 64 * 1024:
+        return jsonify({"error": f"Photo too large (max {limit} bytes)"}), 413
+    upload = request.files.get('photo')
+    data = upload.read() if upload else request.get_data()
+    if not data:
+        return jsonify({"error": "No photo uploaded"}), 400
+    if len(data) > limit:
+        return jsonify({"error": f"Photo too large (max {limit} bytes)"}), 413
+    if photos.sniff_type(data) is None:
+        return jsonify({"error": "Photo must be a JPEG, PNG, GIF or WebP image"}), 415
 
-            return jsonify({
-                "full_name": row[0],
-                "username": row[1],
-                "email": row[2],
-                "phone_number": row[3],
-                "occupation": row[4],
-                "faculty": row[5],
-                # "empPhoto": empPhoto_base64
-            })
-        else:
+    try:
+        cur = mysql.connection.cursor()
+        cur.execute(photos.UPLOAD, (data, len(data), empid))
+        if cur.rowcount == 0:
+            cur.close()
             return jsonify({"error": "Employee not found"}), 404
+        cur.execute(photos.HEAD_QUERY, (empid,))
+        version = cur.fetchone()[0]
+        changes.record(cur, 'Employee', empid)
+        mysql.connection.commit()
+        cur.close()
+        thumbnails.invalidate(empid)
+
+        return jsonify({"success": True, "photo_version": version, "photo_size": len(data)}), 200
     except Exception as e:
-        print("🔴 Error:", e)
+        log.error("upload_employee_photo_failed", empid=empid, exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/checkin', methods=['POST'])
+@auth.protect(owner='empid')
+@idempotent(idempotency_store)
 def checkin():
     try:
         data = request.json
@@ -164,24 +495,32 @@ def checkin():
         date = data.get('date')
         time = data.get('time')
 
+        error = swipe_error(empid, date, time)
+        if error:
+            return jsonify({"error": error}), 400
+
+        if write_behind.enabled:
+            write_behind.append('checkin', (empid, date, time))
+            availability.checked_in([(empid, date, time)])
+            return jsonify({"message": "Check-in saved successfully"}), 201
+
         cur = mysql.connection.cursor()
-        # Insert or update checkin time for the employee on that date
-        cur.execute("""
-            INSERT INTO attendance (empid, checkinDate, checkinTime)
-            VALUES (%s, %s, %s)
-            ON DUPLICATE KEY UPDATE checkinTime = VALUES(checkinTime)
-        """, (empid, date, time))
+        cur.execute(CHECKIN_UPSERT, (empid, date, time))
+        attendance_rollups.apply(cur, 'checkin', [(empid, date, time)])
 
         mysql.connection.commit()
         cur.close()
+        availability.checked_in([(empid, date, time)])
 
         return jsonify({"message": "Check-in saved successfully"}), 201
 
     except Exception as e:
-        print("Check-in error:", e)
+        log.error("checkin_failed", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/checkout', methods=['POST'])
+@auth.protect(owner='empid')
+@idempotent(idempotency_store)
 def check_out():
     try:
         data = request.json
@@ -189,24 +528,18 @@ def check_out():
         date = data.get('date')
         time = data.get('time')
 
-        if not all([empid, date, time]):
-            return jsonify({"error": "Missing required fields"}), 400
+        error = swipe_error(empid, date, time)
+        if error:
+            return jsonify({"error": error}), 400
 
-        cur = mysql.connection.cursor()
-
-        # Check if a record exists for this employee and checkout date
-        cur.execute("SELECT id FROM attendance WHERE empid = %s AND checkoutDate = %s", (empid, date))
-        result = cur.fetchone()
-
-        if result:
-            # Record exists — update checkoutTime
-            cur.execute("UPDATE attendance SET checkoutTime = %s WHERE empid = %s AND checkoutDate = %s",
-                        (time, empid, date))
-        else:
-            # No record — insert new row
-            cur.execute("INSERT INTO attendance (empid, checkoutDate, checkoutTime) VALUES (%s, %s, %s)",
-                        (empid, date, time))
+        if write_behind.enabled:
+            write_behind.append('checkout', (empid, date, time))
+            return jsonify({"message": "Check-out saved"}), 201
 
+        cur = mysql.connection.cursor()
+        # One upsert on (empid, checkoutDate), so a retried check-out can't add a second row
+        cur.execute(CHECKOUT_UPSERT, (empid, date, time))
+        attendance_rollups.apply(cur, 'checkout', [(empid, date, time)])
         mysql.connection.commit()
         cur.close()
 
@@ -215,7 +548,66 @@ def check_out():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def batch_response(rows, results):
+    body, status = batch_body(rows, results)
+    return jsonify(body), status
+
+write_behind.register('checkin', write_checkins)
+write_behind.register('checkout', write_checkouts)
+write_behind.register('coffee_break', write_coffee_breaks)
+
+def owned_by_caller(empid):
+    # Batch records are checked one by one: employees may only send their own
+    # swipes, managers anyone's
+    return auth.may_act_for(getattr(g, 'auth', None), empid)
+
+@app.route('/api/checkin/batch', methods=['POST'])
+@auth.protect()
+@idempotent(idempotency_store)
+def checkin_batch():
+    try:
+        rows, results, error = parse_attendance_batch(request.json, owned_by_caller)
+        if error:
+            return jsonify({"error": error}), 400
+
+        if rows:
+            swipes = [(empid, date, time) for _, empid, date, time in rows]
+            cur = mysql.connection.cursor()
+            write_checkins(cur, swipes)
+            mysql.connection.commit()
+            cur.close()
+            availability.checked_in(swipes)
+
+        return batch_response(rows, results)
+
+    except Exception as e:
+        log.error("checkin_batch_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/checkout/batch', methods=['POST'])
+@auth.protect()
+@idempotent(idempotency_store)
+def checkout_batch():
+    try:
+        rows, results, error = parse_attendance_batch(request.json, owned_by_caller)
+        if error:
+            return jsonify({"error": error}), 400
+
+        if rows:
+            cur = mysql.connection.cursor()
+            write_checkouts(cur, [(empid, date, time) for _, empid, date, time in rows])
+            mysql.connection.commit()
+            cur.close()
+
+        return batch_response(rows, results)
+
+    except Exception as e:
+        log.error("checkout_batch_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/coffee-break', methods=['POST'])
+@auth.protect(owner='empid')
+@idempotent(idempotency_store)
 def save_coffee_break():
     try:
         data = request.json
@@ -223,14 +615,17 @@ def save_coffee_break():
         time = data.get('time')
         date = data.get('date')
 
-        if not all([empid, time, date]):
-            return jsonify({"error": "Missing required fields"}), 400
+        error = swipe_error(empid, date, time)
+        if error:
+            return jsonify({"error": error}), 400
+
+        if write_behind.enabled:
+            write_behind.append('coffee_break', (empid, date, time))
+            return jsonify({"message": "Coffee break saved successfully"}), 201
 
         cur = mysql.connection.cursor()
-        cur.execute("""
-            INSERT INTO schedule (start_coffee_break, break_date, empid)
-            VALUES (%s, %s, %s)
-        """, (time, date, empid))
+        cur.execute(COFFEE_BREAK_INSERT, (time, date, empid))
+        attendance_rollups.apply(cur, 'coffee_break', [(empid, date, time)])
 
         mysql.connection.commit()
         cur.close()
@@ -238,35 +633,67 @@ def save_coffee_break():
         return jsonify({"message": "Coffee break saved successfully"}), 201
 
     except Exception as e:
-        print("Coffee break error:", e)
+        log.error("coffee_break_failed", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 
+EMPLOYEE_LIST_FIELDS = ["empid", "full_name", "email", "username", "phone_number", "occupation", "faculty"]
+EMPLOYEE_PAGE_MAX = 1000
+
 @app.route('/api/get-all-employees', methods=['GET'])
+@auth.protect()
+# The Accept header can pick NDJSON, so it is part of the ETag
+@versions.conditional(mysql, 'Employee', vary=('Accept',))
 def get_all_employees():
+    # ?after=<empid>&limit=<n> pages by empid; ?format=ndjson streams every row
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+    if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        return stream_employees(after)
+
     try:
         cur = mysql.connection.cursor()
-        cur.execute("SELECT empid, full_name, email, username, phone_number, occupation, faculty FROM Employee")
-        rows = cur.fetchall()
+        if limit is None and after is None:
+            cur.execute(queries.EMPLOYEE_LIST)
+        else:
+            limit = max(1, min(limit or 100, EMPLOYEE_PAGE_MAX))
+            cur.execute(queries.EMPLOYEE_PAGE, (after or 0, limit))
+        employees = serialization.dict_rows(cur)
         cur.close()
 
-        employees = []
-        for row in rows:
-            employees.append({
-                "empid": row[0],
-                "full_name": row[1],
-                "email": row[2],
-                "username": row[3],
-                "phone_number": row[4],
-                "occupation": row[5],
-                "faculty": row[6]
-            })
+        if limit is None:
+            return jsonify({"employees": employees}), 200
 
-        return jsonify({"employees": employees}), 200
+        # next_after is null once the last page has been returned
+        next_after = employees[-1]["empid"] if len(employees) == limit else None
+        return jsonify({"employees": employees, "next_after": next_after}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def stream_employees(after):
+    # versions.conditional read the ETag on the request's connection; the stream
+    # gets a connection of its own
+    mysql.release_connection()
+    rows = stream_rows(mysql.pool, queries.EMPLOYEE_STREAM, (after or 0,))
+    try:
+        # Run the query now, so a database error is a 500 rather than a cut-off 200
+        first = next(rows, None)
     except Exception as e:
+        log.error("stream_employees_failed", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+    def generate():
+        try:
+            for row in itertools.chain([first] if first is not None else [], rows):
+                yield app.json.dumps(dict(zip(EMPLOYEE_LIST_FIELDS, row))) + "\n"
+        finally:
+            rows.close()
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
 @app.route('/api/submit-leave', methods=['POST'])
+@auth.protect(owner='empid')
+@idempotent(idempotency_store)
 def submit_leave():
     try:
         data = request.json
@@ -279,62 +706,39 @@ def submit_leave():
         cur = mysql.connection.cursor()
         
         # Insert into main leave_request table
-        cur.execute("""
-            INSERT INTO leave_request (empid, leave_start_date, leave_end_date, status, leave_type)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (empid, start_date, end_date, status, leave_type))
-        
-        # Insert into specific leave type table
-        if leave_type == 'annual leave':
-            cur.execute("""
-                INSERT INTO annual_leave (empid, leave_start_date, leave_end_date, status, leave_type)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (empid, start_date, end_date, status, leave_type))
-        elif leave_type == 'sick leave':
-            cur.execute("""
-                INSERT INTO sick_leave (empid, leave_start_date, leave_end_date, status, leave_type)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (empid, start_date, end_date, status, leave_type))
-        elif leave_type == 'maternity leave':
-            cur.execute("""
-                INSERT INTO maternity_leave (empid, leave_start_date, leave_end_date, status, leave_type)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (empid, start_date, end_date, status, leave_type))
-        elif leave_type == 'bereavement leave':
-            cur.execute("""
-                INSERT INTO bereavement_leave (empid, leave_start_date, leave_end_date, status, leave_type)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (empid, start_date, end_date, status, leave_type))
+        cur.execute(queries.LEAVE_INSERT, (empid, start_date, end_date, status, leave_type))
+        request_id = cur.lastrowid
+        changes.record(cur, 'leave_request', request_id, empid)
 
+        # Keep the leave_counter rollup in the same transaction; the per-type
+        # views (annual_leave, sick_leave, ...) read straight from leave_request
+        leave_counters.increment(cur, empid, leave_type, status)
+
+        versions.bump(cur, 'leave_request')
+        written = availability.leave_written(cur, request_id)
         mysql.connection.commit()
+        availability.apply(written)
         cur.close()
+        event_bus.notify()
 
         return jsonify({"message": "Leave request submitted successfully"}), 201
 
     except Exception as e:
-        print("🔴 Leave submission error:", e)
+        log.error("submit_leave_failed", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/leave-count/<int:empid>', methods=['GET'])
+@auth.protect(owner='empid')
 def get_leave_counts(empid):
     try:
         cur = mysql.connection.cursor()
+        by_type = leave_counters.counts_by_type(cur, empid)
+        cur.close()
 
-        # Query to count leaves from each table
-        queries = {
-            'annual_leave': "SELECT COUNT(*) FROM annual_leave WHERE empid = %s",
-            'sick_leave': "SELECT COUNT(*) FROM sick_leave WHERE empid = %s",
-            'maternity_leave': "SELECT COUNT(*) FROM maternity_leave WHERE empid = %s",
-            'bereavement_leave': "SELECT COUNT(*) FROM bereavement_leave WHERE empid = %s"
-        }
-
+        # Keyed by the per-type view names the counts used to come from
         results = {}
-        for leave_type, query in queries.items():
-            cur.execute(query, (empid,))
-            count = cur.fetchone()[0]
-            results[leave_type] = count
-
-        cur.close()
+        for leave_type in LEAVE_TYPES:
+            results[leave_type.view] = by_type.get(leave_type.name, 0)
 
         return jsonify({
             "success": True,
@@ -343,10 +747,11 @@ def get_leave_counts(empid):
         }), 200
 
     except Exception as e:
-        print("🔴 Error in get_leave_counts:", e)
+        log.error("leave_counts_failed", empid=empid, exc_info=True)
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/leave-count', methods=['GET'])
+@auth.protect(owner='empId')
 def get_leave_count_by_employee():
     emp_id = request.args.get('empId')
     status = request.args.get('status')
@@ -354,27 +759,23 @@ def get_leave_count_by_employee():
     if not emp_id or not status:
         return jsonify({'error': 'Missing empId or status'}), 400
 
-    leave_types = ["Annual Leave", "Sick Leave", "Maternity Leave", "Bereavement Leave"]
     leave_counts = []
 
     try:
         cur = mysql.connection.cursor()
-        for leave_type in leave_types:
-            cur.execute(
-                "SELECT COUNT(*) FROM leave_request WHERE empid = %s AND leave_type = %s AND status = %s",
-                (emp_id, leave_type, status)
-            )
-            result = cur.fetchone()
-            count = result[0] if result else 0
-            leave_counts.append(f"{leave_type}: {count} requests ({status})")
+        counts = leave_counters.counts_by_status(cur, emp_id, status)
         cur.close()
+        for leave_type in LEAVE_TYPES:
+            count = counts.get(leave_type.name, 0)
+            leave_counts.append(f"{leave_type.label}: {count} requests ({status})")
         return jsonify(leave_counts)
 
     except Exception as e:
-        print("SERVER ERROR:", e)
+        log.error("leave_count_by_employee_failed", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/total-count', methods=['GET'])
+@auth.protect(owner='employeeId')
 def total_count():
     employee_id = request.args.get('employeeId', type=int)
     status = request.args.get('status')
@@ -384,11 +785,7 @@ def total_count():
 
     try:
         cur = mysql.connection.cursor()
-        cur.execute(
-            "SELECT COUNT(*) FROM leave_request WHERE empid = %s AND status = %s",
-            (employee_id, status)
-        )
-        count = cur.fetchone()[0]
+        count = sum(leave_counters.counts_by_status(cur, employee_id, status).values())
         cur.close()
 
         return jsonify({
@@ -400,89 +797,57 @@ def total_count():
 
 
     except Exception as e:
-        print("🔴 Error in total_count:", e)
+        log.error("total_count_failed", exc_info=True)
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/pending-leave-requests', methods=['GET'])
+@auth.protect(manager=True)
+@versions.conditional(mysql, 'leave_request', 'Employee')
 def get_pending_leave_requests():
     try:
         cur = mysql.connection.cursor()
-        cur.execute("""
-            SELECT 
-                lr.request_id, lr.empid, e.full_name, 
-                lr.leave_start_date, lr.leave_end_date, 
-                lr.status, lr.leave_type
-            FROM 
-                leave_request lr
-            JOIN 
-                Employee e ON lr.empid = e.empid
-            WHERE 
-                lr.status = 'pending'
-        """)
-        rows = cur.fetchall()
+        cur.execute(queries.PENDING_LEAVES)
+        leave_requests = serialization.dict_rows(cur)
         cur.close()
 
-        leave_requests = []
-        for row in rows:
-            leave_requests.append({
-                "requestId": row[0],
-                "empId": row[1],
-                "employeeName": row[2],
-                "leaveStartDate": row[3],
-                "leaveEndDate": row[4],
-                "status": row[5],
-                "leaveType": row[6],
-            })
-
         return jsonify(leave_requests), 200
 
     except Exception as e:
-        print("🔴 Error retrieving pending leave requests:", e)
+        log.error("pending_leave_requests_failed", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/update-leave-status', methods=['POST'])
+@auth.protect(manager=True)
 def update_leave_status():
     try:
         data = request.json
         leave_id = data.get('leave_id')
         new_status = data.get('status')
-        leave_type = data.get('leave_type')
 
         cur = mysql.connection.cursor()
 
-        # Update the main leave_request table
-        cur.execute("""
-            UPDATE leave_request SET status = %s WHERE request_id = %s
-        """, (new_status, leave_id))
-
-        # Update the corresponding leave type table
-        if leave_type == 'annual leave':
-            cur.execute("""
-                UPDATE annual_leave SET status = %s WHERE id = %s
-            """, (new_status, leave_id))
-        elif leave_type == 'sick leave':
-            cur.execute("""
-                UPDATE sick_leave SET status = %s WHERE id = %s
-            """, (new_status, leave_id))
-        elif leave_type == 'maternity leave':
-            cur.execute("""
-                UPDATE maternity_leave SET status = %s WHERE id = %s
-            """, (new_status, leave_id))
-        elif leave_type == 'bereavement leave':
-            cur.execute("""
-                UPDATE bereavement_leave SET status = %s WHERE id = %s
-            """, (new_status, leave_id))
+        # Move the request between leave_counter status buckets in the same transaction
+        leave_counters.move(cur, leave_id, new_status)
+
+        cur.execute(queries.LEAVE_STATUS_UPDATE, (new_status, leave_id))
+        changes.record_leave(cur, leave_id)
 
+        versions.bump(cur, 'leave_request')
+        written = availability.leave_written(cur, leave_id)
         mysql.connection.commit()
+        availability.apply(written)
         cur.close()
+        event_bus.notify()
 
         return jsonify({"message": "Leave status updated successfully"}), 200
 
     except Exception as e:
-        print("🔴 Error in updating leave status:", e)
+        log.error("update_leave_status_failed", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/leave-dates', methods=['GET'])
+@auth.protect(owner='empid')
+@versions.conditional(mysql, 'leave_request')
 def get_leave_dates():
     empid = request.args.get('empid')  # 🔽 Get empid from query string
 
@@ -493,25 +858,160 @@ def get_leave_dates():
         cur = mysql.connection.cursor()
 
         # ✅ Fetch accepted leaves only for the logged-in employee
-        cur.execute("SELECT empid, leave_start_date, leave_end_date FROM leave_request WHERE status = 'accepted' AND empid = %s", (empid,))
+        cur.execute(queries.ACCEPTED_LEAVE_DATES, (empid,))
+        leave_data = serialization.dict_rows(cur)
+        cur.close()
+
+        return jsonify({"leave_dates": leave_data}), 200
+
+    except Exception as e:
+        log.error("leave_dates_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/availability', methods=['GET'])
+@auth.protect(manager=True)
+def get_availability():
+    # ?start=YYYY-MM-DD[&end=YYYY-MM-DD][&faculty=...][&occupation=...]
+    try:
+        start = datetime.date.fromisoformat(request.args.get('start', ''))
+        end = datetime.date.fromisoformat(request.args.get('end') or start.isoformat())
+    except ValueError:
+        return jsonify({"error": "start (and optional end) must be YYYY-MM-DD"}), 400
+    if end < start:
+        return jsonify({"error": "end is before start"}), 400
+    if (end - start).days + 1 > app.config['AVAILABILITY_MAX_DAYS']:
+        return jsonify({"error": f"Range too long (max {app.config['AVAILABILITY_MAX_DAYS']} days)"}), 400
+
+    faculty = request.args.get('faculty')
+    occupation = request.args.get('occupation')
+    try:
+        result = availability.query(start, end, faculty, occupation)
+        result.update({"start": start.isoformat(), "end": end.isoformat(),
+                       "faculty": faculty, "occupation": occupation})
+        return jsonify(result), 200
+    except Exception as e:
+        log.error("availability_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/availability-stats', methods=['GET'])
+def availability_stats():
+    return jsonify(availability.stats()), 200
+
+@app.route('/api/attendance-report', methods=['GET'])
+@auth.protect(manager=True)
+def attendance_report():
+    # ?month=YYYY-MM, optionally narrowed by &faculty= or &empid=; &detail=daily lists the days
+    month = request.args.get('month')
+    faculty = request.args.get('faculty')
+    empid = request.args.get('empid', type=int)
+    daily = request.args.get('detail') == 'daily'
+
+    try:
+        start, end = attendance_rollups.month_range(month or '')
+    except ValueError:
+        return jsonify({"error": "month is required as YYYY-MM"}), 400
+
+    # Each filter is a prefix of an attendance_daily index, so this is one range scan
+    by, params = None, [start, end]
+    if empid is not None:
+        by, params = 'empid', [empid, start, end]
+    elif faculty:
+        by, params = 'faculty', [faculty, start, end]
+
+    try:
+        cur = mysql.connection.cursor()
+        if daily:
+            cur.execute(queries.report_query(True, by), params)
+            days = [{
+                "empid": row[0],
+                "day": str(row[1]),
+                "first_checkin": None if row[2] is None else str(row[2]),
+                "last_checkout": None if row[3] is None else str(row[3]),
+                "coffee_breaks": row[4],
+                "coffee_break_minutes": row[5],
+                "worked_minutes": row[6],
+            } for row in cur.fetchall()]
+            cur.close()
+            return jsonify({"month": month, "faculty": faculty, "empid": empid, "days": days}), 200
+
+        cur.execute(queries.report_query(False, by), params)
         rows = cur.fetchall()
         cur.close()
 
-        leave_data = []
+        employees = []
         for row in rows:
-            leave_data.append({
+            worked = int(row[4] or 0)
+            employees.append({
                 "empid": row[0],
-                "leave_start_date": row[1],
-                "leave_end_date": row[2]
+                "full_name": row[1],
+                "faculty": row[2],
+                "days_present": int(row[3]),
+                "worked_minutes": worked,
+                "worked_hours": round(worked / 60, 2),
+                "coffee_break_minutes": int(row[5] or 0),
             })
+        totals = {
+            "employees": len(employees),
+            "days_present": sum(item["days_present"] for item in employees),
+            "worked_minutes": sum(item["worked_minutes"] for item in employees),
+            "coffee_break_minutes": sum(item["coffee_break_minutes"] for item in employees),
+        }
+        return jsonify({"month": month, "faculty": faculty, "empid": empid,
+                        "employees": employees, "totals": totals}), 200
 
-        return jsonify({"leave_dates": leave_data}), 200
+    except Exception as e:
+        log.error("attendance_report_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
 
+@app.route('/api/export', methods=['GET'])
+@auth.protect(manager=True)
+def export_table():
+    # ?table=attendance|schedule|leave_request, ?month=YYYY-MM or ?from=YYYY-MM-DD&to=YYYY-MM-DD
+    # (both days included), ?format=csv|ndjson. Gzipped on the fly when the client accepts it.
+    table = request.args.get('table')
+    fmt = request.args.get('format', 'csv')
+    if table not in export.EXPORTS:
+        return jsonify({"error": f"table must be one of {', '.join(export.EXPORTS)}"}), 400
+    if fmt not in export.FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(export.FORMATS)}"}), 400
+    try:
+        if request.args.get('month'):
+            start, end = attendance_rollups.month_range(request.args['month'])
+        else:
+            start = datetime.date.fromisoformat(request.args.get('from', ''))
+            end = datetime.date.fromisoformat(request.args.get('to', '')) + datetime.timedelta(days=1)
+            start, end = start.isoformat(), end.isoformat()
+    except ValueError:
+        return jsonify({"error": "Pass month=YYYY-MM or from=YYYY-MM-DD&to=YYYY-MM-DD"}), 400
+    days = (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days
+    if not 0 < days <= app.config['EXPORT_MAX_DAYS']:
+        return jsonify({"error": f"The range must cover 1 to {app.config['EXPORT_MAX_DAYS']} days"}), 400
+
+    rows = export.rows(mysql.pool, table, start, end, app.config['EXPORT_FETCH_ROWS'])
+    try:
+        # Run the first query now, so a database error is still a 500 and not a cut-off file
+        first = next(rows, None)
     except Exception as e:
-        print("🔴 Error in get_leave_dates:", e)
+        log.error("export_failed", table=table, exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+    columns = export.EXPORTS[table][0]
+    body = export.encode(rows, columns, fmt, app.json.dumps, first, app.config['EXPORT_CHUNK_BYTES'])
+    mimetype, extension = export.FORMATS[fmt]
+    gzipped = app.config['COMPRESS'] and request.accept_encodings['gzip'] > 0
+    if gzipped:
+        body = export.gzip_stream(body, app.config['COMPRESS_LEVEL'])
+
+    response = Response(body, mimetype=mimetype)
+    last_day = datetime.date.fromisoformat(end) - datetime.timedelta(days=1)
+    response.headers['Content-Disposition'] = f'attachment; filename="{table}-{start}-{last_day}.{extension}"'
+    response.vary.add('Accept-Encoding')
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 @app.route('/api/update-employee/<int:empid>', methods=['PUT'])
+@auth.protect(owner='empid')
 def update_employee(empid):
     try:
         data = request.json
@@ -530,22 +1030,34 @@ def update_employee(empid):
 
         cur = mysql.connection.cursor()
 
-        # Update statement
-        update_query = """
-            UPDATE Employee
-            SET full_name = %s,
-                username = %s,
-                email = %s,
-                phone_number = %s,
-                occupation = %s,
-                faculty = %s
-            WHERE empid = %s
-        """
-
-        cur.execute(update_query, (full_name, username, email, phone_number, occupation, faculty, empid))
-        mysql.connection.commit()
+        manager = auth.caller_is_manager()
+        if not manager:
+            # Occupation and role are managers' to change
+            if 'role' in data:
+                cur.close()
+                return jsonify({"success": False, "error": "Only managers can change roles"}), 403
+            cur.execute(queries.EMPLOYEE_OCCUPATION, (empid,))
+            row = cur.fetchone()
+            current = row[0] if row else None
+            if 'occupation' in data and occupation != current:
+                cur.close()
+                return jsonify({"success": False, "error": "Only managers can change occupation"}), 403
+            occupation = current
+
+        cur.execute(queries.EMPLOYEE_UPDATE, (full_name, username, email, phone_number, occupation, faculty, empid))
         rows_affected = cur.rowcount
+        if manager and 'role' in data:
+            cur.execute(queries.EMPLOYEE_SET_ROLE, (data['role'], empid))
+        if rows_affected > 0:
+            # Keep department reports on the employee's current faculty
+            attendance_rollups.set_faculty(cur, empid, faculty)
+            changes.record(cur, 'Employee', empid)
+        versions.bump(cur, 'Employee')
+        written = availability.employee_written(cur, empid)
+        mysql.connection.commit()
+        availability.apply(written)
         cur.close()
+        employee_cache.delete(empid)
 
         if rows_affected > 0:
             return jsonify({"message": "Profile updated successfully"}), 200
@@ -553,14 +1065,16 @@ def update_employee(empid):
             return jsonify({"message": "Update failed or no changes made"}), 400
 
     except Exception as e:
-        print("🔴 Update error:", e)
+        log.error("update_employee_failed", empid=empid, exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/save-meeting', methods=['POST'])
+@auth.protect(owner='organizer_id')
 def save_meeting():
+    booked = False
     try:
         data = request.json
-        print("🟡 Received meeting data:", data)
+        log.debug("save_meeting_received", payload=data)
 
         title = data.get('title')
         meeting_date = data.get('meeting_date')
@@ -569,22 +1083,177 @@ def save_meeting():
         location = data.get('location')
         organizer_id = data.get('organizer_id')  # optional for now; hardcoded below
 
+        try:
+            day = datetime.date.fromisoformat(str(meeting_date))
+            start, end = parse_clock(start_time), parse_clock(end_time)
+        except ValueError:
+            return jsonify({"error": "meeting_date must be YYYY-MM-DD and start_time/end_time HH:MM"}), 400
+        if end <= start:
+            return jsonify({"error": "end_time must be after start_time"}), 400
+
+        def insert(cur):
+            cur.execute(queries.MEETING_INSERT, (title, meeting_date, start_time, end_time, location, organizer_id))
+            meeting_id = cur.lastrowid
+            changes.record(cur, 'meetings', meeting_id)
+            return meeting_id
+
         cur = mysql.connection.cursor()
-        cur.execute("""
-            INSERT INTO meetings (title, meeting_date, start_time, end_time, location, organizer_id)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (title, meeting_date, start_time, end_time, location, organizer_id))
+        # ❗ Refuse double bookings of the room or the organizer
+        conflicts, meeting_id = meeting_index.book(cur, day, start, end, location or None,
+                                                   organizer_id, title, insert)
+        if conflicts:
+            mysql.connection.rollback()
+            cur.close()
+            return jsonify({"error": "Meeting overlaps an existing booking", "conflicts": conflicts}), 409
+        booked = True
         mysql.connection.commit()
         cur.close()
 
-        return jsonify({"message": "Meeting added successfully"}), 201
+        return jsonify({"message": "Meeting added successfully", "meeting_id": meeting_id}), 201
+
+    except Exception as e:
+        if booked:
+            meeting_index.reset()
+        log.error("save_meeting_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/meetings/free-slots', methods=['GET'])
+@auth.protect()
+def meeting_free_slots():
+    # ?date=YYYY-MM-DD and ?location=<room> or ?organizer_id=<empid>;
+    # optional &from=HH:MM&to=HH:MM (default the working day) and &min_minutes=
+    location = request.args.get('location')
+    organizer_id = request.args.get('organizer_id', type=int)
+    if bool(location) == (organizer_id is not None):
+        return jsonify({"error": "Pass exactly one of location or organizer_id"}), 400
+    try:
+        day = datetime.date.fromisoformat(request.args.get('date', ''))
+        start = parse_clock(request.args.get('from') or app.config['MEETINGS_DAY_START'])
+        end = parse_clock(request.args.get('to') or app.config['MEETINGS_DAY_END'])
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD and from/to HH:MM"}), 400
+    if end <= start:
+        return jsonify({"error": "to must be after from"}), 400
+    min_minutes = max(1, request.args.get('min_minutes', 1, type=int))
+
+    try:
+        kind, key = ('location', location) if location else ('organizer', organizer_id)
+        busy = meeting_index.busy(day, kind, key, start, end)
+        return jsonify({
+            "date": day.isoformat(),
+            "location": location,
+            "organizer_id": organizer_id,
+            "from": clock(start),
+            "to": clock(end),
+            "busy": [{"meeting_id": meeting_id, "title": title, "start_time": clock(first), "end_time": clock(last)}
+                     for first, last, meeting_id, title in busy],
+            "free": [{"start_time": clock(first), "end_time": clock(last), "minutes": last - first}
+                     for first, last in free_slots(busy, start, end, min_minutes)],
+        }), 200
+    except Exception as e:
+        log.error("meeting_free_slots_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+def scoped_empid():
+    # Whose private records a feed carries: ?empid=, else the token's employee;
+    # None (everyone's) for managers. Without a token ?empid= is required, see feed_refused()
+    empid = request.args.get('empid', type=int)
+    payload = getattr(g, 'auth', None)
+    if empid is None and payload and not auth.is_manager(payload):
+        empid = payload['empid']
+    return empid
+
+def feed_refused(empid):
+    # Only a manager's token may read every employee's feed
+    if empid is None and getattr(g, 'auth', None) is None:
+        return jsonify({"success": False, "error": "Authorization token required"}), 401
+    return None
+
+@app.route('/api/sync', methods=['GET'])
+@auth.protect(owner='empid')
+def sync():
+    # ?since=<cursor from the previous sync>. Without one, or with one from before the
+    # last compaction, the answer is reset: reload in full, then sync from its cursor.
+    # Employees see their own leave requests and attendance; managers see everyone's.
+    since = request.args.get('since', type=int)
+    owner = scoped_empid()
+    refused = feed_refused(owner)
+    if refused:
+        return refused
+    settle = app.config['SYNC_SETTLE_SECONDS']
+
+    try:
+        cur = mysql.connection.cursor()
+        horizon = changes.horizon(cur)
+        if since is None or since < horizon:
+            # Never below the horizon, or the next sync would be told to reset again
+            cursor = max(horizon, changes.settled_cursor(cur, settle))
+            cur.close()
+            return jsonify({"reset": True, "cursor": cursor, "has_more": False, "changes": {}, "deleted": {}}), 200
+
+        entries, cursor, has_more = changes.read(cur, since, owner, app.config['SYNC_PAGE_SIZE'], settle)
+        changed, deleted = changes.load(cur, entries)
+        cur.close()
+        return jsonify({"reset": False, "cursor": cursor, "has_more": has_more,
+                        "changes": changed, "deleted": deleted}), 200
+    except Exception as e:
+        log.error("sync_failed", since=since, exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/events', methods=['GET'])
+@auth.protect(owner='empid')
+def leave_events():
+    # Server-sent events: one `leave_request` event, carrying the request's current row,
+    # whenever a leave request of the caller's scope (see scoped_empid) is submitted or
+    # changes status. Reconnect with Last-Event-ID to have missed events replayed.
+    empid = scoped_empid()
+    refused = feed_refused(empid)
+    if refused:
+        return refused
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_event_id', type=int)
+
+    subscriber = event_bus.subscribe(empid)
+    if subscriber is None:
+        log.info("event_stream_refused", connections=event_bus.max_connections)
+        response = jsonify({"success": False, "error": "Too many event streams, retry later"})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(app.config['CONCURRENCY_RETRY_AFTER'])
+        return response
 
+    try:
+        cur = mysql.connection.cursor()
+        replayed, first_id = event_bus.replay(cur, subscriber, last_id)
+        cur.close()
     except Exception as e:
-        print("🔴 Error saving meeting:", e)
+        event_bus.unsubscribe(subscriber)
+        log.error("event_replay_failed", last_id=last_id, exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+    body = event_bus.stream(subscriber, replayed, first_id, app.json.dumps, app.config['EVENTS_HEARTBEAT'],
+                            app.config['EVENTS_STREAM_SECONDS'])
+    response = Response(body, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/events-stats', methods=['GET'])
+def events_stats():
+    return jsonify(event_bus.stats()), 200
+
+@app.route('/api/meeting-index-stats', methods=['GET'])
+def meeting_index_stats():
+    return jsonify(meeting_index.stats()), 200
+
+
+def create_app():
+    # Entry point for WSGI servers (see wsgi.py). Routes and extensions are
+    # bound to the module-level app at import, so importing is the setup.
+    return app
 
-# STEP 8: Ensure Flask is in debug mode for full error logs
+# Development server only; production runs under gunicorn (see Procfile)
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
-    app.run(debug=True, host="0.0.0.0", port=5001)
+    app.run(debug=os.environ.get('FLASK_DEBUG', '0') == '1', host="0.0.0.0", port=port)
@@ -0,0 +1,414 @@
+import functools
+import os
+
+from dotenv import load_dotenv
+from quart import Quart, g, jsonify, request
+
+import attendance
+import attendance_rollups
+import changes
+import health
+import leave_counters
+import queries
+import versions
+from app_logging import get_logger, setup_logging
+from async_db import AsyncMySQLPool
+from leave_types import LEAVE_TYPES
+from tokens import TokenAuth, TokenError, requested_empid
+
+# ASGI build of the attendance and leave endpoints: same URLs, request
+# bodies and JSON responses as attendify.py, but handlers await an aiomysql
+# pool instead of holding a worker thread while MySQL answers, so a few
+# processes can keep thousands of check-ins in flight.
+#
+#   hypercorn attendify_async:app --bind 0.0.0.0:$PORT --workers 2
+#
+# Write-behind, the employee cache, conditional GETs and /metrics stay in
+# the WSGI build; everything else (SQL, leave counters, table versions,
+# session tokens) is shared with it.
+
+load_dotenv()
+
+app = Quart(__name__)
+
+app.config['MYSQL_HOST'] = os.getenv('MYSQL_HOST')
+app.config['MYSQL_USER'] = os.getenv('MYSQL_USER')
+app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD')
+app.config['MYSQL_DB'] = os.getenv('MYSQL_DB')
+app.config['MYSQL_PORT'] = int(os.getenv('MYSQL_PORT', 3306))
+app.config['MYSQL_POOL_SIZE'] = int(os.getenv('MYSQL_POOL_SIZE', 10))
+app.config['MYSQL_POOL_MAX_LIFETIME'] = int(os.getenv('MYSQL_POOL_MAX_LIFETIME', 1800))
+app.config['SQLITE_STANDIN'] = os.getenv('SQLITE_STANDIN')
+
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+app.config['AUTH_TOKEN_MAX_AGE'] = int(os.getenv('AUTH_TOKEN_MAX_AGE', 8 * 3600))
+app.config['AUTH_REQUIRED'] = os.getenv('AUTH_REQUIRED', '0') == '1'
+app.config['AUTH_MANAGER_ROLES'] = os.getenv('AUTH_MANAGER_ROLES', 'manager,admin,hr')
+
+# The ASGI server writes its own access log
+app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO')
+app.config['LOG_SAMPLE_RATES'] = os.getenv('LOG_SAMPLE_RATES', '')
+app.config['LOG_DEFAULT_SAMPLE_RATE'] = float(os.getenv('LOG_DEFAULT_SAMPLE_RATE', 1.0))
+app.config['LOG_REDACT_FIELDS'] = os.getenv('LOG_REDACT_FIELDS', 'password,token,authorization,secret_key')
+app.config['LOG_REQUESTS'] = False
+
+setup_logging(app)
+log = get_logger()
+
+mysql = AsyncMySQLPool(app)
+auth = TokenAuth(app)
+
+
+@app.after_request
+async def allow_cors(response):
+    # Same effect as flask_cors' defaults in the WSGI build
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    return response
+
+
+def protect(owner=None, manager=False):
+    # Async twin of TokenAuth.protect(): the checks are TokenAuth.refusal(),
+    # only reading the request differs
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            try:
+                payload = auth.from_header(request.headers.get('Authorization', ''))
+            except TokenError as e:
+                return jsonify({"success": False, "error": str(e)}), 401
+
+            requested = None
+            if owner and payload is not None:
+                requested = requested_empid(owner, kwargs, request.args, await request.get_json(silent=True))
+            refused = auth.refusal(payload, manager, requested)
+            if refused:
+                return jsonify({"success": False, "error": refused[0]}), refused[1]
+            if payload is not None:
+                g.auth = payload
+            return await view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@app.route('/healthz', methods=['GET'])
+async def healthz():
+    return jsonify({"status": "ok"}), 200
+
+
+@app.route('/readyz', methods=['GET'])
+async def readyz():
+    if health.is_draining():
+        return jsonify({"status": "draining"}), 503
+    try:
+        await mysql.ping()
+    except Exception as e:
+        return jsonify({"status": "unavailable", "database": str(e)}), 503
+    return jsonify({"status": "ready", "pool": mysql.stats()}), 200
+
+
+async def apply_rollups(cur, kind, rows):
+    # Async twin of attendance_rollups.apply()
+    sql, params = attendance_rollups.delta(kind, rows)
+    if params:
+        await cur.executemany(sql, params)
+        await cur.executemany(changes.RECORD, changes.day_params([(empid, date) for empid, date, _ in rows]))
+
+
+async def write_checkins(cur, rows):
+    await cur.executemany(attendance.CHECKIN_UPSERT, rows)
+    await apply_rollups(cur, 'checkin', rows)
+
+
+async def write_checkouts(cur, rows):
+    latest = attendance.latest_checkouts(rows)
+    rows = attendance.checkout_params(latest)
+    await cur.executemany(attendance.CHECKOUT_UPSERT, rows)
+    await apply_rollups(cur, 'checkout', rows)
+
+
+@app.route('/api/checkin', methods=['POST'])
+@protect(owner='empid')
+async def checkin():
+    try:
+        data = await request.get_json()
+        empid = data.get('empid')
+        date = data.get('date')
+        time = data.get('time')
+
+        error = attendance.swipe_error(empid, date, time)
+        if error:
+            return jsonify({"error": error}), 400
+
+        async with mysql.transaction() as cur:
+            await write_checkins(cur, [(empid, date, time)])
+
+        return jsonify({"message": "Check-in saved successfully"}), 201
+
+    except Exception as e:
+        log.error("checkin_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/checkout', methods=['POST'])
+@protect(owner='empid')
+async def check_out():
+    try:
+        data = await request.get_json()
+        empid = data.get('empid')
+        date = data.get('date')
+        time = data.get('time')
+
+        error = attendance.swipe_error(empid, date, time)
+        if error:
+            return jsonify({"error": error}), 400
+
+        async with mysql.transaction() as cur:
+            await write_checkouts(cur, [(empid, date, time)])
+
+        return jsonify({"message": "Check-out saved"}), 201
+
+    except Exception as e:
+        log.error("check_out_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+async def attendance_batch(writer):
+    # Employees may only send their own swipes; managers anyone's
+    payload = getattr(g, 'auth', None)
+    rows, results, error = attendance.parse_attendance_batch(
+        await request.get_json(), lambda empid: auth.may_act_for(payload, empid))
+    if error:
+        return jsonify({"error": error}), 400
+
+    if rows:
+        async with mysql.transaction() as cur:
+            await writer(cur, [(empid, date, time) for _, empid, date, time in rows])
+
+    body, status = attendance.batch_body(rows, results)
+    return jsonify(body), status
+
+
+@app.route('/api/checkin/batch', methods=['POST'])
+@protect()
+async def checkin_batch():
+    try:
+        return await attendance_batch(write_checkins)
+    except Exception as e:
+        log.error("checkin_batch_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/checkout/batch', methods=['POST'])
+@protect()
+async def checkout_batch():
+    try:
+        return await attendance_batch(write_checkouts)
+    except Exception as e:
+        log.error("checkout_batch_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/coffee-break', methods=['POST'])
+@protect(owner='empid')
+async def save_coffee_break():
+    try:
+        data = await request.get_json()
+        empid = data.get('empid')
+        time = data.get('time')
+        date = data.get('date')
+
+        error = attendance.swipe_error(empid, date, time)
+        if error:
+            return jsonify({"error": error}), 400
+
+        async with mysql.transaction() as cur:
+            await cur.execute(attendance.COFFEE_BREAK_INSERT, (time, date, empid))
+            await apply_rollups(cur, 'coffee_break', [(empid, date, time)])
+
+        return jsonify({"message": "Coffee break saved successfully"}), 201
+
+    except Exception as e:
+        log.error("coffee_break_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/submit-leave', methods=['POST'])
+@protect(owner='empid')
+async def submit_leave():
+    try:
+        data = await request.get_json()
+        empid = data.get('empid')
+        start_date = data.get('leave_start_date')
+        end_date = data.get('leave_end_date')
+        status = data.get('status')
+        leave_type = data.get('leave_type')
+
+        async with mysql.transaction() as cur:
+            await cur.execute(queries.LEAVE_INSERT, (empid, start_date, end_date, status, leave_type))
+            await cur.execute(changes.RECORD, ('leave_request', str(cur.lastrowid), empid))
+            await cur.execute(leave_counters.INCREMENT, (empid, leave_counters.normalize(leave_type),
+                                                         leave_counters.normalize(status), 1))
+            await cur.execute(versions.BUMP, ('leave_request',))
+
+        return jsonify({"message": "Leave request submitted successfully"}), 201
+
+    except Exception as e:
+        log.error("submit_leave_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/leave-count/<int:empid>', methods=['GET'])
+@protect(owner='empid')
+async def get_leave_counts(empid):
+    try:
+        async with mysql.cursor() as cur:
+            await cur.execute(leave_counters.COUNTS_BY_TYPE, (empid,))
+            by_type = {row[0]: int(row[1]) for row in await cur.fetchall()}
+
+        results = {}
+        for leave_type in LEAVE_TYPES:
+            results[leave_type.view] = by_type.get(leave_type.name, 0)
+
+        return jsonify({
+            "success": True,
+            "empid": empid,
+            "leave_counts": results
+        }), 200
+
+    except Exception as e:
+        log.error("leave_counts_failed", empid=empid, exc_info=True)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+async def counts_by_status(empid, status):
+    async with mysql.cursor() as cur:
+        await cur.execute(leave_counters.COUNTS_BY_STATUS, (empid, leave_counters.normalize(status)))
+        return {row[0]: int(row[1]) for row in await cur.fetchall()}
+
+
+@app.route('/api/leave-count', methods=['GET'])
+@protect(owner='empId')
+async def get_leave_count_by_employee():
+    emp_id = request.args.get('empId')
+    status = request.args.get('status')
+
+    if not emp_id or not status:
+        return jsonify({'error': 'Missing empId or status'}), 400
+
+    leave_counts = []
+
+    try:
+        counts = await counts_by_status(emp_id, status)
+        for leave_type in LEAVE_TYPES:
+            count = counts.get(leave_type.name, 0)
+            leave_counts.append(f"{leave_type.label}: {count} requests ({status})")
+        return jsonify(leave_counts)
+
+    except Exception as e:
+        log.error("leave_count_by_employee_failed", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/total-count', methods=['GET'])
+@protect(owner='employeeId')
+async def total_count():
+    employee_id = request.args.get('employeeId', type=int)
+    status = request.args.get('status')
+
+    if employee_id is None or not status:
+        return jsonify({"error": "Missing required query parameters: employeeId and status"}), 400
+
+    try:
+        count = sum((await counts_by_status(employee_id, status)).values())
+        return jsonify({
+            "count": count,
+            "success": True,
+            "employeeId": employee_id,
+            "status": status
+        }), 200
+
+    except Exception as e:
+        log.error("total_count_failed", exc_info=True)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/pending-leave-requests', methods=['GET'])
+@protect(manager=True)
+async def get_pending_leave_requests():
+    try:
+        async with mysql.cursor() as cur:
+            await cur.execute(queries.PENDING_LEAVES)
+            rows = await cur.fetchall()
+
+        leave_requests = []
+        for row in rows:
+            leave_requests.append({
+                "requestId": row[0],
+                "empId": row[1],
+                "employeeName": row[2],
+                "leaveStartDate": row[3],
+                "leaveEndDate": row[4],
+                "status": row[5],
+                "leaveType": row[6],
+            })
+
+        return jsonify(leave_requests), 200
+
+    except Exception as e:
+        log.error("pending_leave_requests_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/update-leave-status', methods=['POST'])
+@protect(manager=True)
+async def update_leave_status():
+    try:
+        data = await request.get_json()
+        leave_id = data.get('leave_id')
+        new_status = data.get('status')
+
+        async with mysql.transaction() as cur:
+            await cur.execute(leave_counters.SELECT_FOR_MOVE, (leave_id,))
+            for params in leave_counters.move_params(await cur.fetchone(), new_status):
+                await cur.execute(leave_counters.INCREMENT, params)
+            await cur.execute(queries.LEAVE_STATUS_UPDATE, (new_status, leave_id))
+            await cur.execute(changes.RECORD_LEAVE, (leave_id,))
+            await cur.execute(versions.BUMP, ('leave_request',))
+
+        return jsonify({"message": "Leave status updated successfully"}), 200
+
+    except Exception as e:
+        log.error("update_leave_status_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/leave-dates', methods=['GET'])
+@protect(owner='empid')
+async def get_leave_dates():
+    empid = request.args.get('empid')
+
+    if not empid:
+        return jsonify({"error": "empid is required"}), 400
+
+    try:
+        async with mysql.cursor() as cur:
+            await cur.execute(queries.ACCEPTED_LEAVE_DATES, (empid,))
+            rows = await cur.fetchall()
+
+        leave_data = []
+        for row in rows:
+            leave_data.append({
+                "empid": row[0],
+                "leave_start_date": row[1],
+                "leave_end_date": row[2]
+            })
+
+        return jsonify({"leave_dates": leave_data}), 200
+
+    except Exception as e:
+        log.error("leave_dates_failed", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
@@ -0,0 +1,226 @@
+import datetime
+import threading
+import time
+
+import versions
+from app_logging import get_logger
+from intervals import IntervalTree
+
+log = get_logger('attendify.availability')
+
+# In-process index behind /api/availability:
+# - accepted leave_request rows are kept in an interval tree keyed by date
+#   ordinal;
+# - Employee attributes are kept for faculty and occupation filters;
+# - who checked in during the last AVAILABILITY_PRESENCE_DAYS days is kept
+#   as sets read from attendance_daily.
+#
+# Writes made by this process are applied incrementally once they commit,
+# so a rolled-back write never reaches the index. Each query first
+# reads the leave_request and Employee versions from table_version, which
+# is one primary-key lookup. If another process changed either table, or
+# an incremental update missed a version, the index reloads. Presence is
+# re-read every AVAILABILITY_PRESENCE_TTL seconds.
+
+TABLES = ('leave_request', 'Employee')
+
+EMPLOYEES_QUERY = "SELECT empid, full_name, faculty, occupation FROM Employee"
+EMPLOYEE_QUERY = "SELECT empid, full_name, faculty, occupation FROM Employee WHERE empid = %s"
+LEAVES_QUERY = ("SELECT request_id, empid, leave_start_date, leave_end_date FROM leave_request "
+                "WHERE status = 'accepted'")
+LEAVE_QUERY = ("SELECT empid, leave_start_date, leave_end_date, status FROM leave_request "
+               "WHERE request_id = %s")
+PRESENCE_QUERY = "SELECT day, empid FROM attendance_daily WHERE day >= %s AND first_checkin IS NOT NULL"
+
+
+def _day(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+class AvailabilityIndex:
+    def __init__(self, mysql, presence_days=1, presence_ttl=30):
+        self.mysql = mysql
+        self.presence_days = presence_days
+        self.presence_ttl = presence_ttl
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._loaded = False
+        self._stale = False
+        self._versions = {}
+        self._leaves = IntervalTree()
+        self._spans = {}
+        self._employees = {}
+        self._presence = {}
+        self._presence_at = None
+
+    def _sync(self, cur):
+        with self._sync_lock:
+            current = versions.read(cur, TABLES)
+            with self._lock:
+                fresh = self._loaded and not self._stale and current == self._versions
+            if not fresh:
+                self._reload(cur, current)
+            if self._presence_at is None or time.monotonic() - self._presence_at >= self.presence_ttl:
+                self._load_presence(cur)
+
+    def _reload(self, cur, current):
+        started = time.perf_counter()
+        cur.execute(EMPLOYEES_QUERY)
+        employees = {row[0]: {"full_name": row[1], "faculty": row[2], "occupation": row[3]}
+                     for row in cur.fetchall()}
+
+        cur.execute(LEAVES_QUERY)
+        leaves = IntervalTree()
+        spans = {}
+        for request_id, empid, start, end in cur.fetchall():
+            span = self._span(empid, start, end)
+            if span:
+                leaves.add(span[1], span[2], request_id)
+                spans[request_id] = span
+
+        with self._lock:
+            self._employees = employees
+            self._leaves = leaves
+            self._spans = spans
+            self._versions = dict(current)
+            self._loaded = True
+            self._stale = False
+        log.info("availability_reloaded", leaves=len(spans), employees=len(employees),
+                 ms=round((time.perf_counter() - started) * 1000, 1))
+
+    def _load_presence(self, cur):
+        since = datetime.date.today() - datetime.timedelta(days=self.presence_days - 1)
+        cur.execute(PRESENCE_QUERY, (since.isoformat(),))
+        presence = {}
+        for day, empid in cur.fetchall():
+            presence.setdefault(_day(day), set()).add(empid)
+        with self._lock:
+            self._presence = presence
+            self._presence_at = time.monotonic()
+
+    def _span(self, empid, start, end):
+        # (empid, start ordinal, end ordinal), None for rows without usable dates
+        try:
+            start, end = _day(start), _day(end)
+        except (TypeError, ValueError):
+            return None
+        if end < start:
+            return None
+        return (empid, start.toordinal(), end.toordinal())
+
+    def _advance(self, table, version):
+        # Our own write moved table to version; a gap means someone else wrote too
+        if self._versions.get(table) != version - 1:
+            self._stale = True
+        self._versions[table] = version
+
+    def leave_written(self, cur, request_id):
+        # Call inside the write's transaction, after versions.bump, and pass
+        # the result to apply() once the transaction has committed
+        if not self._loaded:
+            return None
+        cur.execute(LEAVE_QUERY, (request_id,))
+        row = cur.fetchone()
+        version = versions.read(cur, ('leave_request',))['leave_request']
+        span = None
+        if row and (row[3] or '').strip().lower() == 'accepted':
+            span = self._span(row[0], row[1], row[2])
+        return ('leave_request', version, request_id, span)
+
+    def employee_written(self, cur, empid):
+        # Same contract as leave_written()
+        if not self._loaded:
+            return None
+        cur.execute(EMPLOYEE_QUERY, (empid,))
+        row = cur.fetchone()
+        version = versions.read(cur, ('Employee',))['Employee']
+        info = None
+        if row:
+            info = {"full_name": row[1], "faculty": row[2], "occupation": row[3]}
+        return ('Employee', version, empid, info)
+
+    def apply(self, change):
+        if change is None:
+            return
+        table, version, key, value = change
+        with self._lock:
+            if table == 'leave_request':
+                old = self._spans.pop(key, None)
+                if old:
+                    self._leaves.remove(old[1], old[2], key)
+                if value:
+                    self._leaves.add(value[1], value[2], key)
+                    self._spans[key] = value
+            elif value:
+                self._employees[key] = value
+            self._advance(table, version)
+
+    def checked_in(self, rows):
+        # rows of (empid, date, time); dates outside the presence window are ignored
+        if self._presence_at is None:
+            return
+        since = datetime.date.today() - datetime.timedelta(days=self.presence_days - 1)
+        with self._lock:
+            for empid, date, _ in rows:
+                try:
+                    day = _day(date)
+                    empid = int(empid)
+                except (TypeError, ValueError):
+                    continue
+                if day >= since:
+                    self._presence.setdefault(day, set()).add(empid)
+
+    def query(self, start, end, faculty=None, occupation=None):
+        cur = self.mysql.connection.cursor()
+        try:
+            self._sync(cur)
+        finally:
+            cur.close()
+
+        since = datetime.date.today() - datetime.timedelta(days=self.presence_days - 1)
+        with self._lock:
+            staff = {empid: info for empid, info in self._employees.items()
+                     if (not faculty or info["faculty"] == faculty)
+                     and (not occupation or info["occupation"] == occupation)}
+            overlapping = [(first, last, self._spans[request_id][0]) for first, last, request_id
+                           in self._leaves.overlapping(start.toordinal(), end.toordinal())]
+            presence = {day: set(empids) for day, empids in self._presence.items() if start <= day <= end}
+
+        on_leave = {}
+        for first, last, empid in overlapping:
+            if empid not in staff:
+                continue
+            for ordinal in range(max(first, start.toordinal()), min(last, end.toordinal()) + 1):
+                on_leave.setdefault(ordinal, set()).add(empid)
+
+        days = []
+        mentioned = set()
+        day = start
+        while day <= end:
+            away = on_leave.get(day.toordinal(), set())
+            present = None
+            if since <= day <= datetime.date.today():
+                present = presence.get(day, set()) & staff.keys()
+                mentioned |= present
+            mentioned |= away
+            days.append({
+                "date": day.isoformat(),
+                "on_leave": sorted(away),
+                "present": None if present is None else sorted(present),
+            })
+            day += datetime.timedelta(days=1)
+
+        return {
+            "staff": len(staff),
+            "days": days,
+            "employees": {empid: staff[empid] for empid in sorted(mentioned)},
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"loaded": self._loaded, "accepted_leaves": len(self._spans),
+                    "employees": len(self._employees), "versions": dict(self._versions)}
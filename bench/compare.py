@@ -0,0 +1,30 @@
+import argparse
+import json
+
+# Side-by-side comparison of two bench/run.py result files.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two attendify benchmark result files.")
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--metric', default='p95_ms', choices=['rps', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'])
+    args = parser.parse_args()
+
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    with open(args.candidate) as handle:
+        candidate = json.load(handle)
+
+    print(f"{args.metric}: {baseline.get('label')}@{baseline.get('commit')} -> "
+          f"{candidate.get('label')}@{candidate.get('commit')}")
+    print(f"{'endpoint':36} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for label in sorted(set(baseline['endpoints']) | set(candidate['endpoints'])):
+        old = baseline['endpoints'].get(label, {}).get(args.metric)
+        new = candidate['endpoints'].get(label, {}).get(args.metric)
+        change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "n/a"
+        print(f"{label:36} {str(old):>10} {str(new):>10} {change:>8}")
+
+
+if __name__ == '__main__':
+    main()
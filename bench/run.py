@@ -0,0 +1,241 @@
+import argparse
+import datetime
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+sys.path.insert(0, ROOT)
+
+import seed as seeding  # noqa: E402
+
+# Replays a morning check-in burst, dashboard polling of the leave-count
+# endpoints and a manager working through pending leaves, then reports
+# requests/second and latency percentiles per endpoint. By default it boots
+# attendify.app in-process against a freshly seeded SQLite stand-in; with
+# --url it drives an already running server (WSGI or ASGI) instead.
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self._client.open(path, method=method, json=body)
+        response.get_data()
+        return response.status_code
+
+
+class HttpClient:
+    # One keep-alive connection per thread
+    def __init__(self, base_url):
+        parsed = urllib.parse.urlsplit(base_url)
+        self._host = parsed.hostname
+        self._port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        self._https = parsed.scheme == 'https'
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self._host, self._port, timeout=30)
+        return conn
+
+    def request(self, method, path, body=None):
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, label, elapsed, ok):
+        with self._lock:
+            self.samples.setdefault(label, []).append((elapsed, ok))
+
+
+def timed(client, recorder, label, method, path, body=None):
+    started = time.perf_counter()
+    try:
+        status = client.request(method, path, body)
+        ok = status < 500
+    except Exception:
+        ok = False
+    recorder.record(label, time.perf_counter() - started, ok)
+
+
+def run_phase(name, tasks, concurrency, client, recorder, phases):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for task in tasks:
+            pool.submit(timed, client, recorder, *task)
+    duration = time.perf_counter() - started
+    phases[name] = {"requests": len(tasks), "duration_s": round(duration, 3),
+                    "rps": round(len(tasks) / duration, 1) if duration else None}
+
+
+def checkin_burst(employees, date):
+    tasks = []
+    for empid in range(1, employees + 1):
+        body = {"empid": empid, "date": date, "time": f"08:{random.randint(0, 59):02d}"}
+        tasks.append(("POST /api/checkin", "POST", "/api/checkin", body))
+    random.shuffle(tasks)
+    return tasks
+
+
+def dashboard_polling(employees, requests):
+    tasks = []
+    for _ in range(requests):
+        empid = random.randint(1, employees)
+        status = random.choice(["pending", "accepted"])
+        choice = random.randrange(3)
+        if choice == 0:
+            tasks.append(("GET /api/leave-count/<empid>", "GET", f"/api/leave-count/{empid}"))
+        elif choice == 1:
+            tasks.append(("GET /api/leave-count", "GET", f"/api/leave-count?empId={empid}&status={status}"))
+        else:
+            tasks.append(("GET /api/total-count", "GET", f"/api/total-count?employeeId={empid}&status={status}"))
+    return tasks
+
+
+def manager_review(pending_ids, list_requests):
+    tasks = [("GET /api/pending-leave-requests", "GET", "/api/pending-leave-requests")] * list_requests
+    for request_id in pending_ids:
+        body = {"leave_id": request_id, "status": random.choice(["accepted", "rejected"]), "leave_type": "annual leave"}
+        tasks.append(("POST /api/update-leave-status", "POST", "/api/update-leave-status", body))
+    return tasks
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, total_duration):
+    endpoints = {}
+    for label, samples in sorted(recorder.samples.items()):
+        latencies = sorted(elapsed * 1000 for elapsed, _ in samples)
+        endpoints[label] = {
+            "requests": len(samples),
+            "errors": sum(1 for _, ok in samples if not ok),
+            "rps": round(len(samples) / total_duration, 1) if total_duration else None,
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+        }
+    return endpoints
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def pending_request_ids(db_path, limit):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT request_id FROM leave_request WHERE status = 'pending' ORDER BY request_id LIMIT ?",
+                        (limit,)).fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the attendify API.")
+    parser.add_argument('--url', help="Drive a running server instead of booting attendify.app in-process")
+    parser.add_argument('--db', default=os.path.join(HERE, 'bench.db'), help="SQLite stand-in database file")
+    parser.add_argument('--no-seed', action='store_true', help="Reuse --db as it is")
+    parser.add_argument('--employees', type=int, default=500)
+    parser.add_argument('--attendance-days', type=int, default=30)
+    parser.add_argument('--leaves-per-employee', type=int, default=4)
+    parser.add_argument('--poll-requests', type=int, default=3000)
+    parser.add_argument('--review-list-requests', type=int, default=50)
+    parser.add_argument('--review-updates', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--label', default='wsgi', help="Free-form name for this run, e.g. wsgi or asgi")
+    parser.add_argument('--output', help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    random.seed(1234)
+    if not args.no_seed:
+        seeding.seed(args.db, args.employees, args.attendance_days, args.leaves_per_employee)
+
+    if args.url:
+        client = HttpClient(args.url)
+    else:
+        os.environ['SQLITE_STANDIN'] = os.path.abspath(args.db)
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        os.environ.setdefault('LOG_REQUESTS', '0')
+        os.environ.setdefault('MYSQL_POOL_SIZE', str(args.concurrency))
+        import attendify
+        client = InProcessClient(attendify.app)
+
+    recorder = Recorder()
+    phases = {}
+    burst_date = datetime.date.today().isoformat()
+    started = time.perf_counter()
+    run_phase('checkin_burst', checkin_burst(args.employees, burst_date), args.concurrency, client, recorder, phases)
+    run_phase('dashboard_polling', dashboard_polling(args.employees, args.poll_requests), args.concurrency,
+              client, recorder, phases)
+    run_phase('manager_review', manager_review(pending_request_ids(args.db, args.review_updates),
+                                               args.review_list_requests), args.concurrency, client, recorder, phases)
+    total_duration = time.perf_counter() - started
+
+    results = {
+        "label": args.label,
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        "target": args.url or "in-process",
+        "config": {key: value for key, value in vars(args).items() if key not in ('output',)},
+        "phases": phases,
+        "endpoints": summarize(recorder, total_duration),
+    }
+
+    output = args.output or os.path.join(HERE, 'results', f"{results['commit'] or 'local'}-{args.label}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+
+    print(f"{'endpoint':36} {'reqs':>6} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for label, stats in results["endpoints"].items():
+        print(f"{label:36} {stats['requests']:>6} {stats['errors']:>4} {stats['rps']:>8} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+    for name, phase in phases.items():
+        print(f"phase {name}: {phase['requests']} requests in {phase['duration_s']}s ({phase['rps']} req/s)")
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import migrations  # noqa: E402
+import sqlite_standin  # noqa: E402
+from leave_types import LEAVE_TYPES as REGISTRY  # noqa: E402
+
+# Seeds a SQLite stand-in database with a synthetic faculty so the benchmark
+# (or a server started with SQLITE_STANDIN=<path>) has realistic volumes.
+
+FACULTIES = ["Engineering", "Science", "Business", "Arts", "Medicine", "Law"]
+OCCUPATIONS = ["teacher"] * 8 + ["assistant", "manager"]
+LEAVE_TYPES = [leave_type.name for leave_type in REGISTRY]
+STATUSES = ["pending", "accepted", "rejected"]
+
+
+def seed(path, employees=500, attendance_days=30, leaves_per_employee=4, start=None, rng_seed=42):
+    rng = random.Random(rng_seed)
+    start = start or datetime.date(2026, 1, 1)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    # Same schema as production, through the stand-in's MySQL translation
+    standin = sqlite_standin.Connection(path)
+    migrations.upgrade(standin.cursor(), standin)
+    standin.close()
+
+    conn = sqlite3.connect(path)
+
+    conn.executemany(
+        "INSERT INTO Employee (full_name, username, phone_number, email, password, occupation, faculty) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(f"Employee {n}", f"user{n}", f"+961{n:07d}", f"user{n}@example.edu", "secret",
+          rng.choice(OCCUPATIONS), rng.choice(FACULTIES)) for n in range(1, employees + 1)])
+
+    attendance = []
+    for day in range(attendance_days):
+        date = (start + datetime.timedelta(days=day)).isoformat()
+        for empid in range(1, employees + 1):
+            attendance.append((empid, date, f"0{rng.randint(7, 9)}:{rng.randint(0, 59):02d}"))
+    conn.executemany("INSERT INTO attendance (empid, checkinDate, checkinTime) VALUES (?, ?, ?)", attendance)
+
+    leaves = []
+    for empid in range(1, employees + 1):
+        for _ in range(leaves_per_employee):
+            first = start + datetime.timedelta(days=rng.randint(0, 180))
+            last = first + datetime.timedelta(days=rng.randint(0, 6))
+            leaves.append((empid, first.isoformat(), last.isoformat(), rng.choice(STATUSES), rng.choice(LEAVE_TYPES)))
+    conn.executemany(
+        "INSERT INTO leave_request (empid, leave_start_date, leave_end_date, status, leave_type) "
+        "VALUES (?, ?, ?, ?, ?)", leaves)
+    conn.execute("""
+        INSERT INTO leave_counter (empid, leave_type, status, total)
+        SELECT empid, leave_type, status, COUNT(*) FROM leave_request GROUP BY empid, leave_type, status
+    """)
+
+    conn.execute("""
+        INSERT INTO attendance_daily (empid, day, faculty, first_checkin)
+        SELECT a.empid, a.checkinDate, e.faculty, MIN(a.checkinTime)
+        FROM attendance a JOIN Employee e ON e.empid = a.empid
+        GROUP BY a.empid, a.checkinDate, e.faculty
+    """)
+
+    conn.commit()
+    conn.close()
+    return {"employees": employees, "attendance": len(attendance), "leave_requests": len(leaves)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a SQLite stand-in database for attendify.")
+    parser.add_argument('--db', default=os.path.join(HERE, 'bench.db'))
+    parser.add_argument('--employees', type=int, default=500)
+    parser.add_argument('--attendance-days', type=int, default=30)
+    parser.add_argument('--leaves-per-employee', type=int, default=4)
+    args = parser.parse_args()
+    counts = seed(args.db, args.employees, args.attendance_days, args.leaves_per_employee)
+    print(f"Seeded {args.db}: {counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import datetime
+import gzip
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import serialization  # noqa: E402
+
+# CPU time and bytes on the wire for the big list responses, encoded the
+# old way (rows picked by index, Flask's json) and through serialization
+# (dict rows, orjson, gzip/brotli). Rows are generated with the types
+# PyMySQL returns (date objects for DATE columns) rather than read from the
+# SQLite stand-in, whose dates are plain strings.
+
+LEAVE_TYPES = ['annual leave', 'sick leave', 'maternity leave', 'bereavement leave']
+FACULTIES = ['Engineering', 'Science', 'Arts', 'Business', 'Medicine']
+
+
+class FakeCursor:
+    def __init__(self, columns, rows):
+        self.description = [(column,) + (None,) * 6 for column in columns]
+        self._rows = rows
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+def employee_rows(count):
+    columns = ["empid", "full_name", "email", "username", "phone_number", "occupation", "faculty"]
+    rows = [(empid, f"Employee {empid}", f"user{empid}@example.edu", f"user{empid}", f"+961{empid:07d}",
+             random.choice(['teacher', 'staff', 'manager']), random.choice(FACULTIES))
+            for empid in range(1, count + 1)]
+    return columns, rows
+
+
+def leave_rows(count, employees):
+    columns = ["requestId", "empId", "employeeName", "leaveStartDate", "leaveEndDate", "status", "leaveType"]
+    rows = []
+    for request_id in range(1, count + 1):
+        empid = random.randint(1, employees)
+        start = datetime.date(2026, 1, 1) + datetime.timedelta(days=random.randint(0, 364))
+        rows.append((request_id, empid, f"Employee {empid}", start,
+                     start + datetime.timedelta(days=random.randint(0, 14)), 'pending',
+                     random.choice(LEAVE_TYPES)))
+    return columns, rows
+
+
+def by_index(columns, rows):
+    # What the handlers did before: one dict literal per row
+    return [{columns[0]: row[0], columns[1]: row[1], columns[2]: row[2], columns[3]: row[3],
+             columns[4]: row[4], columns[5]: row[5], columns[6]: row[6]} for row in rows]
+
+
+def cpu_ms(func, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON encoding and compression of list responses.")
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--leave-requests', type=int, default=8000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--gzip-level', type=int, default=6)
+    parser.add_argument('--brotli-quality', type=int, default=4)
+    args = parser.parse_args()
+    random.seed(1)
+
+    app = Flask(__name__)
+    baseline = DefaultJSONProvider(app)
+    candidate = serialization.JSONProvider(app)
+    app.config['JSON_DATES'] = 'iso'
+    iso = serialization.JSONProvider(app)
+    print(f"orjson: {'yes' if serialization.orjson else 'no'}, brotli: {'yes' if serialization.brotli else 'no'}")
+
+    payloads = {
+        "get-all-employees": employee_rows(args.employees),
+        "pending-leave-requests": leave_rows(args.leave_requests, args.employees),
+    }
+
+    print(f"{'list':24} {'rows':>6} {'old ms':>8} {'new ms':>8} {'iso ms':>8} {'json B':>9} "
+          f"{'gzip B':>8} {'gzip ms':>8} {'br B':>8} {'br ms':>8}")
+    with app.app_context():
+        for name, (columns, rows) in payloads.items():
+            old = cpu_ms(lambda: baseline.response(by_index(columns, rows)).get_data(), args.repeat)
+            new = cpu_ms(lambda: candidate.response(serialization.dict_rows(FakeCursor(columns, rows))).get_data(),
+                         args.repeat)
+            iso_ms = cpu_ms(lambda: iso.response(serialization.dict_rows(FakeCursor(columns, rows))).get_data(),
+                            args.repeat)
+            body = candidate.response(serialization.dict_rows(FakeCursor(columns, rows))).get_data()
+
+            gzipped = gzip.compress(body, compresslevel=args.gzip_level, mtime=0)
+            gzip_ms = cpu_ms(lambda: gzip.compress(body, compresslevel=args.gzip_level, mtime=0), args.repeat)
+            if serialization.brotli:
+                brotlied = serialization.brotli.compress(body, quality=args.brotli_quality)
+                br_bytes = str(len(brotlied))
+                br_ms = f"{cpu_ms(lambda: serialization.brotli.compress(body, quality=args.brotli_quality), args.repeat):.2f}"
+            else:
+                br_bytes = br_ms = "n/a"
+
+            print(f"{name:24} {len(rows):>6} {old:>8.2f} {new:>8.2f} {iso_ms:>8.2f} {len(body):>9} "
+                  f"{len(gzipped):>8} {gzip_ms:>8.2f} {br_bytes:>8} {br_ms:>8}")
+
+
+if __name__ == '__main__':
+    main()
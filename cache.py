@@ -0,0 +1,132 @@
+import collections
+import json
+import threading
+import time
+
+
+class LRUCache:
+    """In-process LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._stats['misses'] += 1
+                return None
+            value, expires_at = item
+            if expires_at <= now:
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        # set() only if key is absent or expired; True when stored
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] > time.monotonic():
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def _store(self, key, value, ttl):
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return _stats_dict('memory', self._stats, size=len(self._data), max_entries=self.max_entries)
+
+
+class RedisCache:
+    """Same interface as LRUCache, shared across workers through a Redis-compatible server.
+
+    Values must be JSON-serializable. Size and eviction are left to the
+    server's ``maxmemory`` policy; hit/miss counters are per process.
+    """
+
+    def __init__(self, client, ttl=300, prefix='attendify:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + str(key))
+        with self._lock:
+            self._stats['hits' if raw is not None else 'misses'] += 1
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + str(key), json.dumps(value, default=str),
+                        ex=max(1, int(self.ttl if ttl is None else ttl)))
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(self.prefix + str(key), json.dumps(value, default=str),
+                                    ex=max(1, int(self.ttl if ttl is None else ttl)), nx=True))
+
+    def delete(self, key):
+        if self.client.delete(self.prefix + str(key)):
+            with self._lock:
+                self._stats['invalidations'] += 1
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def stats(self):
+        with self._lock:
+            return _stats_dict('redis', self._stats)
+
+
+def _stats_dict(backend, counter, **extra):
+    lookups = counter['hits'] + counter['misses']
+    stats = {
+        "backend": backend,
+        "hits": counter['hits'],
+        "misses": counter['misses'],
+        "hit_ratio": round(counter['hits'] / lookups, 4) if lookups else None,
+        "evictions": counter['evictions'],
+        "expirations": counter['expirations'],
+        "invalidations": counter['invalidations'],
+    }
+    stats.update(extra)
+    return stats
+
+
+def make_cache(config, name, ttl=None, max_entries=None):
+    # CACHE_BACKEND=redis shares entries through CACHE_REDIS_URL; anything else stays in-process
+    ttl = config.get('CACHE_TTL', 300) if ttl is None else ttl
+    if config.get('CACHE_BACKEND') == 'redis':
+        import redis
+        client = redis.Redis.from_url(config['CACHE_REDIS_URL'])
+        return RedisCache(client, ttl=ttl, prefix=f'attendify:{name}:')
+    return LRUCache(max_entries=max_entries or config.get('CACHE_MAX_ENTRIES', 1024), ttl=ttl)
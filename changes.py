@@ -0,0 +1,227 @@
+import datetime
+
+import click
+from flask.cli import AppGroup
+
+import serialization
+import versions
+from app_logging import get_logger
+
+log = get_logger('attendify.changes')
+
+# Change log behind /api/sync. Write handlers add one change_log row per
+# changed record in the same transaction as the write; its AUTO_INCREMENT
+# seq is the client's cursor. A sync returns the current state of every
+# record changed after the cursor, so several changes to one record arrive
+# once.
+#
+# A seq is taken at INSERT but only becomes visible at COMMIT, so a slow
+# transaction can show up after a higher seq. The cursor handed back only
+# moves past entries older than SYNC_SETTLE_SECONDS; newer ones are sent
+# again on the next sync, which is harmless because clients upsert.
+#
+# `flask --app attendify changes compact` drops entries superseded by a
+# later one for the same record (always safe) and entries older than the
+# retention. The highest seq dropped for age is kept in table_version as
+# HORIZON: a cursor below it gets "reset" and must reload in full.
+
+HORIZON = 'change_log_horizon'
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+        table_name VARCHAR(32) NOT NULL,
+        row_key VARCHAR(64) NOT NULL,
+        owner INT NULL,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# owner is the employee a private record belongs to (leave requests,
+# attendance days); NULL for records every employee may see
+RECORD = "INSERT INTO change_log (table_name, row_key, owner) VALUES (%s, %s, %s)"
+RECORD_LEAVE = """
+    INSERT INTO change_log (table_name, row_key, owner)
+    SELECT 'leave_request', request_id, empid FROM leave_request WHERE request_id = %s
+"""
+
+TAIL = "SELECT seq, changed_at FROM change_log ORDER BY seq DESC LIMIT %s"
+
+# Current state of changed records, by the key the writers log.
+# (section in the response, SELECT ... WHERE <key> IN)
+ROW_QUERIES = {
+    'Employee': ('employees', "SELECT empid, full_name, email, username, phone_number, occupation, faculty, "
+                              "photo_version FROM Employee WHERE empid IN ({})"),
+    'leave_request': ('leave_requests', "SELECT request_id, empid, leave_start_date, leave_end_date, status, "
+                                        "leave_type FROM leave_request WHERE request_id IN ({})"),
+    'meetings': ('meetings', "SELECT id, title, meeting_date, start_time, end_time, location, organizer_id "
+                             "FROM meetings WHERE id IN ({})"),
+}
+# Attendance days come from the attendance_daily rollup, keyed "empid:YYYY-MM-DD"
+DAYS_QUERY = ("SELECT empid, day, first_checkin, last_checkout, coffee_breaks, worked_minutes "
+              "FROM attendance_daily WHERE {}")
+
+# compact(): entries superseded by a later one for the same record, then
+# entries older than the retention, then the new horizon
+DELETE_SUPERSEDED = """
+    DELETE FROM change_log WHERE seq NOT IN (
+        SELECT seq FROM (
+            SELECT MAX(seq) AS seq FROM change_log GROUP BY table_name, row_key
+        ) AS keep
+    )
+"""
+LAST_EXPIRED = "SELECT MAX(seq) FROM change_log WHERE changed_at < %s"
+DELETE_EXPIRED = "DELETE FROM change_log WHERE seq <= %s"
+SET_HORIZON = """
+    INSERT INTO table_version (name, version) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE version = VALUES(version)
+"""
+
+
+def read_query(owner=False, table=False):
+    # Entries after a seq, optionally only those an owner may see and/or of one table
+    where = "seq > %s"
+    if owner:
+        where += " AND (owner IS NULL OR owner = %s)"
+    if table:
+        where += " AND table_name = %s"
+    return f"SELECT seq, table_name, row_key, changed_at FROM change_log WHERE {where} ORDER BY seq LIMIT %s"
+
+
+def record(cur, table, key, owner=None):
+    cur.execute(RECORD, (table, str(key), owner))
+
+
+def day_params(keys):
+    return [('attendance', f"{empid}:{day}", empid) for empid, day in sorted(set(keys))]
+
+
+def record_days(cur, keys):
+    # keys are the (empid, day) rows attendance_rollups.apply() changed
+    params = day_params(keys)
+    if params:
+        cur.executemany(RECORD, params)
+
+
+def record_leave(cur, request_id):
+    cur.execute(RECORD_LEAVE, (request_id,))
+
+
+def _timestamp(value):
+    # MySQL returns datetimes, SQLite 'YYYY-MM-DD HH:MM:SS' strings
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(str(value))
+
+
+def db_now(cur):
+    # changed_at comes from the database clock, so compare against that
+    cur.execute("SELECT CURRENT_TIMESTAMP")
+    return _timestamp(cur.fetchone()[0])
+
+
+def settled_cursor(cur, settle, tail=1000):
+    # Highest seq no in-flight transaction can still land below
+    cutoff = db_now(cur) - datetime.timedelta(seconds=settle)
+    cur.execute(TAIL, (tail,))
+    rows = cur.fetchall()
+    for seq, changed_at in rows:
+        if _timestamp(changed_at) <= cutoff:
+            return int(seq)
+    # Everything in the tail is recent: stop just below it
+    return int(rows[-1][0]) - 1 if rows else 0
+
+
+def horizon(cur):
+    return versions.read(cur, (HORIZON,))[HORIZON]
+
+
+def read(cur, since, owner=None, limit=1000, settle=2, table=None):
+    # Entries after since that the owner may see. Returns (entries, cursor, has_more):
+    # cursor is where the next sync should start; it never passes an unsettled entry.
+    cutoff = db_now(cur) - datetime.timedelta(seconds=settle)
+    params = [since] + [value for value in (owner, table) if value is not None] + [limit]
+    cur.execute(read_query(owner is not None, table is not None), params)
+    entries = cur.fetchall()
+    cursor = since
+    for seq, _, _, changed_at in entries:
+        if _timestamp(changed_at) > cutoff:
+            break
+        cursor = int(seq)
+    # A full page is only worth following up once the cursor reached its end
+    return entries, cursor, len(entries) == limit and cursor == int(entries[-1][0])
+
+
+def load(cur, entries):
+    # {section: [current rows]} plus {section: [keys no longer there]}
+    keys = {}
+    for _, table, row_key, _ in entries:
+        keys.setdefault(table, {})[row_key] = None
+    changed, deleted = {}, {}
+    for table, wanted in keys.items():
+        wanted = list(wanted)
+        if table == 'attendance':
+            section, rows, found = _load_days(cur, wanted)
+        elif table in ROW_QUERIES:
+            section, sql = ROW_QUERIES[table]
+            cur.execute(sql.format(", ".join(["%s"] * len(wanted))), wanted)
+            rows = serialization.dict_rows(cur)
+            id_column = cur.description[0][0]
+            found = {str(row[id_column]) for row in rows}
+        else:
+            continue
+        changed[section] = rows
+        missing = [key for key in wanted if key not in found]
+        if missing:
+            deleted[section] = missing
+    return changed, deleted
+
+
+def _load_days(cur, wanted):
+    pairs = []
+    for key in wanted:
+        empid, day = key.split(':', 1)
+        pairs.append((int(empid), day))
+    where = " OR ".join(["(empid = %s AND day = %s)"] * len(pairs))
+    cur.execute(DAYS_QUERY.format(where), [value for pair in pairs for value in pair])
+    rows = serialization.dict_rows(cur)
+    found = {f"{row['empid']}:{str(row['day'])[:10]}" for row in rows}
+    return 'attendance', rows, found
+
+
+def compact(cur, keep_days):
+    # Returns (superseded entries removed, expired entries removed, new horizon)
+    cur.execute(DELETE_SUPERSEDED)
+    superseded = cur.rowcount
+    cutoff = db_now(cur) - datetime.timedelta(days=keep_days)
+    cur.execute(LAST_EXPIRED, (cutoff.strftime('%Y-%m-%d %H:%M:%S'),))
+    expired_to = cur.fetchone()[0]
+    expired = 0
+    current = horizon(cur)
+    if expired_to is not None:
+        cur.execute(DELETE_EXPIRED, (expired_to,))
+        expired = cur.rowcount
+        if int(expired_to) > current:
+            current = int(expired_to)
+            cur.execute(SET_HORIZON, (HORIZON, current))
+    return superseded, expired, current
+
+
+def register_commands(app, mysql):
+    group = AppGroup('changes', help='Maintain the change_log behind /api/sync.')
+
+    @group.command('compact')
+    @click.option('--keep-days', type=int, default=None,
+                  help='Drop entries older than this many days (default SYNC_RETENTION_DAYS).')
+    def compact_command(keep_days):
+        """Drop superseded and expired change_log entries."""
+        if keep_days is None:
+            keep_days = app.config.get('SYNC_RETENTION_DAYS', 30)
+        cur = mysql.connection.cursor()
+        superseded, expired, current = compact(cur, keep_days)
+        mysql.connection.commit()
+        cur.close()
+        log.info("change_log_compacted", superseded=superseded, expired=expired, horizon=current)
+        click.echo(f"Removed {superseded} superseded and {expired} expired entries; horizon is now {current}")
+
+    app.cli.add_command(group)
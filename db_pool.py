@@ -0,0 +1,264 @@
+import collections
+import threading
+import time
+
+from flask import g
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Entry:
+    # One physical connection plus the bookkeeping the pool needs for it
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections.
+
+    Connections are opened lazily up to ``max_size``. Borrowers wait up to
+    ``wait_timeout`` seconds for a free connection before ``PoolTimeout`` is
+    raised. Connections older than ``max_lifetime`` are closed instead of
+    being reused, and a connection that sat idle longer than
+    ``ping_interval`` is pinged before it is handed out.
+    """
+
+    def __init__(self, connect, max_size=10, max_lifetime=1800, wait_timeout=5.0, ping_interval=5.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.wait_timeout = wait_timeout
+        self.ping_interval = ping_interval
+
+        self._idle = collections.deque()
+        self._cond = threading.Condition()
+        self._size = 0
+        self._stats = collections.Counter()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            entry = self._take(deadline)
+            if entry is None:
+                return self._open()
+            if self._usable(entry):
+                with self._cond:
+                    self._stats['borrowed'] += 1
+                return entry
+            self._discard(entry)
+
+    def release(self, entry, broken=False):
+        if not broken:
+            try:
+                if _in_transaction(entry.conn):
+                    entry.conn.rollback()
+            except Exception:
+                broken = True
+
+        if broken or self._expired(entry):
+            with self._cond:
+                self._stats['recycled' if not broken else 'broken'] += 1
+            self._discard(entry)
+            return
+
+        entry.released_at = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            entries = list(self._idle)
+            self._idle.clear()
+        for entry in entries:
+            self._discard(entry)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "created": self._stats['created'],
+                "borrowed": self._stats['borrowed'],
+                "waited": self._stats['waited'],
+                "timeouts": self._stats['timeouts'],
+                "recycled": self._stats['recycled'],
+                "broken": self._stats['broken'],
+                "health_check_failures": self._stats['health_check_failures'],
+            }
+
+    # Returns an idle entry, or None when the caller got a free slot and
+    # must open a new connection itself (outside the lock)
+    def _take(self, deadline):
+        with self._cond:
+            waited = False
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f"No database connection available within {self.wait_timeout}s")
+                if not waited:
+                    self._stats['waited'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+    def _open(self):
+        try:
+            entry = _Entry(self._connect())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['created'] += 1
+            self._stats['borrowed'] += 1
+        return entry
+
+    def _usable(self, entry):
+        if self._expired(entry):
+            with self._cond:
+                self._stats['recycled'] += 1
+            return False
+        if time.monotonic() - entry.released_at < self.ping_interval:
+            return True
+        try:
+            entry.conn.ping()
+            return True
+        except Exception:
+            with self._cond:
+                self._stats['health_check_failures'] += 1
+            return False
+
+    def _expired(self, entry):
+        return self.max_lifetime and time.monotonic() - entry.created_at > self.max_lifetime
+
+    def _discard(self, entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+
+def _in_transaction(conn):
+    # PyMySQL tracks the server status flags; anything else gets a rollback to be safe
+    status = getattr(conn, 'server_status', None)
+    if status is None:
+        return True
+    return bool(status & 0x0001)  # SERVER_STATUS_IN_TRANS
+
+
+def _mysql_connect(config):
+    import pymysql
+
+    def connect():
+        return pymysql.connect(
+            host=config['MYSQL_HOST'],
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD'],
+            database=config['MYSQL_DB'],
+            port=config['MYSQL_PORT'],
+            connect_timeout=config.get('MYSQL_CONNECT_TIMEOUT', 10),
+            autocommit=False,
+        )
+    return connect
+
+
+class MySQLPool:
+    """Drop-in replacement for flask_mysqldb's ``MySQL`` backed by ConnectionPool.
+
+    ``mysql.connection`` borrows one pooled connection per app context and
+    hands it back on teardown, so handlers keep using
+    ``mysql.connection.cursor()`` / ``mysql.connection.commit()`` unchanged.
+    Set ``SQLITE_STANDIN`` to a file path to run against SQLite locally.
+    """
+
+    def __init__(self, app=None):
+        self.pool = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        if config.get('SQLITE_STANDIN'):
+            from sqlite_standin import connect_factory
+            connect = connect_factory(config['SQLITE_STANDIN'])
+        else:
+            connect = _mysql_connect(config)
+        if config.get('METRICS_SQL', True):
+            from metrics import instrument_connect
+            connect = instrument_connect(connect, config.get('METRICS_SLOW_QUERY_MS'))
+
+        self.pool = ConnectionPool(
+            connect,
+            max_size=config.get('MYSQL_POOL_SIZE', 10),
+            max_lifetime=config.get('MYSQL_POOL_MAX_LIFETIME', 1800),
+            wait_timeout=config.get('MYSQL_POOL_TIMEOUT', 5.0),
+            ping_interval=config.get('MYSQL_POOL_PING_INTERVAL', 5.0),
+        )
+        app.teardown_appcontext(self.teardown)
+        app.extensions['mysql_pool'] = self
+
+    @property
+    def connection(self):
+        if 'mysql_entry' not in g:
+            g.mysql_entry = self.pool.acquire()
+        return g.mysql_entry.conn
+
+    def release_connection(self):
+        # Give the request's connection back early, e.g. before stream_rows() borrows
+        # its own for a streamed body, so one request never holds two
+        self.teardown(None)
+
+    def teardown(self, exc):
+        entry = g.pop('mysql_entry', None)
+        if entry is not None:
+            self.pool.release(entry, broken=exc is not None)
+
+
+def unbuffered_cursor(conn):
+    # Server-side cursor so rows are read off the socket as they are consumed
+    try:
+        import pymysql
+    except ImportError:
+        return conn.cursor()
+    # Instrumented connections keep the driver connection in .wrapped
+    if isinstance(getattr(conn, 'wrapped', conn), pymysql.connections.Connection):
+        return conn.cursor(pymysql.cursors.SSCursor)
+    return conn.cursor()
+
+
+def stream_rows(pool, sql, params=(), chunk_size=500):
+    # Generator over the rows of one query on a dedicated pooled connection.
+    # The connection goes back to the pool when the generator is exhausted or
+    # closed; a half-read unbuffered result is not drained, the connection is
+    # dropped instead.
+    entry = pool.acquire()
+    finished = False
+    try:
+        cur = unbuffered_cursor(entry.conn)
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+        cur.close()
+        finished = True
+    finally:
+        pool.release(entry, broken=not finished)
@@ -0,0 +1,211 @@
+import collections
+import threading
+import time
+
+import changes
+import health
+import metrics
+from app_logging import get_logger
+
+log = get_logger('attendify.events')
+
+# Server-sent events for leave requests (/api/events).
+# submit_leave and update_leave_status call notify() once they commit. Each
+# worker runs one poller thread, started with its first stream. The poller
+# reads new leave_request entries from change_log and hands every open
+# stream the request's current row. It also polls every poll_interval
+# seconds, which picks up writes made by other workers.
+#
+# Event ids are change_log seqs, so a client reconnecting with Last-Event-ID
+# to any worker gets what it missed replayed from change_log. Like
+# /api/sync, a replay starts a settle window back, so an event can arrive
+# twice.
+
+TABLE = 'leave_request'
+EVENT = 'leave_request'
+CONNECTIONS = 'attendify_events_connections'
+PUBLISHED = 'attendify_events_published_total'
+DROPPED = 'attendify_events_dropped_streams_total'
+
+metrics.registry.describe(PUBLISHED, 'counter', 'Leave request events handed to open streams.')
+metrics.registry.describe(DROPPED, 'counter', 'Event streams closed because the client fell behind.')
+
+
+def format_event(dumps, event_id, name, data):
+    return f"id: {event_id}\nevent: {name}\ndata: {dumps(data)}\n\n"
+
+
+class Subscriber:
+    def __init__(self, empid, max_queue):
+        self.empid = empid  # None: every employee's events
+        self.max_queue = max_queue
+        self.events = collections.deque()
+        self.skip = set()
+        self.overflowed = False
+
+    def wants(self, empid):
+        return self.empid is None or str(self.empid) == str(empid)
+
+
+class EventBus:
+    def __init__(self, mysql, max_connections=2, poll_interval=1.0, settle=2, max_queue=256, batch=500):
+        self.mysql = mysql
+        self.max_connections = max_connections
+        self.poll_interval = poll_interval
+        self.settle = settle
+        self.max_queue = max_queue
+        self.batch = batch
+        self._cond = threading.Condition()
+        self._subscribers = set()
+        self._published = collections.OrderedDict()
+        self._cursor = None
+        self._wake = threading.Event()
+        self._thread = None
+        metrics.registry.gauge(CONNECTIONS, 'Open /api/events streams in this worker.',
+                               lambda: len(self._subscribers))
+
+    def subscribe(self, empid):
+        # None when the worker already holds max_connections streams
+        with self._cond:
+            if len(self._subscribers) >= self.max_connections:
+                return None
+            subscriber = Subscriber(empid, self.max_queue)
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='attendify-events', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._cond:
+            self._subscribers.discard(subscriber)
+
+    def notify(self):
+        if self._subscribers:
+            self._wake.set()
+
+    def replay(self, cur, subscriber, last_id):
+        # (events missed after last_id, id the stream starts at). events is None
+        # when change_log no longer covers last_id or more than batch were
+        # missed: the client has to reload. Without last_id nothing is replayed.
+        horizon = changes.horizon(cur)
+        settled = changes.settled_cursor(cur, self.settle)
+        current = max(horizon, settled)
+        if last_id is None:
+            return [], current
+        if last_id < horizon:
+            return None, current
+        owner = subscriber.empid
+        cur.execute(changes.read_query(owner is not None, True),
+                    [min(last_id, settled)] + ([owner] if owner is not None else []) + [TABLE, self.batch])
+        entries = cur.fetchall()
+        if len(entries) == self.batch:
+            return None, current
+        events = self._events(cur, entries)
+        subscriber.skip.update(seq for seq, _ in events)
+        return events, last_id
+
+    def wait(self, subscriber, timeout):
+        # Events queued for the subscriber, waiting up to timeout for the first
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            # Wakeups for other subscribers' events don't end the wait
+            while not subscriber.events and not subscriber.overflowed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            events = list(subscriber.events)
+            subscriber.events.clear()
+        return events
+
+    def stream(self, subscriber, replayed, first_id, dumps, heartbeat=15, max_seconds=300, retry_ms=3000):
+        # SSE body; the worker thread is released when max_seconds run out and the
+        # client reconnects with Last-Event-ID
+        try:
+            # The bare id gives a client that reconnects before any event a Last-Event-ID
+            yield f"retry: {retry_ms}\nid: {first_id}\n\n"
+            if replayed is None:
+                yield format_event(dumps, first_id, 'reset', {"reason": "missed events are no longer available"})
+            else:
+                for seq, row in replayed:
+                    yield format_event(dumps, seq, EVENT, row)
+            deadline = time.monotonic() + max_seconds
+            while not health.is_draining():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                events = self.wait(subscriber, min(heartbeat, remaining))
+                for seq, row in events:
+                    yield format_event(dumps, seq, EVENT, row)
+                if subscriber.overflowed:
+                    metrics.registry.inc(DROPPED, {})
+                    log.info("event_stream_overflow", empid=subscriber.empid)
+                    break
+                if not events:
+                    yield ": heartbeat\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _events(self, cur, entries):
+        if not entries:
+            return []
+        changed, _ = changes.load(cur, entries)
+        rows = {str(row['request_id']): row for row in changed.get('leave_requests', [])}
+        return [(int(seq), rows[str(key)]) for seq, _, key, _ in entries if str(key) in rows]
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if not self._subscribers:
+                # Start from the tail again when the next stream opens
+                self._cursor = None
+                continue
+            try:
+                self.poll()
+            except Exception:
+                log.error("event_poll_failed", exc_info=True)
+
+    def poll(self):
+        entry = self.mysql.pool.acquire()
+        broken = False
+        try:
+            cur = entry.conn.cursor()
+            if self._cursor is None:
+                # Streams replay history themselves; the poller only needs what comes next
+                self._cursor = changes.settled_cursor(cur, self.settle)
+            entries, self._cursor, _ = changes.read(cur, self._cursor, limit=self.batch,
+                                                    settle=self.settle, table=TABLE)
+            entries = [entry_row for entry_row in entries if int(entry_row[0]) not in self._published]
+            events = self._events(cur, entries)
+            cur.close()
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.mysql.pool.release(entry, broken=broken)
+        self._publish(events)
+
+    def _publish(self, events):
+        if not events:
+            return
+        with self._cond:
+            for seq, row in events:
+                self._published[seq] = None
+                for subscriber in self._subscribers:
+                    if not subscriber.wants(row['empid']) or seq in subscriber.skip:
+                        continue
+                    if len(subscriber.events) >= subscriber.max_queue:
+                        subscriber.overflowed = True
+                    else:
+                        subscriber.events.append((seq, row))
+            while len(self._published) > self.batch * 4:
+                self._published.popitem(last=False)
+            self._cond.notify_all()
+        metrics.registry.inc(PUBLISHED, {}, len(events))
+
+    def stats(self):
+        with self._cond:
+            return {"connections": len(self._subscribers), "max_connections": self.max_connections,
+                    "cursor": self._cursor, "queued": sum(len(s.events) for s in self._subscribers)}
@@ -0,0 +1,121 @@
+import csv
+import datetime
+import io
+import itertools
+import zlib
+
+from app_logging import get_logger
+from db_pool import stream_rows
+
+log = get_logger('attendify.export')
+
+# Payroll exports for /api/export. Rows are read from an unbuffered
+# server-side cursor (db_pool.stream_rows) and encoded as CSV or NDJSON a
+# chunk at a time, optionally gzipped as they go, so memory stays flat
+# however many rows a range holds. Every query walks a date index in order.
+#
+# A range is [start, end). Each query takes (start, end) once per pair of
+# placeholders.
+
+EXPORTS = {
+    'attendance': (
+        ["id", "empid", "checkinDate", "checkinTime", "checkoutDate", "checkoutTime"],
+        [
+            """
+            SELECT id, empid, checkinDate, checkinTime, checkoutDate, checkoutTime FROM attendance
+            WHERE checkinDate >= %s AND checkinDate < %s
+            ORDER BY checkinDate
+            """,
+            # check-out rows not already sent with their check-in
+            """
+            SELECT id, empid, checkinDate, checkinTime, checkoutDate, checkoutTime FROM attendance
+            WHERE checkoutDate >= %s AND checkoutDate < %s
+              AND (checkinDate IS NULL OR checkinDate < %s OR checkinDate >= %s)
+            ORDER BY checkoutDate
+            """,
+        ],
+    ),
+    'schedule': (
+        ["id", "empid", "break_date", "start_coffee_break"],
+        [
+            """
+            SELECT id, empid, break_date, start_coffee_break FROM schedule
+            WHERE break_date >= %s AND break_date < %s
+            ORDER BY break_date
+            """,
+        ],
+    ),
+    # leave requests overlapping the range
+    'leave_request': (
+        ["request_id", "empid", "leave_type", "status", "leave_start_date", "leave_end_date"],
+        [
+            """
+            SELECT request_id, empid, leave_type, status, leave_start_date, leave_end_date FROM leave_request
+            WHERE leave_end_date >= %s AND leave_start_date < %s
+            ORDER BY leave_end_date
+            """,
+        ],
+    ),
+}
+
+FORMATS = {'csv': ('text/csv', 'csv'), 'ndjson': ('application/x-ndjson', 'ndjson')}
+
+
+def params(sql, start, end):
+    return (start, end) * (sql.count('%s') // 2)
+
+
+def rows(pool, table, start, end, fetch_rows=1000):
+    # One generator over every query of the export; closing it closes the open cursor
+    for sql in EXPORTS[table][1]:
+        yield from stream_rows(pool, sql, params(sql, start, end), fetch_rows)
+
+
+def _cell(value):
+    # ISO dates and HH:MM:SS times, whatever the JSON_DATES setting
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return value
+
+
+def encode(rows, columns, fmt, dumps, first=None, chunk_bytes=64 * 1024):
+    # Text chunks of about chunk_bytes; first is a row already taken from rows
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    count = 0
+    try:
+        if writer:
+            writer.writerow(columns)
+        for row in itertools.chain([first] if first is not None else [], rows):
+            values = [_cell(value) for value in row]
+            if writer:
+                writer.writerow(values)
+            else:
+                buffer.write(dumps(dict(zip(columns, values))))
+                buffer.write("\n")
+            count += 1
+            if buffer.tell() >= chunk_bytes:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        rows.close()
+        log.info("export_streamed", rows=count, format=fmt)
+
+
+def gzip_stream(chunks, level=6):
+    # Content-Encoding: gzip, compressed on the fly
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode())
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        chunks.close()
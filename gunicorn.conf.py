@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import signal
+
+# Production serving for attendify: preforked gthread workers sized from the
+# CPUs this container may use, app code imported once in the master (preload_app) and shared by
+# the workers, graceful drain on SIGTERM and rolling worker reload on SIGHUP.
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+
+def usable_cpus():
+    # The container's CPU allowance, not the host's core count
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS has no sched_getaffinity
+        return multiprocessing.cpu_count()
+
+
+# gthread workers already overlap I/O across their threads, so one worker per
+# CPU (at least two, so a recycled worker never leaves the instance idle)
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+workers = int(os.getenv('WEB_CONCURRENCY', max(2, usable_cpus())))
+
+# Each worker needs at least one pooled connection per thread
+os.environ.setdefault('MYSQL_POOL_SIZE', str(threads))
+
+# MySQL connection budget: every instance may hold workers × MYSQL_POOL_SIZE
+# connections, and all instances plus cron jobs and migrations share the
+# server's max_connections (151 by default on Railway). The cap keeps one
+# instance at 8 × 4 = 32, so four instances fit with room to spare.
+max_workers = int(os.getenv('GUNICORN_MAX_WORKERS', 8))
+workers = min(workers, max_workers)
+# Read by attendify.py at import (preload_app), e.g. to refuse per-process idempotency keys
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers now and then so slow leaks can't build up
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = None
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    # Flip /readyz to 503 as soon as the worker starts draining, then let
+    # gunicorn's own handler finish in-flight requests
+    import health
+
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def drain(signum, frame):
+        health.mark_draining()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, drain)
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from flask import jsonify
+
+# Liveness and readiness probes. /healthz never touches the database.
+# /readyz reuses the result of the last database ping for
+# READINESS_DB_CHECK_INTERVAL seconds, so frequent probes cost at most one
+# ping per interval, and reports 503 while the worker is draining.
+
+_draining = threading.Event()
+
+
+def mark_draining():
+    _draining.set()
+
+
+def is_draining():
+    return _draining.is_set()
+
+
+class ReadinessCheck:
+    def __init__(self, mysql, interval):
+        self.mysql = mysql
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._ok = False
+        self._error = None
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.interval:
+                return self._ok, self._error
+            # Claim this interval so concurrent probes don't all ping
+            self._checked_at = now
+
+        ok, error = self._ping()
+        with self._lock:
+            self._ok, self._error = ok, error
+        return ok, error
+
+    def _ping(self):
+        try:
+            entry = self.mysql.pool.acquire()
+        except Exception as e:
+            return False, str(e)
+        broken = False
+        try:
+            entry.conn.ping()
+            return True, None
+        except Exception as e:
+            broken = True
+            return False, str(e)
+        finally:
+            self.mysql.pool.release(entry, broken=broken)
+
+
+def init_app(app, mysql):
+    check = ReadinessCheck(mysql, app.config.get('READINESS_DB_CHECK_INTERVAL', 10))
+
+    @app.route('/healthz', methods=['GET'])
+    def healthz():
+        return jsonify({"status": "ok"}), 200
+
+    @app.route('/readyz', methods=['GET'])
+    def readyz():
+        if is_draining():
+            return jsonify({"status": "draining"}), 503
+        ok, error = check.status()
+        if not ok:
+            return jsonify({"status": "unavailable", "database": error}), 503
+        return jsonify({"status": "ready", "pool": mysql.pool.stats()}), 200
@@ -0,0 +1,242 @@
+import collections
+import functools
+import hashlib
+import secrets
+import threading
+import time
+
+import click
+from flask import current_app, g, jsonify, make_response, request
+from flask.cli import AppGroup
+
+from app_logging import get_logger
+
+log = get_logger('attendify.idempotency')
+
+# Idempotency-Key support for POST handlers that mobile clients retry.
+# The first request with a key claims it in the store, runs the view and
+# stores the response; a retry with the same key and body is answered from
+# the store without running the view again. Keys are scoped to the route and
+# the token's employee. A retry that arrives while the first request is
+# still running gets 409, one with the same key but a different body 422.
+# Responses with a 5xx status are not kept, so those can be retried.
+#
+# The store is a MySQLStore by default: the claim is written in the same
+# transaction as the view's own write, so every worker sees it and a write
+# can't commit without its key. IDEMPOTENCY_STORE=cache uses a
+# cache.make_cache() instance instead, which is only shared between workers
+# with CACHE_BACKEND=redis.
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# How long a claim lasts if its request never finishes (e.g. the worker died)
+PENDING_TTL = 60
+
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS idempotency_key (
+        scope VARCHAR(320) NOT NULL PRIMARY KEY,
+        fingerprint CHAR(64) NOT NULL,
+        status SMALLINT NULL,
+        mimetype VARCHAR(100) NULL,
+        body MEDIUMTEXT NULL,
+        expires_at BIGINT NOT NULL
+    )
+"""
+# One statement, so a claim locks only its own row: a new key is inserted, an
+# expired one taken over, a live one left alone. expires_at is assigned last
+# because MySQL applies the assignments in order. claim is a random token
+# telling the request whether the row it reads back is its own.
+CLAIM = """
+    INSERT INTO idempotency_key (scope, fingerprint, claim, expires_at) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        fingerprint = CASE WHEN expires_at < %s THEN VALUES(fingerprint) ELSE fingerprint END,
+        status = CASE WHEN expires_at < %s THEN NULL ELSE status END,
+        mimetype = CASE WHEN expires_at < %s THEN NULL ELSE mimetype END,
+        body = CASE WHEN expires_at < %s THEN NULL ELSE body END,
+        claim = CASE WHEN expires_at < %s THEN VALUES(claim) ELSE claim END,
+        expires_at = CASE WHEN expires_at < %s THEN VALUES(expires_at) ELSE expires_at END
+"""
+CLAIMED_BY = "SELECT claim FROM idempotency_key WHERE scope = %s FOR UPDATE"
+RECLAIM = """
+    INSERT INTO idempotency_key (scope, fingerprint, expires_at) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE fingerprint = VALUES(fingerprint), status = NULL, mimetype = NULL,
+        body = NULL, expires_at = VALUES(expires_at)
+"""
+LOOKUP = "SELECT fingerprint, status, mimetype, body FROM idempotency_key WHERE scope = %s AND expires_at >= %s"
+STORE_RESPONSE = "UPDATE idempotency_key SET status = %s, mimetype = %s, body = %s WHERE scope = %s"
+DELETE_KEY = "DELETE FROM idempotency_key WHERE scope = %s"
+PURGE = "DELETE FROM idempotency_key WHERE expires_at < %s"
+
+
+class MySQLStore:
+    """Idempotency keys in the idempotency_key table, claimed in the request's transaction.
+
+    add() inserts the claim on the request connection without committing, so
+    it commits or rolls back together with the view's write, and a claim row
+    that is visible always comes with that write. A concurrent request with
+    the same key waits on the uncommitted row, then finds it. set() stores
+    the response and commits; delete() rolls the request back and drops the
+    claim. Claims live for ``ttl`` seconds: the pending ttl of the cache
+    stores doesn't apply, since a committed claim means the write happened.
+    """
+
+    def __init__(self, mysql, ttl=86400):
+        self.mysql = mysql
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key):
+        cur = self.mysql.connection.cursor()
+        cur.execute(LOOKUP, (key, int(time.time())))
+        row = cur.fetchone()
+        cur.close()
+        self._count('hits' if row else 'misses')
+        if row is None:
+            return None
+        if row[1] is None:
+            return {"fingerprint": row[0], "pending": True}
+        return {"fingerprint": row[0], "status": int(row[1]), "mimetype": row[2], "body": row[3]}
+
+    def add(self, key, value, ttl=None):
+        now = int(time.time())
+        token = secrets.token_hex(16)
+        conn = self.mysql.connection
+        cur = conn.cursor()
+        cur.execute(CLAIM, (key, value['fingerprint'], token, now + self.ttl) + (now,) * 6)
+        cur.execute(CLAIMED_BY, (key,))
+        row = cur.fetchone()
+        cur.close()
+        if row and row[0] == token:
+            return True
+        # Someone else's key: let go of its row lock, and start over so get()
+        # isn't answered from a snapshot taken before that request committed
+        conn.rollback()
+        return False
+
+    def set(self, key, value, ttl=None):
+        cur = self.mysql.connection.cursor()
+        if value.get('pending'):
+            # Re-claiming a key that expired under us; commits with the view like add()
+            cur.execute(RECLAIM, (key, value['fingerprint'], int(time.time()) + self.ttl))
+            cur.close()
+            return
+        cur.execute(STORE_RESPONSE, (value['status'], value['mimetype'], value['body'], key))
+        cur.close()
+        self.mysql.connection.commit()
+
+    def delete(self, key):
+        conn = self.mysql.connection
+        conn.rollback()
+        cur = conn.cursor()
+        cur.execute(DELETE_KEY, (key,))
+        if cur.rowcount:
+            self._count('invalidations')
+        cur.close()
+        conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "mysql", "hits": self._stats['hits'], "misses": self._stats['misses'],
+                    "invalidations": self._stats['invalidations']}
+
+
+def purge(cur):
+    cur.execute(PURGE, (int(time.time()),))
+    return cur.rowcount
+
+
+def register_commands(app, mysql):
+    group = AppGroup('idempotency', help='Maintain the idempotency_key table.')
+
+    @group.command('purge')
+    def purge_command():
+        """Drop expired Idempotency-Key entries."""
+        cur = mysql.connection.cursor()
+        removed = purge(cur)
+        mysql.connection.commit()
+        cur.close()
+        log.info("idempotency_keys_purged", removed=removed)
+        click.echo(f"Removed {removed} expired keys")
+
+    app.cli.add_command(group)
+
+
+def _fingerprint():
+    return hashlib.sha256(request.method.encode() + b' ' + request.path.encode() + b'\n'
+                          + request.get_data()).hexdigest()
+
+
+def _scope(owner, key):
+    return f"{request.endpoint}:{owner}:{key}"
+
+
+def replayable(store, owner):
+    # Whether idempotent() will answer this request from the store; owner is
+    # the token's empid, as protect() will set it, or ''
+    key = request.headers.get(HEADER)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return False
+    entry = store.get(_scope(owner, key))
+    return entry is not None and not entry.get('pending') and entry['fingerprint'] == _fingerprint()
+
+
+def _replay(entry):
+    response = current_app.response_class(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(store):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({"error": f"{HEADER} is too long (max {MAX_KEY_LENGTH} characters)"}), 400
+
+            owner = (getattr(g, 'auth', None) or {}).get('empid', '')
+            scope = _scope(owner, key)
+            fingerprint = _fingerprint()
+
+            claimed = False
+            try:
+                claimed = store.add(scope, {"fingerprint": fingerprint, "pending": True}, ttl=PENDING_TTL)
+                if not claimed:
+                    entry = store.get(scope)
+                    if entry is not None:
+                        if entry['fingerprint'] != fingerprint:
+                            return jsonify({"error": f"{HEADER} was already used for a different request"}), 422
+                        if entry.get('pending'):
+                            response = jsonify({"error": "A request with this Idempotency-Key is still in progress"})
+                            response.status_code = 409
+                            response.headers['Retry-After'] = '1'
+                            return response
+                        log.info("idempotent_replay", status=entry['status'])
+                        return _replay(entry)
+                    # Expired between add() and get(); claim it again
+                    store.set(scope, {"fingerprint": fingerprint, "pending": True}, ttl=PENDING_TTL)
+                    claimed = True
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                # A failed claim leaves nothing to drop, and the key may be another request's
+                if claimed:
+                    store.delete(scope)
+                else:
+                    log.error("idempotency_claim_failed", exc_info=True)
+                raise
+            if response.status_code >= 500 or response.is_streamed:
+                store.delete(scope)
+            else:
+                store.set(scope, {"fingerprint": fingerprint, "status": response.status_code,
+                                  "mimetype": response.mimetype, "body": response.get_data(as_text=True)})
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,111 @@
+import random
+
+# Dynamic interval tree: a treap ordered by (start, end, key) where every
+# node also records the largest end in its subtree. Inserts and removals
+# are O(log n) expected; overlapping(lo, hi) is O(log n + matches).
+# Intervals are closed, and start/end only need to be comparable
+# (attendify uses date ordinals and minutes since midnight).
+
+
+class _Node:
+    __slots__ = ('item', 'priority', 'left', 'right', 'max_end')
+
+    def __init__(self, item):
+        self.item = item
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.max_end = item[1]
+
+
+def _update(node):
+    node.max_end = node.item[1]
+    for child in (node.left, node.right):
+        if child is not None and child.max_end > node.max_end:
+            node.max_end = child.max_end
+
+
+def _split(node, item, inclusive=False):
+    # (items < item, items >= item); with inclusive, item itself goes left
+    if node is None:
+        return None, None
+    if node.item < item or (inclusive and node.item == item):
+        left, right = _split(node.right, item, inclusive)
+        node.right = left
+        _update(node)
+        return node, right
+    left, right = _split(node.left, item, inclusive)
+    node.left = right
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    # Every item in left sorts before every item in right
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+class IntervalTree:
+    def __init__(self, items=()):
+        self._root = None
+        self._size = 0
+        for start, end, key in items:
+            self.add(start, end, key)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, start, end, key):
+        if end < start:
+            raise ValueError("interval end is before its start")
+        item = (start, end, key)
+        left, right = _split(self._root, item)
+        middle, right = _split(right, item, inclusive=True)
+        if middle is None:
+            self._size += 1
+        self._root = _merge(_merge(left, _Node(item)), right)
+
+    def remove(self, start, end, key):
+        item = (start, end, key)
+        left, right = _split(self._root, item)
+        middle, right = _split(right, item, inclusive=True)
+        self._root = _merge(left, right)
+        if middle is not None:
+            self._size -= 1
+        return middle is not None
+
+    def overlapping(self, lo, hi):
+        # (start, end, key) for every interval sharing at least one point with [lo, hi]
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end < lo:
+                continue
+            stack.append(node.left)
+            start, end, _ = node.item
+            if start <= hi:
+                if end >= lo:
+                    found.append(node.item)
+                stack.append(node.right)
+        return found
+
+    def __iter__(self):
+        stack, node = [], self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.item
+            node = node.right
@@ -0,0 +1,126 @@
+import click
+from flask.cli import AppGroup
+
+# Rollup of leave_request row counts per (empid, leave_type, status).
+# submit_leave and update_leave_status keep it current inside their own
+# transactions, so the count endpoints read one primary-key range instead
+# of running COUNT(*) over the leave tables.
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS leave_counter (
+        empid INT NOT NULL,
+        leave_type VARCHAR(50) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        total INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (empid, leave_type, status)
+    )
+"""
+
+def normalize(value):
+    # leave_type and status compare case-insensitively in MySQL, so the counters do too
+    return (value or '').strip().lower()
+
+
+# Statements shared with the async build (attendify_async.py)
+INCREMENT = """
+    INSERT INTO leave_counter (empid, leave_type, status, total)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+"""
+SELECT_FOR_MOVE = "SELECT empid, leave_type, status FROM leave_request WHERE request_id = %s FOR UPDATE"
+COUNTS_BY_TYPE = "SELECT leave_type, SUM(total) FROM leave_counter WHERE empid = %s GROUP BY leave_type"
+COUNTS_BY_STATUS = "SELECT leave_type, total FROM leave_counter WHERE empid = %s AND status = %s"
+
+
+def increment(cur, empid, leave_type, status, delta=1):
+    cur.execute(INCREMENT, (empid, normalize(leave_type), normalize(status), delta))
+
+
+def move_params(row, new_status):
+    # INCREMENT parameter tuples that shift a (empid, leave_type, status) row to new_status
+    if not row or normalize(row[2]) == normalize(new_status):
+        return []
+    empid, leave_type, old_status = row
+    return [(empid, normalize(leave_type), normalize(old_status), -1),
+            (empid, normalize(leave_type), normalize(new_status), 1)]
+
+
+def move(cur, request_id, new_status):
+    # Shift one request from its current status bucket to new_status.
+    # Must run before leave_request itself is updated.
+    cur.execute(SELECT_FOR_MOVE, (request_id,))
+    for params in move_params(cur.fetchone(), new_status):
+        cur.execute(INCREMENT, params)
+
+
+def counts_by_type(cur, empid):
+    # {leave_type: total across all statuses}
+    cur.execute(COUNTS_BY_TYPE, (empid,))
+    return {row[0]: int(row[1]) for row in cur.fetchall()}
+
+
+def counts_by_status(cur, empid, status):
+    # {leave_type: total} for one status
+    cur.execute(COUNTS_BY_STATUS, (empid, normalize(status)))
+    return {row[0]: int(row[1]) for row in cur.fetchall()}
+
+
+def _source_counts(cur):
+    cur.execute("""
+        SELECT empid, LOWER(TRIM(COALESCE(leave_type, ''))), LOWER(TRIM(COALESCE(status, ''))), COUNT(*)
+        FROM leave_request
+        GROUP BY empid, LOWER(TRIM(COALESCE(leave_type, ''))), LOWER(TRIM(COALESCE(status, '')))
+    """)
+    return {(row[0], row[1], row[2]): int(row[3]) for row in cur.fetchall()}
+
+
+def rebuild(cur):
+    cur.execute(CREATE_TABLE)
+    cur.execute("DELETE FROM leave_counter")
+    rows = [key + (total,) for key, total in _source_counts(cur).items()]
+    if rows:
+        cur.executemany("INSERT INTO leave_counter (empid, leave_type, status, total) VALUES (%s, %s, %s, %s)",
+                        rows)
+    return len(rows)
+
+
+def verify(cur):
+    # Returns a list of (empid, leave_type, status, counter, actual) that disagree
+    expected = _source_counts(cur)
+    cur.execute("SELECT empid, leave_type, status, total FROM leave_counter")
+    stored = {(row[0], row[1], row[2]): int(row[3]) for row in cur.fetchall()}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        actual = expected.get(key, 0)
+        counter = stored.get(key, 0)
+        if actual != counter:
+            mismatches.append(key + (counter, actual))
+    return mismatches
+
+
+def register_commands(app, mysql):
+    group = AppGroup('leave-counters', help='Maintain the leave_counter rollup table.')
+
+    @group.command('rebuild')
+    def rebuild_command():
+        """Recompute leave_counter from leave_request."""
+        cur = mysql.connection.cursor()
+        count = rebuild(cur)
+        mysql.connection.commit()
+        cur.close()
+        click.echo(f"Rebuilt leave_counter with {count} rows")
+
+    @group.command('verify')
+    def verify_command():
+        """Compare leave_counter with leave_request; exits 1 on drift."""
+        cur = mysql.connection.cursor()
+        mismatches = verify(cur)
+        cur.close()
+        for empid, leave_type, status, counter, actual in mismatches:
+            click.echo(f"empid={empid} type={leave_type!r} status={status!r}: counter={counter} actual={actual}")
+        if mismatches:
+            raise SystemExit(1)
+        click.echo("leave_counter matches leave_request")
+
+    app.cli.add_command(group)
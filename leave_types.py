@@ -0,0 +1,25 @@
+import collections
+
+# Registry of the leave types attendify knows about. leave_request is the
+# only table leave handlers write. Each type is also readable through a
+# view over leave_request, named after the per-type table it replaced
+# (annual_leave, sick_leave, ...), so existing readers keep working.
+
+LeaveType = collections.namedtuple('LeaveType', 'name view label')
+
+LEAVE_TYPES = [
+    LeaveType('annual leave', 'annual_leave', 'Annual Leave'),
+    LeaveType('sick leave', 'sick_leave', 'Sick Leave'),
+    LeaveType('maternity leave', 'maternity_leave', 'Maternity Leave'),
+    LeaveType('bereavement leave', 'bereavement_leave', 'Bereavement Leave'),
+]
+
+
+def create_view(leave_type):
+    # request_id doubles as the view's id, so id lookups now hit the right row
+    return f"""
+        CREATE VIEW {leave_type.view} AS
+        SELECT request_id AS id, empid, leave_start_date, leave_end_date, status, leave_type
+        FROM leave_request
+        WHERE leave_type = '{leave_type.name}'
+    """
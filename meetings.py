@@ -0,0 +1,160 @@
+import collections
+import threading
+
+import versions
+from app_logging import get_logger
+from attendance_rollups import minutes
+from intervals import IntervalTree
+
+log = get_logger('attendify.meetings')
+
+# In-process index of booked meetings for conflict checks and free slots.
+# A day is loaded from `meetings` the first time it is asked about (one
+# indexed read on meeting_date) into one interval tree per location and
+# one per organizer, holding (start minute, end minute - 1, meeting id):
+# meetings are half-open, so back-to-back bookings do not clash.
+#
+# save_meeting bumps the meetings version before it checks, which holds
+# the table_version row lock until commit and so serialises bookings
+# across workers. If the version shows another process wrote since this
+# index last saw the table, every loaded day is dropped and re-read.
+
+TABLE = 'meetings'
+
+DAY_QUERY = """
+    SELECT id, title, start_time, end_time, location, organizer_id
+    FROM meetings
+    WHERE meeting_date = %s
+"""
+
+
+def parse_clock(value):
+    # 'HH:MM[:SS]' -> minutes since midnight; ValueError for anything else
+    parts = str(value or '').split(':')
+    if len(parts) not in (2, 3) or not all(part.isdigit() for part in parts):
+        raise ValueError(f"invalid time: {value!r}")
+    hours, mins = int(parts[0]), int(parts[1])
+    if hours > 24 or mins > 59 or (hours == 24 and mins):
+        raise ValueError(f"invalid time: {value!r}")
+    return hours * 60 + mins
+
+
+def clock(total):
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+
+class _Day:
+    def __init__(self):
+        self.trees = {'location': {}, 'organizer': {}}
+        self.meetings = {}
+
+    def add(self, meeting_id, title, start, end, location, organizer_id):
+        if end <= start:
+            return
+        self.meetings[meeting_id] = (title, start, end, location, organizer_id)
+        for kind, key in (('location', location), ('organizer', organizer_id)):
+            if key is not None:
+                self.trees[kind].setdefault(str(key), IntervalTree()).add(start, end - 1, meeting_id)
+
+    def busy(self, kind, key, start, end):
+        tree = self.trees[kind].get(str(key))
+        if tree is None:
+            return []
+        return sorted((self.meetings[meeting_id][1], self.meetings[meeting_id][2], meeting_id)
+                      for _, _, meeting_id in tree.overlapping(start, end - 1))
+
+
+class MeetingIndex:
+    def __init__(self, mysql, max_days=366):
+        self.mysql = mysql
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        self._days = collections.OrderedDict()
+        self._version = None
+
+    def _sync(self, version):
+        # Caller holds self._lock; version is what table_version says now
+        if self._version != version:
+            if self._days:
+                log.info("meeting_index_reset", days=len(self._days))
+            self._days.clear()
+            self._version = version
+
+    def _day(self, cur, day):
+        loaded = self._days.get(day)
+        if loaded is not None:
+            self._days.move_to_end(day)
+            return loaded
+        loaded = _Day()
+        cur.execute(DAY_QUERY, (day.isoformat(),))
+        for meeting_id, title, start, end, location, organizer_id in cur.fetchall():
+            loaded.add(meeting_id, title, minutes(start), minutes(end), location, organizer_id)
+        self._days[day] = loaded
+        while len(self._days) > self.max_days:
+            self._days.popitem(last=False)
+        return loaded
+
+    def _conflicts(self, loaded, start, end, location, organizer_id):
+        found = {}
+        for kind, key in (('location', location), ('organizer', organizer_id)):
+            if key is None:
+                continue
+            for first, last, meeting_id in loaded.busy(kind, key, start, end):
+                title = loaded.meetings[meeting_id][0]
+                found.setdefault(meeting_id, {"meeting_id": meeting_id, "title": title,
+                                              "start_time": clock(first), "end_time": clock(last),
+                                              "clashes_on": []})["clashes_on"].append(kind)
+        return list(found.values())
+
+    def book(self, cur, day, start, end, location, organizer_id, title, insert):
+        # Call inside the write's transaction. Returns (conflicts, meeting_id);
+        # insert(cur) runs, and returns the new id, only when nothing clashes.
+        versions.bump(cur, TABLE)
+        version = versions.read(cur, (TABLE,))[TABLE]
+        with self._lock:
+            # Our bump accounts for one step; anything more was another writer
+            self._sync(version - 1)
+            loaded = self._day(cur, day)
+            conflicts = self._conflicts(loaded, start, end, location, organizer_id)
+            if conflicts:
+                return conflicts, None
+            meeting_id = insert(cur)
+            loaded.add(meeting_id, title, start, end, location, organizer_id)
+            self._version = version
+        return [], meeting_id
+
+    def reset(self):
+        # After a failed booking transaction, forget what book() added
+        with self._lock:
+            self._days.clear()
+            self._version = None
+
+    def busy(self, day, kind, key, start, end):
+        cur = self.mysql.connection.cursor()
+        try:
+            version = versions.read(cur, (TABLE,))[TABLE]
+            with self._lock:
+                self._sync(version)
+                loaded = self._day(cur, day)
+                return [(first, last, meeting_id, loaded.meetings[meeting_id][0])
+                        for first, last, meeting_id in loaded.busy(kind, key, start, end)]
+        finally:
+            cur.close()
+
+    def stats(self):
+        with self._lock:
+            return {"days_loaded": len(self._days), "version": self._version,
+                    "meetings": sum(len(day.meetings) for day in self._days.values())}
+
+
+def free_slots(busy, start, end, min_minutes=1):
+    # Gaps of at least min_minutes between the busy (start, end, ...) spans inside [start, end)
+    free = []
+    cursor = start
+    for first, last, *_ in busy:
+        if first - cursor >= min_minutes:
+            free.append((cursor, first))
+        cursor = max(cursor, last)
+    if end - cursor >= min_minutes:
+        free.append((cursor, end))
+    return free
@@ -0,0 +1,217 @@
+import bisect
+import re
+import threading
+import time
+
+from flask import Response, request
+
+from app_logging import get_logger
+
+# Request and SQL instrumentation exported in Prometheus text format.
+# Values are per worker process; scrape each worker or aggregate upstream.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+log = get_logger('attendify.metrics')
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._gauges = []
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name, text, collect):
+        # collect() returns a number or a {label_value_dict_tuple: number} mapping
+        self.describe(name, 'gauge', text)
+        self._gauges.append((name, collect))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            snapshots = [(key, list(h.buckets), list(h.counts), h.total, h.count) for key, h in histograms]
+
+        described = set()
+
+        def header(name):
+            if name not in described and name in self._help:
+                kind, text = self._help[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+
+        for (name, labels), buckets, counts, total, count in snapshots:
+            header(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        for name, collect in self._gauges:
+            try:
+                value = collect()
+            except Exception:
+                continue
+            header(name)
+            if isinstance(value, dict):
+                for labels, item in sorted(value.items()):
+                    lines.append(f"{name}{_labels(labels)} {item}")
+            else:
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+registry = Registry()
+registry.describe('attendify_http_requests_total', 'counter', 'HTTP requests by route, method and status.')
+registry.describe('attendify_http_request_errors_total', 'counter', 'HTTP requests that ended with a 5xx status.')
+registry.describe('attendify_http_request_duration_seconds', 'histogram', 'HTTP request latency by route.')
+registry.describe('attendify_db_queries_total', 'counter', 'SQL statements executed by normalized statement.')
+registry.describe('attendify_db_query_errors_total', 'counter', 'SQL statements that raised.')
+registry.describe('attendify_db_query_duration_seconds', 'histogram', 'SQL execute latency by normalized statement.')
+
+
+_WHITESPACE = re.compile(r'\s+')
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)')
+_ROW_LISTS = re.compile(r'(VALUES\s*\(\?\))(?:\s*,\s*\(\?\))+', re.IGNORECASE)
+
+
+def normalize_statement(sql):
+    # One label per statement shape: literals and placeholder lists collapse to "?"
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _IN_LISTS.sub('(?)', sql)
+    sql = _ROW_LISTS.sub(r'\1', sql)
+    sql = sql.replace('%s', '?')
+    return sql[:200]
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, slow_ms):
+        self._cursor = cursor
+        self._slow_ms = slow_ms
+
+    def execute(self, sql, params=None):
+        return self._timed(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._timed(self._cursor.executemany, sql, seq_of_params)
+
+    def _timed(self, method, sql, params):
+        statement = normalize_statement(sql)
+        labels = {"statement": statement}
+        started = time.perf_counter()
+        try:
+            if params is None:
+                return method(sql)
+            return method(sql, params)
+        except Exception:
+            registry.inc('attendify_db_query_errors_total', labels)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.inc('attendify_db_queries_total', labels)
+            registry.observe('attendify_db_query_duration_seconds', labels, elapsed)
+            if self._slow_ms and elapsed * 1000 >= self._slow_ms:
+                log.warning("slow_query", statement=statement, duration_ms=round(elapsed * 1000, 2))
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    def __init__(self, conn, slow_ms):
+        self.wrapped = conn
+        self._slow_ms = slow_ms
+
+    def cursor(self, *args):
+        return InstrumentedCursor(self.wrapped.cursor(*args), self._slow_ms)
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+
+def instrument_connect(connect, slow_ms=None):
+    # Wrap a connection factory so every cursor it hands out is timed
+    def instrumented():
+        return InstrumentedConnection(connect(), slow_ms)
+    return instrumented
+
+
+def init_app(app):
+    @app.before_request
+    def _start_timer():
+        request.environ['attendify.metrics_start'] = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        started = request.environ.get('attendify.metrics_start')
+        route = request.endpoint or 'unmatched'
+        registry.inc('attendify_http_requests_total',
+                     {"route": route, "method": request.method, "status": str(response.status_code)})
+        if response.status_code >= 500:
+            registry.inc('attendify_http_request_errors_total', {"route": route})
+        if started is not None:
+            registry.observe('attendify_http_request_duration_seconds', {"route": route},
+                             time.perf_counter() - started)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,287 @@
+import click
+from flask.cli import AppGroup
+
+import attendance_rollups
+import changes
+import idempotency
+import leave_counters
+import versions
+from leave_types import LEAVE_TYPES, create_view
+
+# Versioned schema for every table attendify reads or writes. Each migration
+# runs once, in order, and is recorded in schema_migrations. Tables are
+# created IF NOT EXISTS and an index that is already there is accepted, so
+# an existing Railway database can adopt the migrations as they are.
+#
+# Steps are MySQL statements, which sqlite_standin translates for the local
+# stand-in, or functions taking a cursor for data fix-ups.
+
+SCHEMA_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT NOT NULL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_LEAVE_TYPE_TABLE = """
+    CREATE TABLE IF NOT EXISTS {} (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        empid INT,
+        leave_start_date DATE,
+        leave_end_date DATE,
+        status VARCHAR(20),
+        leave_type VARCHAR(50)
+    )
+"""
+
+MIGRATIONS = [
+    (1, 'application tables', [
+        """
+        CREATE TABLE IF NOT EXISTS Employee (
+            empid INT AUTO_INCREMENT PRIMARY KEY,
+            full_name VARCHAR(100),
+            username VARCHAR(50),
+            phone_number VARCHAR(20),
+            email VARCHAR(100),
+            password VARCHAR(255),
+            occupation VARCHAR(50),
+            faculty VARCHAR(100),
+            empPhoto LONGBLOB
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            empid INT,
+            checkinDate DATE,
+            checkinTime TIME,
+            checkoutDate DATE,
+            checkoutTime TIME
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS schedule (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            start_coffee_break TIME,
+            break_date DATE,
+            empid INT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS leave_request (
+            request_id INT AUTO_INCREMENT PRIMARY KEY,
+            empid INT,
+            leave_start_date DATE,
+            leave_end_date DATE,
+            status VARCHAR(20),
+            leave_type VARCHAR(50)
+        )
+        """,
+    ] + [_LEAVE_TYPE_TABLE.format(leave_type.view) for leave_type in LEAVE_TYPES] + [
+        """
+        CREATE TABLE IF NOT EXISTS meetings (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            title VARCHAR(200),
+            meeting_date DATE,
+            start_time TIME,
+            end_time TIME,
+            location VARCHAR(200),
+            organizer_id INT
+        )
+        """,
+    ]),
+    (2, 'helper tables', [
+        leave_counters.CREATE_TABLE,
+        versions.CREATE_TABLE,
+        attendance_rollups.CREATE_TABLE,
+    ] + attendance_rollups.CREATE_INDEXES),
+    (3, 'hot path indexes', [
+        # check-out lookups and the rollup refresh
+        "CREATE INDEX idx_attendance_checkout ON attendance (empid, checkoutDate)",
+        "CREATE INDEX idx_schedule_empid_date ON schedule (empid, break_date)",
+        # leave-dates and the leave_counter rebuild
+        "CREATE INDEX idx_leave_request_empid ON leave_request (empid, status, leave_type)",
+        # pending-leave-requests
+        "CREATE INDEX idx_leave_request_status ON leave_request (status)",
+        # login
+        "CREATE INDEX idx_employee_login ON Employee (username, password)",
+    ]),
+    (4, 'unique check-in per employee and day', [
+        # checkin's ON DUPLICATE KEY UPDATE only upserts with this key in place.
+        # Without it repeated check-ins piled up rows; keep the latest one, which
+        # is the row the upsert would have updated.
+        """
+        DELETE FROM attendance
+        WHERE checkinDate IS NOT NULL AND id NOT IN (
+            SELECT id FROM (
+                SELECT MAX(id) AS id FROM attendance
+                WHERE checkinDate IS NOT NULL
+                GROUP BY empid, checkinDate
+            ) AS keep
+        )
+        """,
+        "CREATE UNIQUE INDEX uq_attendance_checkin ON attendance (empid, checkinDate)",
+    ]),
+    (5, 'leave_request as the only leave table', [
+        # Copy rows that only made it into a per-type table, move those tables
+        # aside as <type>_legacy and serve the old names as views over
+        # leave_request. leave_request wins wherever the status copies drifted.
+        step
+        for leave_type in LEAVE_TYPES
+        for step in (
+            f"""
+            INSERT INTO leave_request (empid, leave_start_date, leave_end_date, status, leave_type)
+            SELECT t.empid, t.leave_start_date, t.leave_end_date, t.status, '{leave_type.name}'
+            FROM {leave_type.view} t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM leave_request r
+                WHERE r.empid = t.empid
+                  AND r.leave_start_date = t.leave_start_date
+                  AND r.leave_end_date = t.leave_end_date
+                  AND r.leave_type = '{leave_type.name}'
+            )
+            """,
+            f"ALTER TABLE {leave_type.view} RENAME TO {leave_type.view}_legacy",
+            create_view(leave_type),
+        )
+    ] + [
+        "CREATE INDEX idx_leave_request_type ON leave_request (leave_type, status)",
+        leave_counters.rebuild,
+        lambda cur: versions.bump(cur, 'leave_request'),
+    ]),
+    (6, 'meeting indexes', [
+        # the meeting index loads one day at a time
+        "CREATE INDEX idx_meetings_date_location ON meetings (meeting_date, location)",
+        "CREATE INDEX idx_meetings_organizer ON meetings (organizer_id, meeting_date)",
+    ]),
+    (7, 'unique check-out per employee and day', [
+        # check_out became an upsert on this key. Retries that slipped between
+        # the old SELECT and INSERT left extra rows; keep the latest one.
+        """
+        DELETE FROM attendance
+        WHERE checkoutDate IS NOT NULL AND id NOT IN (
+            SELECT id FROM (
+                SELECT MAX(id) AS id FROM attendance
+                WHERE checkoutDate IS NOT NULL
+                GROUP BY empid, checkoutDate
+            ) AS keep
+        )
+        """,
+        "CREATE UNIQUE INDEX uq_attendance_checkout ON attendance (empid, checkoutDate)",
+        # the unique key covers the same columns
+        "DROP INDEX idx_attendance_checkout ON attendance",
+    ]),
+    (8, 'employee photo version and size', [
+        # /api/employee-photo reads these instead of the BLOB for its ETag and Content-Length
+        "ALTER TABLE Employee ADD COLUMN photo_version INT NOT NULL DEFAULT 0",
+        "ALTER TABLE Employee ADD COLUMN photo_size INT NULL",
+        "UPDATE Employee SET photo_size = LENGTH(empPhoto) WHERE empPhoto IS NOT NULL",
+    ]),
+    (9, 'change log for /api/sync', [
+        changes.CREATE_TABLE,
+        # compaction keeps the latest entry per record
+        "CREATE INDEX idx_change_log_row ON change_log (table_name, row_key, seq)",
+    ]),
+    (10, 'export date indexes', [
+        # /api/export walks each table in date order
+        "CREATE INDEX idx_attendance_checkin_date ON attendance (checkinDate)",
+        "CREATE INDEX idx_attendance_checkout_date ON attendance (checkoutDate)",
+        "CREATE INDEX idx_schedule_break_date ON schedule (break_date)",
+        "CREATE INDEX idx_leave_request_end ON leave_request (leave_end_date)",
+    ]),
+    (11, 'idempotency keys', [
+        idempotency.CREATE_TABLE,
+        # purge drops expired keys
+        "CREATE INDEX idx_idempotency_key_expires ON idempotency_key (expires_at)",
+    ]),
+    (12, 'employee role', [
+        # Token roles come from here rather than the self-editable occupation.
+        # Existing employees keep what they had; review manager roles afterwards.
+        "ALTER TABLE Employee ADD COLUMN role VARCHAR(100) NULL",
+        "UPDATE Employee SET role = occupation",
+    ]),
+    (13, 'idempotency claim token', [
+        # Lets a claim that takes over an expired key tell its row from a live one
+        "ALTER TABLE idempotency_key ADD COLUMN claim CHAR(32) NULL",
+    ]),
+]
+
+
+def _already_exists(error):
+    # MySQL has no CREATE INDEX IF NOT EXISTS
+    message = str(error)
+    return 'Duplicate key name' in message or 'already exists' in message
+
+
+def applied(cur):
+    cur.execute(SCHEMA_TABLE)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {int(row[0]) for row in cur.fetchall()}
+
+
+def pending(cur):
+    done = applied(cur)
+    return [migration for migration in MIGRATIONS if migration[0] not in done]
+
+
+def upgrade(cur, conn, target=None, echo=None):
+    # Apply pending migrations up to target (all by default), committing after each
+    done = []
+    for version, name, statements in pending(cur):
+        if target is not None and version > target:
+            break
+        for sql in statements:
+            if callable(sql):
+                sql(cur)
+                continue
+            try:
+                cur.execute(sql)
+            except Exception as e:
+                if not (sql.lstrip().upper().startswith(('CREATE INDEX', 'CREATE UNIQUE INDEX'))
+                        and _already_exists(e)):
+                    raise
+        cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        conn.commit()
+        done.append((version, name))
+        if echo:
+            echo(f"Applied {version:03d} {name}")
+    return done
+
+
+def register_commands(app, mysql):
+    group = AppGroup('db', help='Schema migrations and query plan checks.')
+
+    @group.command('upgrade')
+    @click.option('--target', type=int, help='Stop after this migration version.')
+    def upgrade_command(target):
+        """Apply pending schema migrations."""
+        cur = mysql.connection.cursor()
+        done = upgrade(cur, mysql.connection, target, echo=click.echo)
+        cur.close()
+        if not done:
+            click.echo("Schema is up to date")
+
+    @group.command('status')
+    def status_command():
+        """List migrations and whether they have been applied."""
+        cur = mysql.connection.cursor()
+        done = applied(cur)
+        mysql.connection.commit()
+        cur.close()
+        for version, name, _ in MIGRATIONS:
+            click.echo(f"{'applied' if version in done else 'pending':8} {version:03d} {name}")
+
+    @group.command('check-plans')
+    def check_plans_command():
+        """EXPLAIN every application query; exits 1 if any scans a whole table."""
+        import query_plans
+
+        cur = mysql.connection.cursor()
+        problems = query_plans.check(cur, sqlite=bool(app.config.get('SQLITE_STANDIN')), echo=click.echo)
+        cur.close()
+        if problems:
+            raise SystemExit(1)
+        click.echo("No full table scans")
+
+    app.cli.add_command(group)
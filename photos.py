@@ -0,0 +1,138 @@
+import io
+import os
+import tempfile
+import threading
+
+from app_logging import get_logger
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails need Pillow; originals are served without it
+    Image = None
+
+log = get_logger('attendify.photos')
+
+# Employee photos from the Employee.empPhoto BLOB.
+# - Originals are read with one query (uploads are capped at PHOTO_MAX_BYTES)
+#   and written to the client in chunks. Reading SUBSTRING slices instead
+#   costs a round trip per slice, and MySQL reads the whole BLOB for each.
+# - Thumbnails are rendered with Pillow, as JPEG, the first time a size is
+#   asked for. They are kept in a directory capped at max_bytes; the least
+#   recently served files are removed first.
+# - Employee.photo_version goes up on every upload. It is part of the ETag
+#   and of each thumbnail's file name, so a new photo never serves an old
+#   thumbnail.
+
+HEAD_QUERY = "SELECT photo_version, photo_size FROM Employee WHERE empid = %s"
+BLOB_QUERY = "SELECT empPhoto FROM Employee WHERE empid = %s AND photo_version = %s"
+UPLOAD = """
+    UPDATE Employee SET empPhoto = %s, photo_size = %s, photo_version = photo_version + 1
+    WHERE empid = %s
+"""
+
+_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+def sniff_type(data):
+    # Image mimetype from the leading bytes, None if it isn't an image we serve
+    for signature, mimetype in _SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def load(cur, empid, version):
+    # The photo's bytes, None if it changed since version was read
+    cur.execute(BLOB_QUERY, (empid, version))
+    row = cur.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else None
+
+
+def chunks(data, chunk_size=65536):
+    for offset in range(0, len(data), chunk_size):
+        yield data[offset:offset + chunk_size]
+
+
+def etag(empid, version, size=None):
+    return f"photo-{empid}-{version}" + (f"-{size}" if size else "")
+
+
+def thumbnail(data, size, quality=85):
+    # JPEG no larger than size x size, keeping the aspect ratio
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((size, size))
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        out = io.BytesIO()
+        image.save(out, 'JPEG', quality=quality, optimize=True)
+        return out.getvalue()
+
+
+class ThumbnailCache:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, empid, version, size):
+        return os.path.join(self.directory, f"{empid}-{version}-{size}.jpg")
+
+    def get(self, empid, version, size):
+        # Thumbnail bytes, None on a miss (thumbnails are a few KB, so they are read whole)
+        path = self.path(empid, version, size)
+        try:
+            with open(path, 'rb') as handle:
+                data = handle.read()
+            # mtime records the last hit, for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, empid, version, size, data):
+        path = self.path(empid, version, size)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp, path)
+        self._evict(keep=path)
+
+    def invalidate(self, empid):
+        prefix = f"{empid}-"
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(prefix):
+                _unlink(entry.path)
+
+    def _evict(self, keep=None):
+        with self._lock:
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.jpg') and entry.path != keep:
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files) + (os.path.getsize(keep) if keep else 0)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                _unlink(path)
+                total -= size
+
+    def stats(self):
+        files = [entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.jpg')]
+        return {"files": len(files), "bytes": sum(files), "max_bytes": self.max_bytes,
+                "thumbnails": Image is not None}
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
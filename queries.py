@@ -0,0 +1,102 @@
+# Statements the request handlers in attendify.py and attendify_async.py run
+# that don't belong to a domain module (attendance, leave_counters, meetings,
+# photos, changes, ...). query_plans imports these same strings, so
+# `flask --app attendify db check-plans` explains exactly what runs.
+
+EMPLOYEE_COLUMNS = "empid, full_name, email, username, phone_number, occupation, faculty"
+
+# The plain comparisons let MySQL use idx_employee_login; BINARY keeps the match case-sensitive.
+# The token's role is Employee.role, which only managers can set (occupation is self-service).
+LOGIN = """
+    SELECT empid, role FROM Employee
+    WHERE username = %s AND password = %s AND BINARY username = %s AND BINARY password = %s
+"""
+EMPLOYEE_INSERT = """
+    INSERT INTO Employee (full_name, username, phone_number, email, password, occupation, faculty, role)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+EMPLOYEE_OCCUPATION = "SELECT occupation FROM Employee WHERE empid = %s"
+EMPLOYEE_SET_ROLE = "UPDATE Employee SET role = %s WHERE empid = %s"
+EMPLOYEE_PROFILE = """
+    SELECT full_name, username, email, phone_number, occupation, faculty
+    FROM Employee
+    WHERE empid = %s
+"""
+EMPLOYEE_LIST = f"SELECT {EMPLOYEE_COLUMNS} FROM Employee"
+EMPLOYEE_PAGE = f"""
+    SELECT {EMPLOYEE_COLUMNS}
+    FROM Employee
+    WHERE empid > %s
+    ORDER BY empid
+    LIMIT %s
+"""
+EMPLOYEE_STREAM = f"""
+    SELECT {EMPLOYEE_COLUMNS}
+    FROM Employee
+    WHERE empid > %s
+    ORDER BY empid
+"""
+EMPLOYEE_UPDATE = """
+    UPDATE Employee
+    SET full_name = %s,
+        username = %s,
+        email = %s,
+        phone_number = %s,
+        occupation = %s,
+        faculty = %s
+    WHERE empid = %s
+"""
+
+LEAVE_INSERT = """
+    INSERT INTO leave_request (empid, leave_start_date, leave_end_date, status, leave_type)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+LEAVE_STATUS_UPDATE = "UPDATE leave_request SET status = %s WHERE request_id = %s"
+PENDING_LEAVES = """
+    SELECT
+        lr.request_id AS requestId, lr.empid AS empId, e.full_name AS employeeName,
+        lr.leave_start_date AS leaveStartDate, lr.leave_end_date AS leaveEndDate,
+        lr.status AS status, lr.leave_type AS leaveType
+    FROM
+        leave_request lr
+    JOIN
+        Employee e ON lr.empid = e.empid
+    WHERE
+        lr.status = 'pending'
+"""
+ACCEPTED_LEAVE_DATES = ("SELECT empid, leave_start_date, leave_end_date FROM leave_request "
+                        "WHERE status = 'accepted' AND empid = %s")
+
+MEETING_INSERT = """
+    INSERT INTO meetings (title, meeting_date, start_time, end_time, location, organizer_id)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+# /api/attendance-report. Each filter is a prefix of an attendance_daily
+# index, so a month is one range scan; the day range is [start, end).
+REPORT_FILTERS = {
+    None: "r.day >= %s AND r.day < %s",
+    'empid': "r.empid = %s AND r.day >= %s AND r.day < %s",
+    'faculty': "r.faculty = %s AND r.day >= %s AND r.day < %s",
+}
+REPORT_DAYS = """
+    SELECT r.empid, r.day, r.first_checkin, r.last_checkout,
+           r.coffee_breaks, r.coffee_break_minutes, r.worked_minutes
+    FROM attendance_daily r
+    WHERE {}
+    ORDER BY r.empid, r.day
+"""
+REPORT_TOTALS = """
+    SELECT r.empid, e.full_name, r.faculty, COUNT(*),
+           SUM(r.worked_minutes), SUM(r.coffee_break_minutes)
+    FROM attendance_daily r
+    JOIN Employee e ON e.empid = r.empid
+    WHERE {}
+    GROUP BY r.empid, e.full_name, r.faculty
+    ORDER BY r.empid
+"""
+
+
+def report_query(daily, by=None):
+    # by is None, 'empid' or 'faculty'; the filter value goes before start and end
+    return (REPORT_DAYS if daily else REPORT_TOTALS).format(REPORT_FILTERS[by])
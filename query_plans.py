@@ -0,0 +1,136 @@
+import attendance
+import attendance_rollups
+import availability
+import changes
+import export
+import idempotency
+import leave_counters
+import meetings
+import photos
+import queries
+import versions
+
+# The statements attendify's request handlers run, with sample parameters,
+# for `flask --app attendify db check-plans`. Every entry is the constant
+# the handler itself executes, imported from the module that runs it, so the
+# text can't drift; a new statement still needs an entry here together with
+# the index it relies on. ALLOW_SCAN names the statements that read a whole
+# table on purpose.
+
+_MONTH = ('2026-01-01', '2026-02-01')
+_SWIPE = (1, '2026-01-01', '08:00')
+
+
+def _delta(kind):
+    sql, params = attendance_rollups.delta(kind, [_SWIPE])
+    return (f"rollup {kind.replace('_', ' ')}", sql, params[0])
+
+
+STATEMENTS = [
+    ("login", queries.LOGIN, ('user1', 'secret', 'user1', 'secret')),
+    ("employee insert", queries.EMPLOYEE_INSERT, ('x', 'x', 'x', 'x', 'x', 'x', 'x', 'x')),
+    ("employee occupation", queries.EMPLOYEE_OCCUPATION, (1,)),
+    ("employee role update", queries.EMPLOYEE_SET_ROLE, ('manager', 1)),
+    ("employee profile", queries.EMPLOYEE_PROFILE, (1,)),
+    ("employee list", queries.EMPLOYEE_LIST, ()),
+    ("employee page", queries.EMPLOYEE_PAGE, (0, 100)),
+    ("employee stream", queries.EMPLOYEE_STREAM, (0,)),
+    ("update employee", queries.EMPLOYEE_UPDATE, ('x', 'x', 'x', 'x', 'x', 'x', 1)),
+    ("check-in upsert", attendance.CHECKIN_UPSERT, _SWIPE),
+    ("check-out upsert", attendance.CHECKOUT_UPSERT, _SWIPE),
+    ("coffee break insert", attendance.COFFEE_BREAK_INSERT, ('10:00', '2026-01-01', 1)),
+    _delta('checkin'),
+    _delta('checkout'),
+    _delta('coffee_break'),
+    ("rollup upsert", attendance_rollups.UPSERT, (1, '2026-01-01', 'Science', '08:00', '16:00', 1, 15, 465)),
+    ("rollup faculty update", attendance_rollups.SET_FACULTY, ('Science', 1)),
+    ("leave insert", queries.LEAVE_INSERT, (1, '2026-01-01', '2026-01-02', 'pending', 'annual leave')),
+    ("leave counter increment", leave_counters.INCREMENT, (1, 'annual leave', 'pending', 1)),
+    ("leave counts by type", leave_counters.COUNTS_BY_TYPE, (1,)),
+    ("leave counts by status", leave_counters.COUNTS_BY_STATUS, (1, 'pending')),
+    ("leave status lock", leave_counters.SELECT_FOR_MOVE, (1,)),
+    ("leave status update", queries.LEAVE_STATUS_UPDATE, ('accepted', 1)),
+    ("pending leave requests", queries.PENDING_LEAVES, ()),
+    ("leave dates", queries.ACCEPTED_LEAVE_DATES, (1,)),
+    ("meeting insert", queries.MEETING_INSERT, ('x', '2026-01-01', '09:00', '10:00', 'R1', 1)),
+    ("idempotency claim", idempotency.CLAIM, ('checkin:1:k', 'f', 't', 0, 0, 0, 0, 0, 0, 0)),
+    ("idempotency claimed by", idempotency.CLAIMED_BY, ('checkin:1:k',)),
+    ("idempotency reclaim", idempotency.RECLAIM, ('checkin:1:k', 'f', 0)),
+    ("idempotency lookup", idempotency.LOOKUP, ('checkin:1:k', 0)),
+    ("idempotency store response", idempotency.STORE_RESPONSE, (201, 'application/json', '{}', 'checkin:1:k')),
+    ("idempotency delete", idempotency.DELETE_KEY, ('checkin:1:k',)),
+    ("idempotency purge", idempotency.PURGE, (0,)),
+    ("table versions", versions.read_query(2), ('leave_request', 'Employee')),
+    ("table version bump", versions.BUMP, ('leave_request',)),
+    ("report days", queries.report_query(True), _MONTH),
+    ("report days by employee", queries.report_query(True, 'empid'), (1,) + _MONTH),
+    ("report days by faculty", queries.report_query(True, 'faculty'), ('Science',) + _MONTH),
+    ("report totals", queries.report_query(False), _MONTH),
+    ("report totals by employee", queries.report_query(False, 'empid'), (1,) + _MONTH),
+    ("report totals by faculty", queries.report_query(False, 'faculty'), ('Science',) + _MONTH),
+    ("availability leaves", availability.LEAVES_QUERY, ()),
+    ("availability leave row", availability.LEAVE_QUERY, (1,)),
+    ("availability employees", availability.EMPLOYEES_QUERY, ()),
+    ("availability employee row", availability.EMPLOYEE_QUERY, (1,)),
+    ("availability presence", availability.PRESENCE_QUERY, ('2026-01-01',)),
+    ("meetings day", meetings.DAY_QUERY, ('2026-01-01',)),
+    ("photo head", photos.HEAD_QUERY, (1,)),
+    ("photo original", photos.BLOB_QUERY, (1, 0)),
+    ("photo upload", photos.UPLOAD, (b'x', 1, 1)),
+    ("change log record", changes.RECORD, ('leave_request', '1', 1)),
+    ("change log record leave", changes.RECORD_LEAVE, (1,)),
+    ("change log read", changes.read_query(owner=True), (0, 1, 1000)),
+    ("change log read all", changes.read_query(), (0, 1000)),
+    ("change log read table", changes.read_query(table=True), (0, 'leave_request', 1000)),
+    ("change log read owner table", changes.read_query(owner=True, table=True), (0, 1, 'leave_request', 1000)),
+    ("change log tail", changes.TAIL, (1000,)),
+    ("change log compact superseded", changes.DELETE_SUPERSEDED, ()),
+    ("change log last expired", changes.LAST_EXPIRED, ('2026-01-01 00:00:00',)),
+    ("change log delete expired", changes.DELETE_EXPIRED, (1,)),
+    ("change log set horizon", changes.SET_HORIZON, (changes.HORIZON, 1)),
+    ("sync employees", changes.ROW_QUERIES['Employee'][1].format("%s, %s"), (1, 2)),
+    ("sync leave requests", changes.ROW_QUERIES['leave_request'][1].format("%s, %s"), (1, 2)),
+    ("sync meetings", changes.ROW_QUERIES['meetings'][1].format("%s, %s"), (1, 2)),
+    ("sync attendance days", changes.DAYS_QUERY.format("(empid = %s AND day = %s) OR (empid = %s AND day = %s)"),
+     (1, '2026-01-01', 2, '2026-01-01')),
+] + [
+    (f"export {table} {n}", sql, export.params(sql, *_MONTH))
+    for table, (_, selects) in export.EXPORTS.items() for n, sql in enumerate(selects, 1)
+] + [
+    (f"rollup refresh {n}", sql, params)
+    for n, (sql, params) in enumerate(attendance_rollups.source_queries([(1, '2026-01-01')]), 1)
+]
+
+# "change log tail" walks the primary key backwards and stops at its LIMIT.
+# Compaction runs from cron and reads the whole log by design.
+ALLOW_SCAN = {"employee list", "availability employees", "change log tail",
+              "change log compact superseded", "change log last expired"}
+
+
+def full_scans(rows, description, sqlite):
+    # Tables read in full according to one EXPLAIN result
+    if sqlite:
+        # EXPLAIN QUERY PLAN rows: (id, parent, notused, detail)
+        scanned = []
+        for row in rows:
+            detail = str(row[3])
+            if detail.startswith('SCAN ') and ' USING ' not in detail and 'CONSTANT ROW' not in detail:
+                scanned.append(detail.split()[1])
+        return scanned
+    columns = [column[0].lower() for column in description]
+    table, access = columns.index('table'), columns.index('type')
+    return [row[table] for row in rows if str(row[access]).upper() == 'ALL']
+
+
+def check(cur, sqlite=False, echo=print):
+    # EXPLAIN each statement; returns [(name, [tables scanned])] for the offenders
+    problems = []
+    for name, sql, params in STATEMENTS:
+        cur.execute(('EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN ') + sql.strip(), params)
+        scanned = full_scans(cur.fetchall(), cur.description, sqlite)
+        if scanned and name not in ALLOW_SCAN:
+            problems.append((name, scanned))
+            echo(f"FULL SCAN  {name}: {', '.join(scanned)}")
+        else:
+            echo(f"ok         {name}")
+    return problems
@@ -0,0 +1,135 @@
+import datetime
+import decimal
+import functools
+import gzip
+import uuid
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # plain json still works, just slower
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Response serialization shared by the list endpoints:
+# - dict_rows() turns a cursor's rows into dicts keyed by column name, so
+#   handlers name columns in SQL (with AS for camelCase keys) instead of
+#   picking tuple indexes;
+# - JSONProvider encodes with orjson when it is installed. Dates keep
+#   Flask's HTTP-date format unless JSON_DATES=iso, TIME columns (which
+#   PyMySQL returns as timedelta) become "H:MM:SS" instead of a TypeError;
+# - compress() gzip- or brotli-encodes JSON/CSV/NDJSON bodies of at least
+#   COMPRESS_MIN_SIZE bytes for clients that accept it. Streamed responses
+#   are left alone.
+
+COMPRESSIBLE = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain'}
+
+
+def dict_rows(cur):
+    columns = [column[0] for column in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+# Lists repeat the same few hundred dates, and http_date is slow
+_http_date = functools.lru_cache(maxsize=4096)(http_date)
+
+
+def _http_date_default(value):
+    if isinstance(value, datetime.date):
+        return _http_date(value)
+    return _default(value)
+
+
+def _default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (datetime.timedelta, decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JSONProvider(DefaultJSONProvider):
+    def __init__(self, app):
+        super().__init__(app)
+        iso = app.config.get('JSON_DATES', 'http') == 'iso'
+        self.default = _default if iso else _http_date_default
+        if orjson:
+            # Match DefaultJSONProvider's output: sorted keys, int keys as strings
+            self._options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+            if not iso:
+                self._options |= orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _encode(self, obj):
+        return orjson.dumps(obj, default=self.default, option=self._options)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            kwargs.setdefault('default', self.default)
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is None or pretty:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj) + b"\n", mimetype=self.mimetype)
+
+
+def _encoding(offered):
+    encoding = request.accept_encodings.best_match(offered)
+    if encoding and request.accept_encodings[encoding] > 0:
+        return encoding
+    return None
+
+
+def compress(response, min_size=1024, gzip_level=6, brotli_quality=4):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    encoding = _encoding(['br', 'gzip'] if brotli else ['gzip'])
+    if encoding == 'br':
+        body = brotli.compress(body, quality=brotli_quality)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes differ, so a strong validator becomes a weak one
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.json = JSONProvider(app)
+
+    @app.after_request
+    def _compress(response):
+        if not app.config.get('COMPRESS', True):
+            return response
+        return compress(response, app.config.get('COMPRESS_MIN_SIZE', 1024),
+                        app.config.get('COMPRESS_LEVEL', 6), app.config.get('COMPRESS_BROTLI_QUALITY', 4))
@@ -0,0 +1,110 @@
+import re
+import sqlite3
+
+# Local SQLite stand-in for the Railway MySQL database, used for development,
+# smoke tests and benchmarks. It rewrites the handful of MySQL-only constructs
+# attendify.py uses (and the DDL in migrations.py) so the handlers run
+# unchanged.
+
+_UPSERT = re.compile(r'ON\s+DUPLICATE\s+KEY\s+UPDATE\s+(.*)$', re.IGNORECASE | re.DOTALL)
+_VALUES_FN = re.compile(r'VALUES\((\w+)\)', re.IGNORECASE)
+_REWRITES = [
+    (re.compile(r'\bBINARY\s+', re.IGNORECASE), ''),
+    (re.compile(r'\bDATABASE\(\)', re.IGNORECASE), "'sqlite'"),
+    (re.compile(r'\bNOW\(\)', re.IGNORECASE), 'CURRENT_TIMESTAMP'),
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.IGNORECASE), 'INSERT OR IGNORE'),
+    (re.compile(r'\s+FOR\s+UPDATE\b', re.IGNORECASE), ''),
+    (re.compile(r'\b(?:BIG)?INT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b', re.IGNORECASE), 'INTEGER PRIMARY KEY AUTOINCREMENT'),
+    (re.compile(r'\bDIV\b', re.IGNORECASE), '/'),
+    (re.compile(r'\bDROP\s+INDEX\s+(\w+)\s+ON\s+\w+', re.IGNORECASE), r'DROP INDEX \1'),
+]
+
+
+def _time_to_sec(value):
+    # TIME columns are 'HH:MM[:SS]' text here
+    if value is None:
+        return None
+    parts = [int(float(part)) for part in str(value).split(':')]
+    return parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) > 2 else 0)
+
+
+def translate(sql):
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    match = _UPSERT.search(sql)
+    if match:
+        assignments = _VALUES_FN.sub(r'excluded.\1', match.group(1))
+        sql = sql[:match.start()] + 'ON CONFLICT DO UPDATE SET ' + assignments
+    return sql.replace('%s', '?')
+
+
+class Cursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(translate(sql), tuple(params or ()))
+        return self._cursor.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(translate(sql), [tuple(p) for p in seq_of_params])
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.create_function('TIME_TO_SEC', 1, _time_to_sec, deterministic=True)
+
+    def cursor(self, *args):
+        return Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        self._conn.execute('SELECT 1')
+
+    @property
+    def server_status(self):
+        return 0x0001 if self._conn.in_transaction else 0
+
+    def close(self):
+        self._conn.close()
+
+
+def connect_factory(path):
+    def connect():
+        return Connection(path)
+    return connect
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+from flask import Flask, jsonify, request
+
+import admission
+from admission import Admission, ClientBuckets, ConcurrencyLimiter, TokenBucket, parse_limits
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_parse_limits():
+    assert parse_limits("checkin=50, check_out=2.5,bad") == {"checkin": 50.0, "check_out": 2.5}
+    assert parse_limits('') == {} and parse_limits(None) == {}
+
+
+def test_bucket_spends_its_burst_then_refills_at_rate(clock):
+    bucket = TokenBucket(rate=2, burst=4)
+    assert [bucket.take() for _ in range(4)] == [0, 0, 0, 0]
+    assert bucket.take() == pytest.approx(0.5)
+
+    clock[0] += 0.5
+    assert bucket.take() == 0
+    clock[0] += 60
+    assert [bucket.take() for _ in range(5)][-1] == pytest.approx(0.5)
+
+
+def test_bucket_holds_at_least_one_token(clock):
+    bucket = TokenBucket(rate=0.1, burst=0.2)
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(10)
+
+
+def test_clients_have_separate_buckets_and_the_idle_are_dropped(clock):
+    buckets = ClientBuckets(rate=1, burst=1, max_clients=2)
+    assert buckets.take('a') == 0
+    assert buckets.take('a') > 0
+    assert buckets.take('b') == 0
+    assert buckets.take('a') > 0
+    assert buckets.take('c') == 0
+    assert len(buckets) == 2
+    # 'b' was least recently seen, so it starts over with a full bucket
+    assert buckets.take('b') == 0
+
+
+def test_limiter_queues_then_refuses():
+    limiter = ConcurrencyLimiter(limit=1, queue=1, timeout=5)
+    assert limiter.acquire() is None
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(limiter.acquire()))
+    waiter.start()
+    while limiter.waiting == 0:
+        pass
+    assert limiter.acquire() == 'queue_full'
+
+    limiter.release()
+    waiter.join()
+    assert results == [None] and limiter.active == 1
+    limiter.release()
+    assert limiter.active == 0
+
+
+def test_limiter_times_out():
+    limiter = ConcurrencyLimiter(limit=1, queue=1, timeout=0.01)
+    limiter.acquire()
+    assert limiter.acquire() == 'queue_timeout'
+    assert limiter.waiting == 0
+
+
+def make_app(exempt=None, **config):
+    app = Flask(__name__)
+    app.config.update(RATE_LIMIT_BURST=1, **config)
+    Admission(app, lambda: request.headers.get('X-Client', 'anon'), exempt)
+
+    @app.route('/checkin', methods=['POST'])
+    def checkin():
+        return jsonify({"ok": True})
+
+    @app.route('/open', methods=['POST'])
+    def open_route():
+        return jsonify({"ok": True})
+
+    return app
+
+
+def test_empty_client_bucket_answers_429_with_retry_after(clock):
+    client = make_app(RATE_LIMIT_CLIENT='checkin=0.5').test_client()
+    assert client.post('/checkin', headers={'X-Client': 'a'}).status_code == 200
+    refused = client.post('/checkin', headers={'X-Client': 'a'})
+    assert refused.status_code == 429
+    assert refused.headers['Retry-After'] == '2'
+    assert client.post('/checkin', headers={'X-Client': 'b'}).status_code == 200
+    assert client.post('/open').status_code == 200
+
+
+def test_global_bucket_is_shared(clock):
+    client = make_app(RATE_LIMIT_GLOBAL='checkin=1').test_client()
+    assert client.post('/checkin', headers={'X-Client': 'a'}).status_code == 200
+    assert client.post('/checkin', headers={'X-Client': 'b'}).status_code == 429
+
+
+def test_exempt_requests_spend_no_tokens(clock):
+    app = make_app(exempt=lambda: request.headers.get('X-Replay') == '1', RATE_LIMIT_CLIENT='checkin=0.5')
+    client = app.test_client()
+    for _ in range(3):
+        assert client.post('/checkin', headers={'X-Replay': '1'}).status_code == 200
+    assert client.post('/checkin').status_code == 200
+    assert client.post('/checkin').status_code == 429
+
+
+def test_concurrency_slot_is_released_after_the_request():
+    app = make_app(CONCURRENCY_LIMITS='checkin=1', CONCURRENCY_QUEUE=0, CONCURRENCY_QUEUE_TIMEOUT=0.01)
+    client = app.test_client()
+    assert client.post('/checkin').status_code == 200
+    assert client.post('/checkin').status_code == 200
+    assert app.extensions['admission'].stats()['concurrency']['checkin']['active'] == 0
@@ -0,0 +1,71 @@
+import datetime
+
+import pytest
+
+import attendance_rollups
+from attendance_rollups import COFFEE_BREAK_MINUTES, delta
+from sqlite_standin import Connection
+
+
+def test_checkin_and_checkout_keep_minutes_precision():
+    sql, params = delta('checkin', [(7, '2026-10-01', '08:59:59'), ('8', '2026-10-01', datetime.time(9, 5))])
+    assert sql == attendance_rollups.CHECKIN_DELTA
+    assert params == [(7, '2026-10-01', 7, '08:59'), ('8', '2026-10-01', '8', '09:05')]
+
+    sql, params = delta('checkout', [(7, '2026-10-01', '17:30:00')])
+    assert sql == attendance_rollups.CHECKOUT_DELTA
+    assert params == [(7, '2026-10-01', 7, '17:30')]
+
+
+def test_coffee_breaks_count_fixed_minutes():
+    sql, params = delta('coffee_break', [(7, '2026-10-01', '10:00:00')])
+    assert sql == attendance_rollups.COFFEE_BREAK_DELTA
+    assert params == [(7, '2026-10-01', 7, COFFEE_BREAK_MINUTES)]
+
+
+def test_no_rows_no_params():
+    assert delta('checkin', [])[1] == []
+
+
+@pytest.fixture
+def cur(tmp_path):
+    conn = Connection(str(tmp_path / 'db.sqlite'))
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE Employee (empid INTEGER PRIMARY KEY, faculty VARCHAR(100))")
+    cur.execute("INSERT INTO Employee VALUES (7, 'Science')")
+    cur.execute(attendance_rollups.CREATE_TABLE)
+    yield cur
+    conn.close()
+
+
+def day_row(cur):
+    cur.execute("SELECT faculty, first_checkin, last_checkout, coffee_breaks, coffee_break_minutes, worked_minutes "
+                "FROM attendance_daily WHERE empid = 7")
+    return tuple(cur.fetchone())
+
+
+def run(cur, kind, rows):
+    sql, params = delta(kind, rows)
+    cur.executemany(sql, params)
+
+
+def test_swipes_in_any_order_add_up_to_the_day(cur):
+    run(cur, 'checkout', [(7, '2026-10-01', '17:00:00')])
+    assert day_row(cur) == ('Science', None, '17:00', 0, 0, 0)
+
+    run(cur, 'checkin', [(7, '2026-10-01', '09:00:00')])
+    assert day_row(cur)[-1] == 8 * 60
+
+    run(cur, 'coffee_break', [(7, '2026-10-01', '10:00:00'), (7, '2026-10-01', '15:00:00')])
+    assert day_row(cur) == ('Science', '09:00', '17:00', 2, 2 * COFFEE_BREAK_MINUTES,
+                            8 * 60 - 2 * COFFEE_BREAK_MINUTES)
+
+    # A later check-in replaces the day's first one
+    run(cur, 'checkin', [(7, '2026-10-01', '10:00:00')])
+    assert day_row(cur)[-1] == 7 * 60 - 2 * COFFEE_BREAK_MINUTES
+
+
+def test_checkout_before_checkin_counts_no_work(cur):
+    run(cur, 'checkin', [(7, '2026-10-01', '18:00:00')])
+    run(cur, 'checkout', [(7, '2026-10-01', '17:00:00')])
+    assert day_row(cur)[-1] == 0
@@ -0,0 +1,78 @@
+import datetime
+
+import pytest
+from flask import Flask
+
+import versions
+from availability import AvailabilityIndex
+from db_pool import MySQLPool
+
+DAY = datetime.date(2026, 10, 1)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(SQLITE_STANDIN=str(tmp_path / 'db.sqlite'), METRICS_SQL=False)
+    return app
+
+
+@pytest.fixture
+def index(app):
+    mysql = MySQLPool(app)
+    with app.app_context():
+        cur = mysql.connection.cursor()
+        cur.execute(versions.CREATE_TABLE)
+        cur.execute("CREATE TABLE Employee (empid INTEGER PRIMARY KEY, full_name VARCHAR(100), "
+                    "faculty VARCHAR(100), occupation VARCHAR(100))")
+        cur.execute("CREATE TABLE leave_request (request_id INTEGER PRIMARY KEY, empid INT, "
+                    "leave_start_date DATE, leave_end_date DATE, status VARCHAR(20))")
+        cur.execute("CREATE TABLE attendance_daily (empid INT, day DATE, first_checkin TIME)")
+        cur.execute("INSERT INTO Employee VALUES (7, 'Ada', 'Science', 'teacher')")
+        mysql.connection.commit()
+    index = AvailabilityIndex(mysql)
+    with app.app_context():
+        index.query(DAY, DAY)
+    return index
+
+
+def submit_leave(index, request_id):
+    cur = index.mysql.connection.cursor()
+    cur.execute("INSERT INTO leave_request VALUES (%s, 7, '2026-10-01', '2026-10-02', 'accepted')", (request_id,))
+    versions.bump(cur, 'leave_request')
+    return index.leave_written(cur, request_id)
+
+
+def test_committed_leave_is_applied_without_a_reload(app, index):
+    with app.app_context():
+        written = submit_leave(index, 1)
+        assert index.stats()['accepted_leaves'] == 0
+        index.mysql.connection.commit()
+        index.apply(written)
+
+        assert index.stats()['accepted_leaves'] == 1
+        assert index.stats()['versions']['leave_request'] == 1
+        days = index.query(DAY, DAY + datetime.timedelta(days=2))['days']
+    assert [day['on_leave'] for day in days] == [[7], [7], []]
+
+
+def test_rolled_back_leave_never_reaches_the_index(app, index):
+    with app.app_context():
+        submit_leave(index, 1)
+        index.mysql.connection.rollback()
+
+        assert index.stats()['accepted_leaves'] == 0
+        assert index.query(DAY, DAY)['days'][0]['on_leave'] == []
+
+
+def test_rolled_back_employee_change_never_reaches_the_index(app, index):
+    with app.app_context():
+        cur = index.mysql.connection.cursor()
+        cur.execute("UPDATE Employee SET faculty = 'Arts' WHERE empid = 7")
+        versions.bump(cur, 'Employee')
+        index.employee_written(cur, 7)
+        index.mysql.connection.rollback()
+
+        assert index.stats()['versions']['Employee'] == 0
+        assert index.query(DAY, DAY, faculty='Arts')['staff'] == 0
+        assert index.query(DAY, DAY, faculty='Science')['staff'] == 1
@@ -0,0 +1,164 @@
+import pytest
+from flask import Flask, g, jsonify, request
+
+import idempotency
+from cache import LRUCache
+from db_pool import MySQLPool
+from idempotency import MySQLStore, idempotent
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(SQLITE_STANDIN=str(tmp_path / 'db.sqlite'), METRICS_SQL=False)
+    return app
+
+
+@pytest.fixture(params=['mysql', 'memory'])
+def store(request, app):
+    if request.param == 'memory':
+        return LRUCache(max_entries=100, ttl=3600)
+    mysql = MySQLPool(app)
+    with app.app_context():
+        cur = mysql.connection.cursor()
+        cur.execute(idempotency.CREATE_TABLE)
+        cur.execute("ALTER TABLE idempotency_key ADD COLUMN claim CHAR(32) NULL")
+        mysql.connection.commit()
+    return MySQLStore(mysql, ttl=3600)
+
+
+@pytest.fixture(autouse=True)
+def routes(app, store):
+    app.calls = 0
+
+    @app.before_request
+    def load_auth():
+        if request.headers.get('X-Empid'):
+            g.auth = {'empid': int(request.headers['X-Empid'])}
+
+    @app.route('/checkin', methods=['POST'])
+    @idempotent(store)
+    def checkin():
+        app.calls += 1
+        status = request.json.get('status', 201)
+        if status == 'raise':
+            raise RuntimeError('boom')
+        return jsonify({"call": app.calls}), status
+
+
+def post(client, body, key='k1', **headers):
+    if key:
+        headers['Idempotency-Key'] = key
+    return client.post('/checkin', json=body, headers=headers)
+
+
+def stored_rows(store):
+    conn = store.mysql.pool.acquire()
+    cur = conn.conn.cursor()
+    cur.execute("SELECT scope, status FROM idempotency_key")
+    rows = [tuple(row) for row in cur.fetchall()]
+    store.mysql.pool.release(conn)
+    return rows
+
+
+def test_retry_is_replayed_without_running_the_view(app):
+    client = app.test_client()
+    first = post(client, {'empid': 1})
+    assert first.status_code == 201 and 'Idempotent-Replayed' not in first.headers
+
+    retry = post(client, {'empid': 1})
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.json == first.json
+    assert app.calls == 1
+
+
+def test_requests_without_a_key_always_run(app):
+    client = app.test_client()
+    post(client, {'empid': 1}, key=None)
+    post(client, {'empid': 1}, key=None)
+    assert app.calls == 2
+
+
+def test_reusing_a_key_for_another_body_is_refused(app):
+    client = app.test_client()
+    post(client, {'empid': 1})
+    assert post(client, {'empid': 2}).status_code == 422
+    assert app.calls == 1
+
+
+def test_keys_are_scoped_to_the_caller(app):
+    client = app.test_client()
+    post(client, {'empid': 1}, **{'X-Empid': '1'})
+    assert 'Idempotent-Replayed' not in post(client, {'empid': 1}, **{'X-Empid': '2'}).headers
+    assert app.calls == 2
+
+
+def test_overlong_keys_are_rejected(app):
+    assert post(app.test_client(), {}, key='k' * 256).status_code == 400
+
+
+@pytest.mark.parametrize('status', [500, 'raise'])
+def test_failures_are_not_kept(app, status):
+    client = app.test_client()
+    assert post(client, {'status': status}).status_code == 500
+    assert post(client, {'status': status}).status_code == 500
+    assert app.calls == 2
+
+
+def test_expired_key_is_taken_over(app, store):
+    if not isinstance(store, MySQLStore):
+        pytest.skip("the cache stores expire keys themselves")
+    client = app.test_client()
+    post(client, {'empid': 1})
+    conn = store.mysql.pool.acquire()
+    conn.conn.cursor().execute("UPDATE idempotency_key SET expires_at = 0")
+    conn.conn.commit()
+    store.mysql.pool.release(conn)
+
+    retry = post(client, {'empid': 2})
+    assert retry.status_code == 201 and 'Idempotent-Replayed' not in retry.headers
+    assert post(client, {'empid': 2}).headers['Idempotent-Replayed'] == 'true'
+    assert app.calls == 2
+    assert stored_rows(store) == [('checkin::k1', 201)]
+
+
+def test_request_still_in_progress_gets_409(app, store):
+    with app.test_request_context('/checkin', method='POST', json={'empid': 1}):
+        scope = idempotency._scope('', 'k1')
+        store.add(scope, {"fingerprint": idempotency._fingerprint(), "pending": True})
+        if isinstance(store, MySQLStore):
+            store.mysql.connection.commit()
+
+    busy = post(app.test_client(), {'empid': 1})
+    assert busy.status_code == 409 and busy.headers['Retry-After'] == '1'
+    assert app.calls == 0
+
+
+def test_failed_lookup_leaves_another_requests_key_alone(app, store, monkeypatch):
+    client = app.test_client()
+    post(client, {'empid': 1})
+
+    def broken(key):
+        raise RuntimeError('lookup failed')
+    monkeypatch.setattr(store, 'get', broken)
+    assert post(client, {'empid': 1}).status_code == 500
+
+    monkeypatch.undo()
+    assert post(client, {'empid': 1}).headers['Idempotent-Replayed'] == 'true'
+    assert app.calls == 1
+
+
+def test_replayable(app, store):
+    client = app.test_client()
+    post(client, {'empid': 1})
+    with app.test_request_context('/checkin', method='POST', json={'empid': 1}, headers={'Idempotency-Key': 'k1'}):
+        app.preprocess_request()
+        assert idempotency.replayable(store, '')
+        assert not idempotency.replayable(store, 7)
+    with app.test_request_context('/checkin', method='POST', json={'empid': 2}, headers={'Idempotency-Key': 'k1'}):
+        app.preprocess_request()
+        assert not idempotency.replayable(store, '')
+    with app.test_request_context('/checkin', method='POST', json={'empid': 1}):
+        app.preprocess_request()
+        assert not idempotency.replayable(store, '')
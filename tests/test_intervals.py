@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from intervals import IntervalTree
+
+
+def brute_force(items, lo, hi):
+    return sorted(item for item in items if item[0] <= hi and item[1] >= lo)
+
+
+def test_overlapping_uses_closed_intervals():
+    tree = IntervalTree([(1, 3, 'a'), (5, 5, 'b'), (7, 10, 'c')])
+    assert sorted(tree.overlapping(3, 5)) == [(1, 3, 'a'), (5, 5, 'b')]
+    assert tree.overlapping(4, 4) == []
+    assert sorted(tree.overlapping(0, 100)) == [(1, 3, 'a'), (5, 5, 'b'), (7, 10, 'c')]
+
+
+def test_duplicates_are_stored_once_and_removed_by_key():
+    tree = IntervalTree()
+    tree.add(1, 5, 'a')
+    tree.add(1, 5, 'a')
+    tree.add(1, 5, 'b')
+    assert len(tree) == 2
+
+    assert tree.remove(1, 5, 'a')
+    assert not tree.remove(1, 5, 'a')
+    assert not tree.remove(1, 6, 'b')
+    assert list(tree) == [(1, 5, 'b')]
+
+
+def test_iterates_in_order():
+    items = [(3, 4, 'c'), (1, 9, 'a'), (1, 2, 'b'), (2, 2, 'd')]
+    assert list(IntervalTree(items)) == sorted(items)
+
+
+def test_rejects_backwards_intervals():
+    with pytest.raises(ValueError):
+        IntervalTree().add(5, 4, 'a')
+
+
+def test_matches_brute_force_through_adds_and_removes():
+    rng = random.Random(20261018)
+    tree = IntervalTree()
+    items = set()
+    for step in range(2000):
+        start = rng.randint(0, 500)
+        item = (start, start + rng.randint(0, 40), rng.randint(0, 5))
+        if items and rng.random() < 0.3:
+            item = rng.choice(sorted(items))
+            assert tree.remove(*item)
+            items.discard(item)
+        else:
+            tree.add(*item)
+            items.add(item)
+        if step % 50 == 0:
+            lo = rng.randint(0, 550)
+            hi = lo + rng.randint(0, 60)
+            assert sorted(tree.overlapping(lo, hi)) == brute_force(items, lo, hi)
+    assert len(tree) == len(items)
+    assert list(tree) == sorted(items)
@@ -0,0 +1,53 @@
+import pytest
+
+import leave_counters
+from sqlite_standin import Connection
+
+
+def test_move_params_shifts_one_request_between_status_buckets():
+    assert leave_counters.move_params((7, 'Annual', 'pending'), 'accepted') == [
+        (7, 'annual', 'pending', -1),
+        (7, 'annual', 'accepted', 1),
+    ]
+
+
+@pytest.mark.parametrize('row, new_status', [
+    (None, 'accepted'),
+    ((7, 'annual', 'accepted'), 'accepted'),
+    ((7, 'annual', ' Accepted '), 'accepted'),
+])
+def test_move_params_leaves_counters_alone(row, new_status):
+    assert leave_counters.move_params(row, new_status) == []
+
+
+def test_move_params_counts_missing_values_under_the_empty_bucket():
+    assert leave_counters.move_params((7, None, None), 'rejected') == [
+        (7, '', '', -1),
+        (7, '', 'rejected', 1),
+    ]
+
+
+@pytest.fixture
+def cur(tmp_path):
+    conn = Connection(str(tmp_path / 'db.sqlite'))
+    cur = conn.cursor()
+    cur.execute(leave_counters.CREATE_TABLE)
+    cur.execute("CREATE TABLE leave_request (request_id INTEGER PRIMARY KEY, empid INT, leave_type VARCHAR(50), "
+                "status VARCHAR(20))")
+    yield cur
+    conn.close()
+
+
+def test_move_keeps_counts_in_step_with_leave_request(cur):
+    cur.execute("INSERT INTO leave_request VALUES (1, 7, 'Sick', 'pending')")
+    cur.execute("INSERT INTO leave_request VALUES (2, 7, 'sick', 'pending')")
+    leave_counters.increment(cur, 7, 'Sick', 'pending')
+    leave_counters.increment(cur, 7, 'sick', 'pending')
+
+    leave_counters.move(cur, 1, 'Accepted')
+    cur.execute("UPDATE leave_request SET status = 'Accepted' WHERE request_id = 1")
+
+    assert leave_counters.counts_by_status(cur, 7, 'pending') == {'sick': 1}
+    assert leave_counters.counts_by_status(cur, 7, 'accepted') == {'sick': 1}
+    assert leave_counters.counts_by_type(cur, 7) == {'sick': 2}
+    assert leave_counters.verify(cur) == []
@@ -0,0 +1,67 @@
+import pytest
+
+from meetings import _Day, clock, free_slots, parse_clock
+
+NINE, NOON, SIX = 9 * 60, 12 * 60, 18 * 60
+
+
+def test_empty_day_is_one_slot():
+    assert free_slots([], NINE, SIX) == [(NINE, SIX)]
+
+
+def test_gaps_between_sorted_meetings():
+    busy = [(NINE, 600, 1), (630, NOON, 2), (NOON, 780, 3)]
+    assert free_slots(busy, NINE, SIX) == [(600, 630), (780, SIX)]
+
+
+def test_overlapping_and_nested_meetings_merge():
+    busy = [(540, 660, 1), (600, 620, 2), (650, 700, 3)]
+    assert free_slots(busy, 480, 720) == [(480, 540), (700, 720)]
+
+
+def test_meetings_crossing_the_window_edges_are_clipped():
+    busy = [(420, 570, 1), (1020, 1200, 2)]
+    assert free_slots(busy, NINE, SIX) == [(570, 1020)]
+
+
+def test_min_minutes_drops_short_gaps():
+    busy = [(NINE, 600, 1), (615, NOON, 2)]
+    assert free_slots(busy, NINE, 750, min_minutes=30) == [(NOON, 750)]
+    assert free_slots(busy, NINE, 750, min_minutes=15) == [(600, 615), (NOON, 750)]
+
+
+def test_fully_booked_window_has_no_slots():
+    assert free_slots([(NINE - 60, SIX + 60, 1)], NINE, SIX) == []
+
+
+@pytest.mark.parametrize('value, expected', [('09:30', 570), ('09:30:59', 570), ('00:00', 0), ('24:00', 1440)])
+def test_parse_clock(value, expected):
+    assert parse_clock(value) == expected
+
+
+@pytest.mark.parametrize('value', [None, '', '9', '9:60', '24:01', '25:00', 'ab:cd', '09:30:00:00'])
+def test_parse_clock_rejects(value):
+    with pytest.raises(ValueError):
+        parse_clock(value)
+
+
+def test_clock_round_trips():
+    assert clock(570) == '09:30'
+    assert parse_clock(clock(1439)) == 1439
+
+
+def test_back_to_back_bookings_do_not_clash():
+    day = _Day()
+    day.add(1, 'Standup', NINE, 570, 'Room A', 7)
+    day.add(2, 'Review', 600, 660, 'Room A', 8)
+
+    assert day.busy('location', 'Room A', 570, 600) == []
+    assert day.busy('location', 'Room A', 560, 605) == [(NINE, 570, 1), (600, 660, 2)]
+    assert day.busy('organizer', 7, 0, 1440) == [(NINE, 570, 1)]
+    assert day.busy('organizer', 9, 0, 1440) == []
+
+
+def test_empty_meetings_are_not_indexed():
+    day = _Day()
+    day.add(1, 'Nothing', NINE, NINE, 'Room A', 7)
+    assert day.busy('location', 'Room A', 0, 1440) == []
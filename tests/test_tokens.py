@@ -0,0 +1,114 @@
+import pytest
+from flask import Flask, jsonify
+
+from tokens import TokenAuth, TokenError
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', AUTH_MANAGER_ROLES='manager,hr', **config)
+    auth = TokenAuth(app)
+
+    @app.route('/employees/<int:empid>', methods=['GET', 'POST'])
+    @auth.protect(owner='empid')
+    def employee(empid):
+        return jsonify({"empid": empid, "manager": auth.caller_is_manager()})
+
+    @app.route('/leave', methods=['POST'])
+    @auth.protect(owner='empid')
+    def leave():
+        return jsonify({"ok": True})
+
+    @app.route('/approve', methods=['POST'])
+    @auth.protect(manager=True)
+    def approve():
+        return jsonify({"ok": True})
+
+    return app, auth
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def app():
+    return make_app()[0]
+
+
+@pytest.fixture
+def auth(app):
+    return app.extensions['token_auth']
+
+
+def test_issued_tokens_load_back(auth):
+    payload = auth.load(auth.issue(7, 'Teacher'))
+    assert payload['empid'] == 7 and payload['role'] == 'Teacher'
+    assert payload['expires_at'] > 0
+
+
+def test_tampered_expired_and_revoked_tokens_are_refused(auth):
+    with pytest.raises(TokenError, match='Invalid'):
+        auth.load(auth.issue(7, 'teacher') + 'x')
+
+    _, short_lived = make_app(AUTH_TOKEN_MAX_AGE=-1)
+    with pytest.raises(TokenError, match='expired'):
+        short_lived.load(short_lived.issue(7, 'teacher'))
+
+    token = auth.issue(7, 'teacher')
+    auth.revoke(auth.load(token))
+    with pytest.raises(TokenError, match='revoked'):
+        auth.load(token)
+
+
+def test_manager_roles_are_matched_case_insensitively(auth):
+    assert auth.is_manager({'role': ' HR '})
+    assert not auth.is_manager({'role': 'teacher'})
+    assert not auth.is_manager({'role': None})
+
+
+def test_tokenless_requests_pass_unless_auth_is_required(app):
+    client = app.test_client()
+    assert client.get('/employees/7').status_code == 200
+    assert client.post('/approve').status_code == 200
+
+    strict = make_app(AUTH_REQUIRED=True)[0].test_client()
+    assert strict.get('/employees/7').status_code == 401
+    assert strict.post('/approve').status_code == 401
+
+
+def test_bad_token_is_refused_even_when_auth_is_optional(app):
+    assert app.test_client().get('/employees/7', headers=bearer('nonsense')).status_code == 401
+
+
+def test_owner_checks_url_query_and_body(app, auth):
+    client = app.test_client()
+    own = bearer(auth.issue(7, 'teacher'))
+    assert client.get('/employees/7', headers=own).json == {"empid": 7, "manager": False}
+    assert client.get('/employees/8', headers=own).status_code == 403
+    assert client.post('/leave', json={'empid': 7}, headers=own).status_code == 200
+    assert client.post('/leave', json={'empid': 8}, headers=own).status_code == 403
+    assert client.post('/leave?empid=8', json={'empid': 7}, headers=own).status_code == 403
+
+
+def test_managers_act_for_anyone(app, auth):
+    client = app.test_client()
+    manager = bearer(auth.issue(1, 'Manager'))
+    assert client.get('/employees/8', headers=manager).json == {"empid": 8, "manager": True}
+    assert client.post('/approve', headers=manager).status_code == 200
+    assert client.post('/approve', headers=bearer(auth.issue(7, 'teacher'))).status_code == 403
+
+
+def test_refusal(auth):
+    assert auth.refusal(None) is None
+    assert auth.refusal({'empid': 7, 'role': 'teacher'}, manager=True) == ("Forbidden", 403)
+    assert auth.refusal({'empid': 7, 'role': 'teacher'}, requested='7') is None
+    assert auth.refusal({'empid': 7, 'role': 'teacher'}, requested=8) == ("Forbidden", 403)
+    assert auth.refusal({'empid': 1, 'role': 'hr'}, manager=True, requested=8) is None
+
+
+def test_may_act_for(auth):
+    assert auth.may_act_for(None, 8)
+    assert auth.may_act_for({'empid': 7, 'role': 'teacher'}, '7')
+    assert not auth.may_act_for({'empid': 7, 'role': 'teacher'}, 8)
+    assert auth.may_act_for({'empid': 1, 'role': 'manager'}, 8)
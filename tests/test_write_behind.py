@@ -0,0 +1,132 @@
+import json
+import os
+
+import pytest
+from flask import Flask
+
+from db_pool import MySQLPool
+from write_behind import WriteBehind
+
+INSERT = "INSERT INTO swipe (seq, label) VALUES (%s, %s)"
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(SQLITE_STANDIN=str(tmp_path / 'db.sqlite'), METRICS_SQL=False, WRITE_BEHIND=True,
+                      WRITE_BEHIND_DIR=str(tmp_path / 'journal'), WRITE_BEHIND_FLUSH_INTERVAL=3600)
+    return app
+
+
+@pytest.fixture
+def mysql(app):
+    mysql = MySQLPool(app)
+    entry = mysql.pool.acquire()
+    cur = entry.conn.cursor()
+    cur.execute("CREATE TABLE swipe (seq INT PRIMARY KEY, label VARCHAR(20) NOT NULL)")
+    entry.conn.commit()
+    mysql.pool.release(entry)
+    return mysql
+
+
+def make_queue(app, mysql):
+    queue = WriteBehind(app, mysql)
+    queue.register('swipe', lambda cur, rows: cur.executemany(INSERT, rows))
+    return queue
+
+
+def stored(mysql):
+    entry = mysql.pool.acquire()
+    cur = entry.conn.cursor()
+    cur.execute("SELECT seq, label FROM swipe ORDER BY seq")
+    rows = [tuple(row) for row in cur.fetchall()]
+    mysql.pool.release(entry)
+    return rows
+
+
+def write_journal(path, seqs, flushed=None):
+    with open(path, 'w') as handle:
+        for seq in seqs:
+            handle.write(json.dumps({"seq": seq, "op": "swipe", "row": [seq, f"row {seq}"]}) + "\n")
+    if flushed is not None:
+        with open(path + '.ckpt', 'w') as handle:
+            handle.write(str(flushed))
+
+
+def test_flush_commits_rows_and_empties_the_journal(app, mysql):
+    queue = make_queue(app, mysql)
+    queue.append('swipe', (1, 'a'))
+    queue.append('swipe', (2, 'b'))
+
+    assert queue.flush() == 2
+    assert stored(mysql) == [(1, 'a'), (2, 'b')]
+    stats = queue.stats()
+    assert stats['pending'] == 0 and stats['flushed_seq'] == 2
+    assert os.path.getsize(stats['journal']) == 0
+
+
+def test_unflushed_rows_are_replayed_on_start(app, mysql):
+    directory = app.config['WRITE_BEHIND_DIR']
+    os.makedirs(directory)
+    write_journal(os.path.join(directory, 'journal-0.log'), [1, 2, 3], flushed=1)
+
+    queue = make_queue(app, mysql)
+    queue._ensure_started()
+    assert queue.stats()['pending'] == 2
+    assert queue.flush() == 2
+    assert stored(mysql) == [(2, 'row 2'), (3, 'row 3')]
+    assert queue.append('swipe', (4, 'd')) == 4
+
+
+def test_orphaned_journals_are_replayed_and_removed(app, mysql):
+    directory = app.config['WRITE_BEHIND_DIR']
+    os.makedirs(directory)
+    orphan = os.path.join(directory, 'journal-3.log')
+    write_journal(orphan, [1, 2])
+
+    make_queue(app, mysql)._ensure_started()
+    assert stored(mysql) == [(1, 'row 1'), (2, 'row 2')]
+    assert not os.path.exists(orphan)
+
+
+def test_torn_last_line_is_dropped(app, mysql):
+    directory = app.config['WRITE_BEHIND_DIR']
+    os.makedirs(directory)
+    path = os.path.join(directory, 'journal-0.log')
+    write_journal(path, [1])
+    with open(path, 'a') as handle:
+        handle.write('{"seq": 2, "op": "sw')
+
+    queue = make_queue(app, mysql)
+    queue._ensure_started()
+    assert queue.flush() == 1
+    assert stored(mysql) == [(1, 'row 1')]
+
+
+def test_rejected_rows_are_quarantined_without_holding_up_the_rest(app, mysql):
+    queue = make_queue(app, mysql)
+    for seq, label in [(1, 'a'), (2, None), (3, 'c'), (1, 'duplicate'), (5, 'e')]:
+        queue.append('swipe', (seq, label))
+
+    assert queue.flush() == 3
+    assert stored(mysql) == [(1, 'a'), (3, 'c'), (5, 'e')]
+    assert queue.stats()['quarantined'] == 2
+    with open(os.path.join(app.config['WRITE_BEHIND_DIR'], 'quarantine.log')) as handle:
+        quarantined = [json.loads(line) for line in handle]
+    assert [entry['row'] for entry in quarantined] == [[2, None], [1, 'duplicate']]
+    assert all(entry['error'] for entry in quarantined)
+
+
+def test_unreachable_database_keeps_the_batch(app, mysql):
+    queue = make_queue(app, mysql)
+    queue.append('swipe', (1, 'a'))
+    queue._database_up = lambda: False
+    queue.register('swipe', lambda cur, rows: cur.execute("SELECT * FROM missing"))
+
+    with pytest.raises(Exception):
+        queue.flush()
+    assert queue.stats()['pending'] == 1
+    assert queue.stats()['quarantined'] == 0
+
+    queue.register('swipe', lambda cur, rows: cur.executemany(INSERT, rows))
+    assert queue.flush() == 1
@@ -0,0 +1,141 @@
+import functools
+import secrets
+import threading
+import time
+
+from flask import g, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+from app_logging import get_logger
+
+log = get_logger('attendify.auth')
+
+
+class TokenError(Exception):
+    pass
+
+
+class TokenAuth:
+    """Signed, expiring session tokens verified without a database round trip.
+
+    ``issue()`` signs ``{"empid", "role", "jti"}`` with the app's
+    SECRET_KEY. ``protect()`` checks the ``Authorization: Bearer`` header on
+    a view. Revoked token ids are kept in memory until the token would have
+    expired anyway.
+    """
+
+    def __init__(self, app=None):
+        self._revoked = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        secret = config.get('SECRET_KEY')
+        if not secret:
+            # Tokens will not survive a restart or validate across workers
+            log.warning("secret_key_missing", detail="using a random per-process key for session tokens")
+            secret = secrets.token_hex(32)
+        self.serializer = URLSafeTimedSerializer(secret, salt='attendify-session')
+        self.max_age = config.get('AUTH_TOKEN_MAX_AGE', 8 * 3600)
+        self.required = bool(config.get('AUTH_REQUIRED'))
+        self.manager_roles = {role.strip().lower() for role in config.get('AUTH_MANAGER_ROLES', '').split(',')
+                              if role.strip()}
+        app.extensions['token_auth'] = self
+
+    def issue(self, empid, role):
+        return self.serializer.dumps({"empid": empid, "role": role, "jti": secrets.token_urlsafe(12)})
+
+    def load(self, token):
+        try:
+            payload, signed_at = self.serializer.loads(token, max_age=self.max_age, return_timestamp=True)
+        except SignatureExpired:
+            raise TokenError("Token expired")
+        except BadSignature:
+            raise TokenError("Invalid token")
+        with self._lock:
+            if payload.get('jti') in self._revoked:
+                raise TokenError("Token revoked")
+        payload['expires_at'] = int(signed_at.timestamp()) + self.max_age
+        return payload
+
+    def revoke(self, payload):
+        now = time.time()
+        with self._lock:
+            self._revoked[payload['jti']] = payload['expires_at']
+            for jti, expires_at in list(self._revoked.items()):
+                if expires_at < now:
+                    del self._revoked[jti]
+
+    def is_manager(self, payload):
+        return (payload.get('role') or '').strip().lower() in self.manager_roles
+
+    def caller_is_manager(self):
+        # Whether the token protect() accepted on this request has a manager role
+        payload = getattr(g, 'auth', None)
+        return payload is not None and self.is_manager(payload)
+
+    def may_act_for(self, payload, empid):
+        # For views that check the empid of each record themselves; payload is
+        # None only when protect() let an unauthenticated request through
+        return payload is None or self.is_manager(payload) or str(payload['empid']) == str(empid)
+
+    def current(self):
+        # Payload of the bearer token on this request, None if there is none
+        return self.from_header(request.headers.get('Authorization', ''))
+
+    def from_header(self, header):
+        if not header.startswith('Bearer '):
+            return None
+        return self.load(header[len('Bearer '):].strip())
+
+    def refusal(self, payload, manager=False, requested=None):
+        # The checks behind protect() and the async build's twin of it: the
+        # (error, status) to answer with, or None to run the view. requested is
+        # the empid an owner-protected request asks for.
+        if payload is None:
+            return ("Authorization token required", 401) if self.required else None
+        if self.is_manager(payload):
+            return None
+        if manager:
+            return "Forbidden", 403
+        if requested is not None and str(requested) != str(payload['empid']):
+            return "Forbidden", 403
+        return None
+
+    def protect(self, owner=None, manager=False):
+        # owner names the request field (URL arg, query string or JSON body)
+        # holding the empid the caller must own; managers may act for anyone.
+        # manager=True limits the view to AUTH_MANAGER_ROLES. Without a token the
+        # view runs unchecked unless AUTH_REQUIRED is on, as for any protected view.
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    payload = self.current()
+                except TokenError as e:
+                    return jsonify({"success": False, "error": str(e)}), 401
+
+                requested = None
+                if owner and payload is not None:
+                    requested = requested_empid(owner, kwargs, request.args, request.get_json(silent=True))
+                refused = self.refusal(payload, manager, requested)
+                if refused:
+                    return jsonify({"success": False, "error": refused[0]}), refused[1]
+                if payload is not None:
+                    g.auth = payload
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def requested_empid(owner, view_kwargs, args, data):
+    # The owner field from the URL, then the query string, then the JSON body
+    if owner in view_kwargs:
+        return view_kwargs[owner]
+    if owner in args:
+        return args.get(owner)
+    if isinstance(data, dict):
+        return data.get(owner)
+    return None
@@ -0,0 +1,81 @@
+import functools
+import hashlib
+
+from flask import current_app, make_response, request
+
+from app_logging import get_logger
+
+log = get_logger('attendify.versions')
+
+# Per-table version counters for conditional GETs. Write handlers bump the
+# counter of every table they change in the same transaction; read handlers
+# wrapped in conditional() derive their ETag from the counters plus the
+# request URL, so an unchanged resource is answered with 304 after a single
+# primary-key read instead of the full query.
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS table_version (
+        name VARCHAR(64) NOT NULL PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0
+    )
+"""
+
+
+BUMP = """
+    INSERT INTO table_version (name, version) VALUES (%s, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
+
+def bump(cur, *tables):
+    for table in tables:
+        cur.execute(BUMP, (table,))
+
+
+def read_query(count):
+    return f"SELECT name, version FROM table_version WHERE name IN ({', '.join(['%s'] * count)})"
+
+
+def read(cur, tables):
+    cur.execute(read_query(len(tables)), list(tables))
+    versions = {table: 0 for table in tables}
+    versions.update({row[0]: int(row[1]) for row in cur.fetchall()})
+    return versions
+
+
+def compute_etag(tables, versions, vary=()):
+    key = request.full_path + "|" + "|".join(f"{table}={versions[table]}" for table in tables)
+    for header in vary:
+        key += f"|{header}={request.headers.get(header, '')}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def conditional(mysql, *tables, vary=()):
+    # Decorator for GET views whose body depends only on the given tables, the URL
+    # and the request headers named in vary (which also go out in Vary)
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                cur = mysql.connection.cursor()
+                versions = read(cur, tables)
+                cur.close()
+            except Exception:
+                # Serve the full response rather than fail the read
+                log.error("version_lookup_failed", tables=list(tables), exc_info=True)
+                return view(*args, **kwargs)
+
+            etag = compute_etag(tables, versions, vary)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.vary.update(vary)
+            return response
+        return wrapper
+    return decorator
+
@@ -0,0 +1,309 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+
+from app_logging import get_logger
+
+log = get_logger('attendify.write_behind')
+
+
+class WriteBehind:
+    """Journal-backed write-behind queue with group commit.
+
+    ``append(op, row)`` returns once the row is fsync'ed to a local
+    append-only journal. A background thread drains the journal in batches
+    of up to ``WRITE_BEHIND_BATCH_SIZE`` rows every
+    ``WRITE_BEHIND_FLUSH_INTERVAL`` seconds, handing each op's rows to the
+    writer registered for it and committing the whole batch at once. Rows
+    that were journaled but not committed are replayed on the next start.
+
+    Replay is at-least-once: a crash between the MySQL commit and the
+    checkpoint write replays that batch, so writers should be upserts
+    where possible.
+
+    A batch MySQL rejects while the database is reachable is split in
+    halves until the offending rows are found. Those are appended to
+    ``quarantine.log`` in the journal directory and skipped, so one bad row
+    cannot hold up the rows behind it.
+    """
+
+    def __init__(self, app=None, mysql=None):
+        self.enabled = False
+        self.writers = {}
+        self._mysql = mysql
+        self._pid = None
+        self._start_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, mysql)
+
+    def init_app(self, app, mysql):
+        config = app.config
+        self._mysql = mysql
+        self.enabled = bool(config.get('WRITE_BEHIND'))
+        self.directory = config.get('WRITE_BEHIND_DIR') or 'journal'
+        self.flush_interval = config.get('WRITE_BEHIND_FLUSH_INTERVAL', 0.5)
+        self.batch_size = config.get('WRITE_BEHIND_BATCH_SIZE', 500)
+        if self.enabled:
+            # Started lazily so a preforking server's master never owns the journal
+            app.before_request(self._ensure_started)
+        app.extensions['write_behind'] = self
+
+    def register(self, op, writer):
+        # writer(cursor, rows) writes a list of row tuples without committing
+        self.writers[op] = writer
+
+    def append(self, op, row):
+        self._ensure_started()
+        with self._lock:
+            self._seq += 1
+            entry = {"seq": self._seq, "op": op, "row": list(row)}
+            self._journal.write(json.dumps(entry, default=str) + "\n")
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._pending.append(entry)
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+        return entry["seq"]
+
+    def stats(self):
+        if self._pid != os.getpid():
+            return {"enabled": self.enabled, "started": False}
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "started": True,
+                "journal": self._path,
+                "pending": len(self._pending),
+                "last_seq": self._seq,
+                "flushed_seq": self._flushed_seq,
+                "flushes": self._flushes,
+                "flush_errors": self._flush_errors,
+                "quarantined": self._quarantined,
+            }
+
+    def flush(self):
+        # Commit everything journaled so far; returns the number of rows written
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    return written
+                written += self._drain(batch, self._advance)
+                with self._lock:
+                    self._flushes += 1
+
+    def _advance(self, part):
+        # part, the head of _pending, is in MySQL (or quarantined)
+        with self._lock:
+            del self._pending[:len(part)]
+            self._flushed_seq = part[-1]["seq"]
+            self._checkpoint()
+
+    def _drain(self, batch, done):
+        # Write batch, splitting it to find the rows MySQL rejects. done(part) is
+        # called for each leading part once it is committed or quarantined; returns
+        # the number of rows written.
+        try:
+            self._write(batch)
+        except Exception as e:
+            if not self._database_up():
+                raise
+            if len(batch) == 1:
+                self._quarantine(batch[0], e)
+                done(batch)
+                return 0
+            middle = len(batch) // 2
+            return self._drain(batch[:middle], done) + self._drain(batch[middle:], done)
+        done(batch)
+        return len(batch)
+
+    def _database_up(self):
+        # Tells a rejected row apart from an unreachable database
+        try:
+            pooled = self._mysql.pool.acquire()
+        except Exception:
+            return False
+        broken = False
+        try:
+            cur = pooled.conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            broken = True
+            return False
+        finally:
+            self._mysql.pool.release(pooled, broken=broken)
+
+    def _quarantine(self, entry, error):
+        log.error("write_behind_row_quarantined", op=entry["op"], row=entry["row"], seq=entry["seq"],
+                  error=str(error))
+        record = dict(entry, error=str(error), quarantined_at=time.time())
+        with open(os.path.join(self.directory, 'quarantine.log'), 'a') as handle:
+            handle.write(json.dumps(record, default=str) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        with self._lock:
+            self._quarantined += 1
+
+    def _ensure_started(self):
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._lock = threading.Lock()
+            self._flush_lock = threading.Lock()
+            self._wake = threading.Event()
+            self._pending = []
+            self._flushes = 0
+            self._flush_errors = 0
+            self._quarantined = 0
+            os.makedirs(self.directory, exist_ok=True)
+            self._claim_journal()
+            self._pid = os.getpid()
+            self._sweep_orphans()
+            threading.Thread(target=self._run, name='write-behind', daemon=True).start()
+            atexit.register(self._shutdown)
+
+    def _claim_journal(self):
+        # Each worker process owns the first journal file it can lock
+        n = 0
+        while True:
+            path = os.path.join(self.directory, f'journal-{n}.log')
+            handle = open(path, 'a+')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                n += 1
+                continue
+            if not os.path.exists(path) or not os.path.samestat(os.fstat(handle.fileno()), os.stat(path)):
+                # Another worker swept this journal away between our open and lock
+                handle.close()
+                continue
+            self._path = path
+            self._journal = handle
+            self._flushed_seq = _read_checkpoint(path)
+            entries = _read_journal(path)
+            self._seq = max([self._flushed_seq] + [e["seq"] for e in entries])
+            self._pending = [e for e in entries if e["seq"] > self._flushed_seq]
+            # Rewrite with only the unflushed rows, dropping any torn tail
+            handle.truncate(0)
+            handle.writelines(json.dumps(e) + "\n" for e in self._pending)
+            handle.flush()
+            os.fsync(handle.fileno())
+            return
+
+    def _sweep_orphans(self):
+        # Replay journals left behind by workers that no longer exist
+        for path in sorted(glob.glob(os.path.join(self.directory, 'journal-*.log'))):
+            if path == self._path:
+                continue
+            with open(path, 'a+') as handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                flushed = _read_checkpoint(path)
+                entries = [e for e in _read_journal(path) if e["seq"] > flushed]
+                try:
+                    for start in range(0, len(entries), self.batch_size):
+                        self._drain(entries[start:start + self.batch_size],
+                                    lambda part: _write_checkpoint(path, part[-1]["seq"]))
+                except Exception:
+                    log.error("write_behind_replay_failed", journal=path, exc_info=True)
+                    continue
+                os.remove(path)
+                if os.path.exists(path + '.ckpt'):
+                    os.remove(path + '.ckpt')
+
+    def _run(self):
+        failures = 0
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                failures = 0
+            except Exception:
+                failures += 1
+                with self._lock:
+                    self._flush_errors += 1
+                log.error("write_behind_flush_failed", failures=failures, exc_info=True)
+                time.sleep(min(30, self.flush_interval * 2 ** min(failures, 6)))
+
+    def _write(self, batch):
+        grouped = {}
+        for entry in batch:
+            grouped.setdefault(entry["op"], []).append(tuple(entry["row"]))
+
+        pooled = self._mysql.pool.acquire()
+        broken = False
+        try:
+            cur = pooled.conn.cursor()
+            for op, rows in grouped.items():
+                self.writers[op](cur, rows)
+            pooled.conn.commit()
+            cur.close()
+        except Exception:
+            broken = True
+            try:
+                pooled.conn.rollback()
+                broken = False
+            except Exception:
+                pass
+            raise
+        finally:
+            self._mysql.pool.release(pooled, broken=broken)
+
+    def _checkpoint(self):
+        # Called with the lock held after a successful commit
+        _write_checkpoint(self._path, self._flushed_seq)
+        if not self._pending:
+            # Everything is in MySQL, so the journal can start over
+            self._journal.truncate(0)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def _shutdown(self):
+        try:
+            self.flush()
+        except Exception:
+            log.error("write_behind_shutdown_flush_failed", journal=self._path, exc_info=True)
+
+
+def _read_journal(path):
+    entries = []
+    with open(path) as handle:
+        for line in handle:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn final line was never acknowledged
+                break
+    return entries
+
+
+def _read_checkpoint(path):
+    try:
+        with open(path + '.ckpt') as handle:
+            return int(handle.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_checkpoint(path, seq):
+    tmp = path + '.ckpt.tmp'
+    with open(tmp, 'w') as handle:
+        handle.write(str(seq))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp, path + '.ckpt')
@@ -0,0 +1,4 @@
+from attendify import create_app
+
+# WSGI entry point: gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()